@@ -0,0 +1,41 @@
+"""add_item_derived_features
+
+Revision ID: c41e7a9b2d58
+Revises: 6ae76868ac25
+Create Date: 2026-10-16 23:05:12.418390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41e7a9b2d58'
+down_revision: Union[str, None] = '6ae76868ac25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Values are filled in by scripts/backfill_item_features.py
+    op.add_column('clothing_items', sa.Column('slot', sa.String(), nullable=True))
+    op.add_column('clothing_items', sa.Column('formality_score', sa.Integer(), nullable=True))
+    op.add_column('clothing_items', sa.Column('pattern_intensity', sa.Integer(), nullable=True))
+    op.add_column('clothing_items', sa.Column('color_family', sa.String(), nullable=True))
+    op.create_index(op.f('ix_clothing_items_slot'), 'clothing_items', ['slot'], unique=False)
+    op.create_index(op.f('ix_clothing_items_formality_score'), 'clothing_items', ['formality_score'], unique=False)
+    op.create_index(op.f('ix_clothing_items_color_family'), 'clothing_items', ['color_family'], unique=False)
+    op.create_index('ix_clothing_items_user_slot', 'clothing_items', ['user_id', 'slot'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clothing_items_user_slot', table_name='clothing_items')
+    op.drop_index(op.f('ix_clothing_items_color_family'), table_name='clothing_items')
+    op.drop_index(op.f('ix_clothing_items_formality_score'), table_name='clothing_items')
+    op.drop_index(op.f('ix_clothing_items_slot'), table_name='clothing_items')
+    op.drop_column('clothing_items', 'color_family')
+    op.drop_column('clothing_items', 'pattern_intensity')
+    op.drop_column('clothing_items', 'formality_score')
+    op.drop_column('clothing_items', 'slot')
@@ -15,6 +15,34 @@ class Settings:
     # AI Services
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-3.1-flash-lite-preview")
+    OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    AI_PROVIDER: str = os.getenv("AI_PROVIDER", "gemini")  # gemini, openai, auto (route between both), replay or record
+    AI_MAX_CONCURRENCY: int = int(os.getenv("AI_MAX_CONCURRENCY", "8"))  # Max in-flight AI calls per worker
+    AI_HEDGE_REQUESTS: bool = os.getenv("AI_HEDGE_REQUESTS", "false").lower() == "true"  # Duplicate slow calls after p95
+    AI_CONTEXT_CACHE: bool = os.getenv("AI_CONTEXT_CACHE", "true").lower() == "true"  # Cache static system instructions provider-side
+    AI_STRUCTURED_OUTPUT: bool = os.getenv("AI_STRUCTURED_OUTPUT", "true").lower() == "true"  # Constrain responses with a JSON schema
+    AI_WARDROBE_ENCODING: str = os.getenv("AI_WARDROBE_ENCODING", "compact")  # compact (coded table) or text (one description per item)
+    AI_PREGENERATION: bool = os.getenv("AI_PREGENERATION", "true").lower() == "true"  # Pre-generate outfits for common occasions
+    AI_PREGEN_OFF_PEAK_HOURS: str = os.getenv("AI_PREGEN_OFF_PEAK_HOURS", "2-6")  # Local hours (START-END) for the daily sweep
+    AI_PREGEN_DAILY_BUDGET: int = int(os.getenv("AI_PREGEN_DAILY_BUDGET", "6"))  # Pre-generated suggestion sets per user per day
+    AI_WARDROBE_TOKEN_BUDGET: int = int(os.getenv("AI_WARDROBE_TOKEN_BUDGET", "3000"))  # Max tokens for the wardrobe listing in outfit prompts
+    
+    # Offline replay provider (AI_PROVIDER=replay/record)
+    AI_REPLAY_DIR: str = os.getenv("AI_REPLAY_DIR", "fixtures/ai_replay")
+    AI_REPLAY_LATENCY: str = os.getenv("AI_REPLAY_LATENCY", "recorded")  # recorded, fixed:MS, normal:MEAN,STD, lognormal:MEDIAN,SIGMA
+    AI_REPLAY_FAILURE_RATE: float = float(os.getenv("AI_REPLAY_FAILURE_RATE", "0"))  # Share of calls failing with a 503
+    AI_REPLAY_HANG_RATE: float = float(os.getenv("AI_REPLAY_HANG_RATE", "0"))  # Share of calls outlasting the timeout
+    
+    # Image normalization before AI calls
+    AI_IMAGE_MAX_EDGE: int = int(os.getenv("AI_IMAGE_MAX_EDGE", "1536"))  # Longest edge in pixels
+    AI_IMAGE_JPEG_QUALITY: int = int(os.getenv("AI_IMAGE_JPEG_QUALITY", "85"))
+    AI_IMAGE_WORKERS: int = int(os.getenv("AI_IMAGE_WORKERS", "2"))  # Normalization processes
+    
+    # Per-call AI telemetry (rolling SQLite table, viewable on /api/admin)
+    AI_TELEMETRY_DB: str = os.getenv("AI_TELEMETRY_DB", "ai_telemetry.db")
+    AI_TELEMETRY_MAX_ROWS: int = int(os.getenv("AI_TELEMETRY_MAX_ROWS", "50000"))  # Newest calls kept
+    ADMIN_EMAILS: list = [email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()]
     
     # CORS
     ALLOWED_ORIGINS: list = os.getenv("ALLOWED_ORIGINS", "*").split(",")
@@ -26,7 +54,12 @@ class Settings:
         # Validate critical settings
         if not self.SECRET_KEY and self.ENVIRONMENT == "production":
             raise ValueError("SECRET_KEY must be set in production environment")
-        if not self.GEMINI_API_KEY and not self.OPENAI_API_KEY:
+        if self.AI_PROVIDER not in ("gemini", "openai", "auto", "replay", "record"):
+            raise ValueError(f"Unknown AI_PROVIDER: {self.AI_PROVIDER}")
+        if self.AI_WARDROBE_ENCODING not in ("compact", "text"):
+            raise ValueError(f"Unknown AI_WARDROBE_ENCODING: {self.AI_WARDROBE_ENCODING}")
+        # Replayed fixtures need no network access or API key
+        if self.AI_PROVIDER != "replay" and not self.GEMINI_API_KEY and not self.OPENAI_API_KEY:
             raise ValueError("At least one AI API key (GEMINI or OPENAI) must be set")
 
 settings = Settings()
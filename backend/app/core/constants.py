@@ -60,11 +60,44 @@ PRIMARY_COLORS = [
 # AI Configuration
 AI_MAX_RETRIES = 3
 AI_TIMEOUT_SECONDS = 30
+AI_RETRY_BASE_SECONDS = 0.5        # Full-jitter exponential backoff base between attempts
+AI_HEDGE_MIN_SAMPLES = 20          # Latency samples needed before hedging kicks in
+AI_CIRCUIT_FAILURE_THRESHOLD = 5   # Consecutive failed calls that open the circuit
+AI_CIRCUIT_RESET_SECONDS = 30      # How long the circuit stays open before a trial call
+AI_ROUTER_EWMA_ALPHA = 0.2         # Weight of the newest sample in provider latency/error averages
+AI_ROUTER_MAX_ERROR_RATE = 0.5     # Providers above this error rate are skipped by the router
+AI_ROUTER_RETRY_SECONDS = 60       # After this long without failures a skipped provider is tried again
+AI_CONTEXT_CACHE_TTL_SECONDS = 3600  # Lifetime of a provider-side cached system instruction
 MAX_OUTFIT_SUGGESTIONS = 3
+HYBRID_SHORTLIST_SIZE = 12  # Locally validated candidates the AI chooses from in hybrid mode
+PROMPT_CHARS_PER_TOKEN = 4  # Rough chars-per-token ratio used to budget prompt sections
+AI_TELEMETRY_FLUSH_SECONDS = 5     # How often recorded AI calls are written to the telemetry table
+IMAGE_NORMALIZE_TIMEOUT_SECONDS = 20  # Longest an image may take to normalize before the original is sent
+AI_TELEMETRY_LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 4000, 8000, 15000, 30000)  # Histogram upper bounds
+
+# Background Analysis Jobs
+ANALYSIS_JOB_WORKERS = 4          # Batches analyzed concurrently per job
+ANALYSIS_BATCH_SIZE = 6           # Images packed into one multi-image Gemini request
+ANALYSIS_JOB_MAX_ATTEMPTS = 3     # Attempts per item before it is marked failed
+ANALYSIS_JOB_RETRY_BASE_SECONDS = 2  # Exponential backoff base between attempts
+ANALYSIS_JOB_HEARTBEAT_SECONDS = 20  # How often a running job refreshes its lease
+ANALYSIS_JOB_LEASE_SECONDS = 120  # A running job with no heartbeat for this long is considered abandoned
 
 # Cache Configuration
 CACHE_TTL_SECONDS = 3600  # 1 hour
 OUTFIT_CACHE_TTL = 1800   # 30 minutes
+OUTFIT_CACHE_MAX_ENTRIES = 2000  # Bound on cached suggestion sets per worker
+
+# Speculative Outfit Pre-generation
+PREGEN_TICK_SECONDS = 30          # How often the scheduler checks for work
+PREGEN_DEBOUNCE_SECONDS = 120     # Quiet time after a wardrobe change before re-generating
+PREGEN_OCCASIONS_PER_USER = 3     # Most-used occasions pre-generated per user
+PREGEN_ACTIVE_USER_DAYS = 7       # Users shown outfits this recently are swept off-peak
+PREGEN_CACHE_TTL = 86400          # Pre-generated sets live until the next daily sweep
+ANALYSIS_CACHE_MAX_ENTRIES = 5000  # LRU bound for cached clothing image analyses
+SLOT_CACHE_MAX_ENTRIES = 4096     # LRU bound for memoized (category, subcategory) slot lookups
+COMPAT_MATRIX_CACHE_USERS = 256   # Wardrobe compatibility matrices kept in memory per worker
+TAG_INDEX_CACHE_USERS = 1024      # Wardrobe occasion/season tag indexes kept in memory per worker
 
 # Rate Limiting
 RATE_LIMIT_PER_MINUTE = 60
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text, Float, ForeignKey, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -6,6 +6,9 @@ from app.database import Base
 
 class ClothingItem(Base):
     __tablename__ = "clothing_items"
+    __table_args__ = (
+        Index("ix_clothing_items_user_slot", "user_id", "slot"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer)
@@ -72,6 +75,12 @@ class ClothingItem(Base):
     # Quality rating
     quality_score = Column(Float)  # 1-10 scale
     
+    # Derived features, recomputed from the fields above on every write (see item_features)
+    slot = Column(String, index=True)  # base_top, layer, bottom, shoes, accessory
+    formality_score = Column(Integer, index=True)  # 0 (casual) to 10 (formal)
+    pattern_intensity = Column(Integer)  # 0 (solid) to 10 (loud)
+    color_family = Column(String, index=True)  # normalized primary color: navy, beige, red, ...
+    
     # Analysis metadata
     analyzed = Column(Integer, default=0)  # 0 = not analyzed, 1 = analyzed
     analysis_timestamp = Column(DateTime, default=datetime.utcnow)
@@ -162,3 +171,84 @@ class ItemUsageStats(Base):
     
     # Relationship
     clothing_item = relationship("ClothingItem", backref="usage_stats")
+
+
+class ClothingAnalysisCache(Base):
+    """Content-addressed cache of AI clothing analyses, keyed by image hash + prompt version"""
+    __tablename__ = "clothing_analysis_cache"
+    __table_args__ = (
+        UniqueConstraint("image_hash", "prompt_version", name="uq_analysis_cache_hash_version"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    image_hash = Column(String, nullable=False, index=True)  # SHA-256 of the uploaded image bytes
+    prompt_version = Column(String, nullable=False)  # Analysis prompt version the result was produced with
+    analysis_json = Column(Text, nullable=False)  # JSON of the successful analysis result
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)  # Drives LRU eviction
+
+
+class WardrobeCompatibility(Base):
+    """Persisted pairwise compatibility bit matrices of one user's wardrobe (see compatibility_matrix)"""
+    __tablename__ = "wardrobe_compatibility"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, unique=True, index=True)
+    item_features = Column(Text, nullable=False)  # JSON [[item_id, formality, pattern_intensity, color_family], ...] in row order
+    matrix = Column(LargeBinary, nullable=False)  # zlib-compressed bit rows: formality, then pattern, then color
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PregeneratedOutfits(Base):
+    """Pre-generated suggestion sets, shared by every worker process (see outfit_cache)"""
+    __tablename__ = "pregenerated_outfits"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String, unique=True, nullable=False, index=True)  # build_outfit_cache_key of the request it answers
+    user_id = Column(Integer, index=True)
+    suggestions_json = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class PregenerationBudget(Base):
+    """Per-user daily pre-generation budget and sweep claim, shared by every worker process"""
+    __tablename__ = "pregeneration_budget"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, unique=True, index=True)
+    day = Column(Date, nullable=False)  # Day the used count belongs to
+    used = Column(Integer, default=0)
+    swept_on = Column(Date)  # Day of the last off-peak sweep claimed for this user
+
+
+class AnalysisJob(Base):
+    """Background batch analysis of a user's unanalyzed clothing items"""
+    __tablename__ = "analysis_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, index=True)
+    status = Column(String, default="queued", index=True)  # queued, running, completed
+    total_items = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationship
+    job_items = relationship("AnalysisJobItem", backref="job", lazy="select")
+
+
+class AnalysisJobItem(Base):
+    """Per-item progress and retry state within an analysis job"""
+    __tablename__ = "analysis_job_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("analysis_jobs.id"), index=True)
+    item_id = Column(Integer, ForeignKey("clothing_items.id"))
+    status = Column(String, default="pending")  # pending, done, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime)  # Earliest time a failed item may be retried
+    last_error = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
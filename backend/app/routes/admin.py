@@ -0,0 +1,82 @@
+"""
+Admin API - Operational views for users listed in ADMIN_EMAILS
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import Optional
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from app.config import settings
+from app.database import get_db
+from app.models.user import User
+from app.utils.auth import decode_access_token
+from app.services.ai_client import circuit_breaker
+from app.services.ai_providers import ProviderRouter, get_ai_provider
+from app.services.ai_telemetry import recent_ai_calls, telemetry_snapshot
+from app.services.llm_json import parse_failure_stats
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+security = HTTPBearer(auto_error=False)
+
+
+def get_admin_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security), db: Session = Depends(get_db)) -> User:
+    """Get current user from JWT token and require them to be an admin"""
+    if not credentials:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+
+    token = credentials.credentials
+    payload = decode_access_token(token)
+
+    if payload is None or "sub" not in payload:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
+        )
+
+    user = db.query(User).filter(User.id == int(payload["sub"])).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    if user.email.lower() not in settings.ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return user
+
+
+@router.get("/ai-telemetry")
+def get_ai_telemetry(admin: User = Depends(get_admin_user)):
+    """
+    Latency histograms and totals of AI calls since this worker started
+
+    Returns:
+    - calls: Per "route call" summary (latency percentiles and buckets, payload
+      bytes, tokens, retries, parse failure rate), highest p95 first
+    - parse_failures: Parse outcomes per call and output mode
+    - providers: Router statistics when AI_PROVIDER=auto
+    - circuit_open: Whether AI calls are currently failing fast
+    """
+    provider = get_ai_provider()
+    return {
+        "calls": telemetry_snapshot(),
+        "parse_failures": parse_failure_stats(),
+        "providers": provider.snapshot() if isinstance(provider, ProviderRouter) else None,
+        "circuit_open": circuit_breaker.is_open
+    }
+
+
+@router.get("/ai-telemetry/calls")
+def get_ai_calls(
+    limit: int = Query(100, ge=1, le=1000),
+    route: Optional[str] = None,
+    call: Optional[str] = None,
+    slowest: bool = False,
+    admin: User = Depends(get_admin_user)
+):
+    """Individual AI calls from the rolling telemetry table, newest first or slowest first"""
+    return recent_ai_calls(limit=limit, route=route, call=call, slowest=slowest)
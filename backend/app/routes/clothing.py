@@ -5,8 +5,11 @@ import shutil
 import os
 from datetime import datetime
 from app.database import get_db
-from app.models.clothing import ClothingItem, OutfitItem
-from app.services.ai_service import analyze_clothing_image
+from app.models.clothing import ClothingItem, OutfitItem, AnalysisJob
+from app.services.analysis_cache import analyze_clothing_image_cached
+from app.services.analysis_jobs import create_analysis_job, start_analysis_job, get_job_progress
+from app.services import wardrobe_events
+from app.services.item_features import apply_item_features
 from app.utils.auth import get_user_id_from_token
 from app.core.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
@@ -49,8 +52,8 @@ async def upload_clothing(
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
         
-        # Analyze the image with AI
-        analysis_result = analyze_clothing_image(file_path)
+        # Analyze the image with AI (cached by image content, off the event loop)
+        analysis_result = await analyze_clothing_image_cached(db, file_path)
         
         if not analysis_result.get("analysis_successful", False):
             return {
@@ -97,10 +100,12 @@ async def upload_clothing(
             analyzed=1,
             analysis_timestamp=datetime.utcnow()
         )
+        apply_item_features(clothing_item)
         
         db.add(clothing_item)
         db.commit()
         db.refresh(clothing_item)
+        wardrobe_events.item_saved(user_id, clothing_item.id)
         
         return {
             "success": True,
@@ -225,6 +230,7 @@ async def delete_clothing_item(
     
     db.delete(item)
     db.commit()
+    wardrobe_events.item_deleted(user_id, item_id)
     
     return {
         "success": True,
@@ -269,9 +275,11 @@ async def update_clothing_item(
     if not updated_fields:
         raise HTTPException(status_code=400, detail="No valid fields to update")
 
+    apply_item_features(item)
     item.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(item)
+    wardrobe_events.item_saved(user_id, item.id)
 
     return {
         "success": True,
@@ -373,62 +381,50 @@ async def analyze_unanalyzed(
     user_id: int = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Batch analyze all unanalyzed clothing items for the user."""
-    unanalyzed = db.query(ClothingItem).filter(
-        ClothingItem.user_id == user_id,
-        ClothingItem.analyzed == 0
-    ).all()
-    
-    analyzed_count = 0
-    errors = []
-    
-    for item in unanalyzed:
-        try:
-            analysis_result = analyze_clothing_image(item.image_path)
-            
-            if analysis_result.get("analysis_successful"):
-                # Update the item with analysis results
-                item.category = analysis_result.get("category")
-                item.subcategory = analysis_result.get("subcategory")
-                item.color = analysis_result.get("color")
-                item.secondary_colors = analysis_result.get("secondary_colors")
-                item.fit_type = analysis_result.get("fit_type")
-                item.silhouette = analysis_result.get("silhouette")
-                item.sleeve_type = analysis_result.get("sleeve_type")
-                item.sleeve_fit = analysis_result.get("sleeve_fit")
-                item.neckline = analysis_result.get("neckline")
-                item.collar_type = analysis_result.get("collar_type")
-                item.collar_closure = analysis_result.get("collar_closure")
-                item.texture = analysis_result.get("texture")
-                item.fabric_type = analysis_result.get("fabric_type")
-                item.fabric_weight = analysis_result.get("fabric_weight")
-                item.pattern = analysis_result.get("pattern")
-                item.pattern_description = analysis_result.get("pattern_description")
-                item.length = analysis_result.get("length")
-                item.waist_type = analysis_result.get("waist_type")
-                item.pant_type = analysis_result.get("pant_type")
-                item.pant_fit = analysis_result.get("pant_fit")
-                item.pant_rise = analysis_result.get("pant_rise")
-                item.condition = analysis_result.get("condition")
-                item.distressing_level = analysis_result.get("distressing_level")
-                item.occasion_tags = analysis_result.get("occasion_tags")
-                item.style_tags = analysis_result.get("style_tags")
-                item.season_tags = analysis_result.get("season_tags")
-                item.special_features = analysis_result.get("special_features")
-                item.detailed_description = analysis_result.get("detailed_description")
-                item.quality_score = analysis_result.get("quality_score")
-                item.analyzed = 1
-                item.analysis_timestamp = datetime.utcnow()
-                
-                analyzed_count += 1
-        except Exception as e:
-            errors.append(f"Error analyzing item {item.id}: {str(e)}")
-    
-    db.commit()
-    
+    """
+    Queue background analysis of all unanalyzed clothing items for the user.
+
+    Returns immediately with a job id; poll GET /api/clothing/jobs/{job_id} for progress.
+    """
+    job = create_analysis_job(db, user_id)
+
+    if not job:
+        return {
+            "success": True,
+            "message": "No unanalyzed items",
+            "job_id": None,
+            "total_items": 0
+        }
+
+    # Claiming is atomic and respects the running worker's lease, so starting an
+    # active job is a no-op unless it is queued or was abandoned by a dead worker
+    start_analysis_job(job.id)
+
+    return {
+        "success": True,
+        "message": f"Analysis queued for {job.total_items} items",
+        "job_id": job.id,
+        "status": job.status,
+        "total_items": job.total_items
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_analysis_job(
+    job_id: int,
+    user_id: int = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get progress of a background analysis job."""
+    job = db.query(AnalysisJob).filter(
+        AnalysisJob.id == job_id,
+        AnalysisJob.user_id == user_id
+    ).first()
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
     return {
         "success": True,
-        "message": f"Analyzed {analyzed_count} items",
-        "analyzed_count": analyzed_count,
-        "errors": errors if errors else None
+        **get_job_progress(db, job)
     }
@@ -2,6 +2,7 @@ import json
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.database import get_db
 from app.models.user import User
@@ -10,12 +11,24 @@ from app.models.style_dna import StyleDNA
 from app.schemas.clothing import OutfitCreate, OutfitResponse, SavePreviewOutfitRequest
 from pydantic import BaseModel
 from app.utils.auth import decode_access_token
-from app.services.ai_service import generate_outfit_suggestions
+from app.services.ai_service import (
+    generate_outfit_suggestions,
+    generate_hybrid_outfit_suggestions,
+    stream_outfit_suggestions,
+    items_for_ai,
+    style_dna_for_ai,
+    is_degraded
+)
+from app.services.local_outfit_engine import generate_local_outfits
+from app.services.item_features import feature_dict
+from app.services.compatibility_matrix import load_compatibility_matrix
+from app.services.tag_index import load_tag_index, request_season
 from app.services.usage_stats_service import (
     get_underused_items_details,
     get_recent_outfit_combinations,
     update_item_usage
 )
+from app.services.outfit_cache import build_outfit_cache_key, get_cached_outfits, store_outfits
 from app.core.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from datetime import datetime
 
@@ -57,7 +70,12 @@ def generate_outfit(
     outfit_create: OutfitCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
-    preview_only: bool = Query(False, description="If true, don't save to database")
+    preview_only: bool = Query(False, description="If true, don't save to database"),
+    engine: str = Query(
+        "ai",
+        pattern="^(ai|local|hybrid)$",
+        description="'local' builds outfits without calling the AI, 'hybrid' lets the AI pick from a local shortlist"
+    )
 ):
     """Generate outfit suggestion (optionally without saving for preview)"""
     # Get clothing items
@@ -73,53 +91,96 @@ def generate_outfit(
         )
     
     # Prepare items for AI
-    items_data = [
-        {
-            "id": item.id,
-            "category": item.category,
-            "subcategory": item.subcategory,
-            "color": item.color,
-            "style_tags": item.style_tags,
-            "occasion_tags": item.occasion_tags,
-            "fit_type": item.fit_type,
-            "pattern": item.pattern
-        }
-        for item in clothing_items
-    ]
+    items_data = items_for_ai(clothing_items)
     
     # Fetch user's Style DNA
     style_dna = db.query(StyleDNA).filter(StyleDNA.user_id == current_user.id).first()
-    style_dna_dict = None
-    if style_dna:
-        style_dna_dict = {
-            "custom_preferences": style_dna.custom_preferences,
-            "body_type": style_dna.body_type,
-            "skin_tone": style_dna.skin_tone,
-            "favorite_colors": style_dna.favorite_colors,
-            "avoid_colors": style_dna.avoid_colors,
-            "style_preferences": style_dna.style_preferences,
-            "fit_preference": style_dna.fit_preference,
-            "preferred_patterns": style_dna.preferred_patterns,
-            "avoid_patterns": style_dna.avoid_patterns,
-            "formality_level": style_dna.formality_level
-        }
+    style_dna_dict = style_dna_for_ai(style_dna)
     
-    # Get underused items for coverage optimization
-    underused_items = get_underused_items_details(db, current_user.id, limit=10)
-    
-    # Get recent outfit combinations to avoid repetition
-    recent_combinations = get_recent_outfit_combinations(db, current_user.id, days=14)
-    
-    # Generate suggestions with enhanced context
-    ai_suggestions_list = generate_outfit_suggestions(
-        items_data,
+    # Serve repeat generations from the cache while items, occasion and Style DNA are unchanged
+    cache_key = build_outfit_cache_key(
+        current_user.id,
+        clothing_items,
         outfit_create.occasion,
-        style_dna_dict,
-        None,  # No previous suggestions for first generation
-        underused_items,
-        recent_combinations,
-        outfit_create.force_include_item_ids
+        outfit_create.season,
+        outfit_create.weather,
+        style_dna,
+        outfit_create.force_include_item_ids,
+        engine
     )
+    ai_suggestions_list = get_cached_outfits(cache_key)
+    
+    if ai_suggestions_list is None:
+        # Get underused items for coverage optimization
+        underused_items = get_underused_items_details(db, current_user.id, limit=10)
+        
+        # Get recent outfit combinations to avoid repetition
+        recent_combinations = get_recent_outfit_combinations(db, current_user.id, days=14)
+        
+        # Local search and repair check item pairs against the wardrobe's compatibility matrix
+        # and pre-filter items through its occasion/season tag index
+        load_compatibility_matrix(db, current_user.id)
+        load_tag_index(db, current_user.id)
+        season = request_season(outfit_create.season, outfit_create.weather)
+        
+        if engine == "local":
+            # Deterministic combinatorial search - no LLM round-trip
+            ai_suggestions_list = generate_local_outfits(
+                items_data,
+                outfit_create.occasion,
+                style_dna_dict,
+                underused_items,
+                recent_combinations,
+                outfit_create.force_include_item_ids,
+                season=season
+            ) or [{
+                "outfit_name": "Unable to generate",
+                "description": "No valid outfit combinations found with current wardrobe",
+                "item_ids": [],
+                "styling_tips": ""
+            }]
+        elif engine == "hybrid":
+            # Valid candidates are built locally, the AI only picks and names them
+            ai_suggestions_list = generate_hybrid_outfit_suggestions(
+                items_data,
+                outfit_create.occasion,
+                style_dna_dict,
+                underused_items,
+                recent_combinations,
+                outfit_create.force_include_item_ids,
+                season
+            )
+        else:
+            # Generate suggestions with enhanced context
+            ai_suggestions_list = generate_outfit_suggestions(
+                items_data,
+                outfit_create.occasion,
+                style_dna_dict,
+                None,  # No previous suggestions for first generation
+                underused_items,
+                recent_combinations,
+                outfit_create.force_include_item_ids,
+                season
+            )
+        
+        if not is_degraded(ai_suggestions_list):
+            store_outfits(cache_key, current_user.id, ai_suggestions_list)
+        elif engine == "ai":
+            # The AI failed and these came from the local engine - cache them as local results only
+            store_outfits(
+                build_outfit_cache_key(
+                    current_user.id,
+                    clothing_items,
+                    outfit_create.occasion,
+                    outfit_create.season,
+                    outfit_create.weather,
+                    style_dna,
+                    outfit_create.force_include_item_ids,
+                    "local"
+                ),
+                current_user.id,
+                ai_suggestions_list
+            )
     
     # Convert suggestions to JSON string for storage
     ai_suggestions = json.dumps(ai_suggestions_list)
@@ -190,6 +251,97 @@ def generate_outfit(
     
     return outfit
 
+@router.post("/generate/stream")
+def generate_outfit_stream(
+    outfit_create: OutfitCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream outfit suggestions as server-sent events.
+    
+    Each valid outfit is sent as an "outfit" event as soon as Gemini finishes
+    generating it, followed by a final "done" event. Nothing is saved - use
+    /save-preview to keep an outfit.
+    """
+    clothing_items = db.query(ClothingItem).filter(
+        ClothingItem.id.in_(outfit_create.clothing_item_ids),
+        ClothingItem.user_id == current_user.id
+    ).all()
+    
+    if not clothing_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No valid clothing items provided"
+        )
+    
+    items_data = items_for_ai(clothing_items)
+    style_dna = db.query(StyleDNA).filter(StyleDNA.user_id == current_user.id).first()
+    style_dna_dict = style_dna_for_ai(style_dna)
+    
+    cache_key = build_outfit_cache_key(
+        current_user.id,
+        clothing_items,
+        outfit_create.occasion,
+        outfit_create.season,
+        outfit_create.weather,
+        style_dna,
+        outfit_create.force_include_item_ids
+    )
+    cached_suggestions = get_cached_outfits(cache_key)
+    
+    # Gather the DB-backed context now - the session is closed once streaming starts
+    underused_items = recent_combinations = None
+    if cached_suggestions is None:
+        underused_items = get_underused_items_details(db, current_user.id, limit=10)
+        recent_combinations = get_recent_outfit_combinations(db, current_user.id, days=14)
+        load_compatibility_matrix(db, current_user.id)
+        load_tag_index(db, current_user.id)
+    season = request_season(outfit_create.season, outfit_create.weather)
+    
+    user_id = current_user.id
+    
+    def event_stream():
+        if cached_suggestions is not None:
+            suggestions = cached_suggestions
+            for suggestion in suggestions:
+                yield _sse_event("outfit", suggestion)
+        else:
+            suggestions = []
+            stream = stream_outfit_suggestions(
+                items_data,
+                outfit_create.occasion,
+                style_dna_dict,
+                None,
+                underused_items,
+                recent_combinations,
+                outfit_create.force_include_item_ids,
+                season
+            )
+            while True:
+                try:
+                    suggestion = next(stream)
+                except StopIteration as finished:
+                    degraded = finished.value
+                    break
+                suggestions.append(suggestion)
+                yield _sse_event("outfit", suggestion)
+            # A failed stream's local fallback is not cached as AI suggestions
+            if not degraded:
+                store_outfits(cache_key, user_id, suggestions)
+        
+        yield _sse_event("done", {"count": len(suggestions)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @router.get("/", response_model=List[OutfitResponse])
 def get_outfits(
     current_user: User = Depends(get_current_user),
@@ -403,9 +555,11 @@ def regenerate_outfit(
             "color": item.color,
             "style_tags": item.style_tags,
             "occasion_tags": item.occasion_tags,
+            "season_tags": item.season_tags,
             "fit_type": item.fit_type,
             "pattern": item.pattern,
-            "quality_score": item.quality_score
+            "quality_score": item.quality_score,
+            **feature_dict(item)
         }
         for item in clothing_items
     ]
@@ -432,6 +586,8 @@ def regenerate_outfit(
     
     # Get recent outfit combinations to avoid repetition
     recent_combinations = get_recent_outfit_combinations(db, current_user.id, days=14)
+    load_compatibility_matrix(db, current_user.id)
+    load_tag_index(db, current_user.id)
     
     # Generate new suggestions (pass previous suggestions to avoid duplicates)
     ai_suggestions_list = generate_outfit_suggestions(
@@ -440,7 +596,9 @@ def regenerate_outfit(
         style_dna_dict,
         regenerate_req.previous_suggestions,
         underused_items,
-        recent_combinations
+        recent_combinations,
+        None,
+        request_season(outfit.season, outfit.weather)
     )
     
     # Update outfit with new suggestions
@@ -15,6 +15,8 @@ from app.services.style_dna_analyzer import (
     analyze_face_photo, analyze_body_photo, analyze_style_inspiration,
     generate_personalized_summary
 )
+from app.services.ai_client import run_ai_call
+from app.services import wardrobe_events
 import os
 import shutil
 import json
@@ -72,7 +74,7 @@ async def analyze_face(
             shutil.copyfileobj(file.file, buffer)
         
         # Analyze with AI
-        analysis_result = analyze_face_photo(file_path)
+        analysis_result = await run_ai_call(analyze_face_photo, file_path)
         
         if not analysis_result.get("analysis_successful", False):
             return FaceAnalysisResponse(
@@ -111,6 +113,7 @@ async def analyze_face(
         style_dna.last_analysis_date = datetime.utcnow()
         
         db.commit()
+        wardrobe_events.style_dna_saved(current_user.id)
         
         return FaceAnalysisResponse(
             success=True,
@@ -147,7 +150,7 @@ async def analyze_body(
             shutil.copyfileobj(file.file, buffer)
         
         # Analyze with AI
-        analysis_result = analyze_body_photo(file_path)
+        analysis_result = await run_ai_call(analyze_body_photo, file_path)
         
         if not analysis_result.get("analysis_successful", False):
             return BodyAnalysisResponse(
@@ -190,6 +193,7 @@ async def analyze_body(
         style_dna.last_analysis_date = datetime.utcnow()
         
         db.commit()
+        wardrobe_events.style_dna_saved(current_user.id)
         
         return BodyAnalysisResponse(
             success=True,
@@ -247,7 +251,7 @@ async def analyze_inspiration(
             db.add(photo_record)
         
         # Analyze all photos together
-        analysis_result = analyze_style_inspiration(saved_paths)
+        analysis_result = await run_ai_call(analyze_style_inspiration, saved_paths)
         
         if not analysis_result.get("analysis_successful", False):
             return StyleInspirationResponse(
@@ -279,6 +283,7 @@ async def analyze_inspiration(
         style_dna.last_analysis_date = datetime.utcnow()
         
         db.commit()
+        wardrobe_events.style_dna_saved(current_user.id)
         
         return StyleInspirationResponse(
             success=True,
@@ -384,6 +389,7 @@ def update_style_dna(
     
     db.commit()
     db.refresh(db_style_dna)
+    wardrobe_events.style_dna_saved(user_id)
     
     return db_style_dna
 
@@ -412,5 +418,6 @@ def delete_style_dna(
         db.delete(db_style_dna)
     
     db.commit()
+    wardrobe_events.style_dna_saved(user_id)
     
     return {"message": "Style DNA deleted successfully"}
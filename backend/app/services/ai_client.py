@@ -0,0 +1,310 @@
+"""
+AI Client - Non-blocking, bounded and resilient execution of AI model calls
+
+The Gemini SDK calls used by the analyzers are blocking. Running them inline
+inside an ``async def`` route stalls the whole event loop, so async routes hand
+them to a dedicated thread pool instead, with a semaphore capping how many AI
+calls a single worker keeps in flight.
+
+Every model request goes through call_model, which sends it to the configured
+provider (see ai_providers) and adds a per-attempt
+timeout, jittered exponential backoff on transient errors, optional hedged
+requests after the p95 latency and a circuit breaker that fails fast while
+the AI is down, so callers can degrade instead of piling up. Each call is
+recorded in ai_telemetry under its ``call_name``.
+"""
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Any, Callable, Optional
+
+import openai
+from google.api_core import exceptions as google_exceptions
+
+from app.config import settings
+from app.services.ai_providers import AIProvider, get_ai_provider, token_usage
+from app.services.ai_telemetry import payload_bytes, record_ai_call
+from app.core.constants import (
+    AI_MAX_RETRIES,
+    AI_TIMEOUT_SECONDS,
+    AI_RETRY_BASE_SECONDS,
+    AI_HEDGE_MIN_SAMPLES,
+    AI_CIRCUIT_FAILURE_THRESHOLD,
+    AI_CIRCUIT_RESET_SECONDS
+)
+
+# Errors worth retrying - anything else (bad request, blocked content) fails immediately
+RETRYABLE_ERRORS = (
+    TimeoutError,
+    ConnectionError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.InternalServerError,
+    google_exceptions.BadGateway,
+    google_exceptions.GatewayTimeout,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class AIUnavailableError(Exception):
+    """The AI is unreachable: the circuit is open or every retry failed"""
+
+# Dedicated pool so slow AI calls never starve FastAPI's default threadpool
+_executor = ThreadPoolExecutor(
+    max_workers=settings.AI_MAX_CONCURRENCY,
+    thread_name_prefix="ai-call"
+)
+
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Create the concurrency semaphore lazily, inside the running event loop"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def run_ai_call(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking AI function without blocking the event loop.
+
+    Waits for a free concurrency slot, then executes ``func`` on the AI thread
+    pool so other requests keep being served while the model responds.
+    """
+    loop = asyncio.get_running_loop()
+    # Copy the context so telemetry still sees the route that made the call
+    context = contextvars.copy_context()
+    async with _get_semaphore():
+        return await loop.run_in_executor(_executor, partial(context.run, func, *args, **kwargs))
+
+
+class CircuitBreaker:
+    """
+    Stop calling the AI after repeated failures.
+
+    After failure_threshold consecutive failed calls the circuit opens and calls
+    fail immediately. Once reset_seconds have passed a single trial call is let
+    through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow_request(self) -> bool:
+        """Whether a call may be attempted now"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_in_flight or time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                print("[AI Client] Circuit closed - AI is responding again")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print(f"[AI Client] Circuit opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies used to time hedged requests"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Latency at the given fraction, or None until enough samples exist"""
+        with self._lock:
+            if len(self._samples) < AI_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+circuit_breaker = CircuitBreaker(AI_CIRCUIT_FAILURE_THRESHOLD, AI_CIRCUIT_RESET_SECONDS)
+latency_tracker = LatencyTracker()
+
+# Attempts run here so a hung SDK call can be abandoned once its timeout passes
+_attempt_executor = ThreadPoolExecutor(
+    max_workers=settings.AI_MAX_CONCURRENCY * 2,
+    thread_name_prefix="ai-attempt"
+)
+# One slot per attempt thread. Attempts wait for a slot before they are submitted,
+# so time spent queueing behind other calls never counts against their timeout.
+_attempt_slots = threading.BoundedSemaphore(settings.AI_MAX_CONCURRENCY * 2)
+
+
+def _submit_attempt(provider: AIProvider, contents: Any, kwargs: dict, blocking: bool = True) -> Optional[Future]:
+    """Start a request on a free attempt thread. Returns None when not blocking and none is free."""
+    if not _attempt_slots.acquire(blocking=blocking):
+        return None
+    try:
+        future = _attempt_executor.submit(provider.generate_content, contents, **kwargs)
+    except Exception:
+        _attempt_slots.release()
+        raise
+    # The slot stays taken until the request finishes, even if its attempt gave up on it
+    future.add_done_callback(lambda _: _attempt_slots.release())
+    return future
+
+
+def _run_attempt(provider: AIProvider, contents: Any, kwargs: dict) -> Any:
+    """One attempt with a hard timeout, hedged with a second request after the p95 latency"""
+    futures = [_submit_attempt(provider, contents, kwargs)]
+    # The clock starts once the request is actually running
+    started = time.monotonic()
+    deadline = started + AI_TIMEOUT_SECONDS
+
+    hedge_after = latency_tracker.percentile(0.95) if settings.AI_HEDGE_REQUESTS else None
+    if hedge_after is not None and hedge_after < AI_TIMEOUT_SECONDS:
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            # Hedge only with a spare thread - never queue behind other calls
+            hedge = _submit_attempt(provider, contents, kwargs, blocking=False)
+            if hedge is not None:
+                print(f"[AI Client] No response after p95 ({hedge_after:.1f}s), sending hedged request")
+                futures.append(hedge)
+
+    last_error = None
+    try:
+        while futures:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                latency_tracker.record(time.monotonic() - started)
+                return response
+            futures = list(pending)
+    finally:
+        # Drop requests that have not started; running ones are abandoned to finish on their own
+        for future in futures:
+            future.cancel()
+
+    if futures or last_error is None:
+        raise TimeoutError(f"AI call timed out after {AI_TIMEOUT_SECONDS}s")
+    raise last_error
+
+
+def _response_bytes(response: Any) -> Optional[int]:
+    """Size of a complete response's text, None when it has none (e.g. blocked)"""
+    try:
+        return len(response.text.encode("utf-8"))
+    except Exception:
+        return None
+
+
+def call_model(contents: Any, call_name: str = "unlabelled", **kwargs) -> Any:
+    """
+    Send a request to the configured AI provider with timeout, retries, hedging
+    and circuit breaker.
+
+    Transient errors are retried up to AI_MAX_RETRIES times with full-jitter
+    exponential backoff. Streaming calls are only guarded by the circuit breaker
+    and the SDK request timeout, since a partially consumed stream cannot be retried.
+    ``call_name`` labels the request in telemetry and should match the name the
+    call site passes to record_parse_outcome.
+
+    Raises:
+        AIUnavailableError: the circuit is open or all attempts failed
+    """
+    if not circuit_breaker.allow_request():
+        raise AIUnavailableError("AI temporarily unavailable (circuit open)")
+
+    provider = get_ai_provider()
+    kwargs.setdefault("request_options", {"timeout": AI_TIMEOUT_SECONDS})
+    if not settings.AI_STRUCTURED_OUTPUT:
+        kwargs.pop("response_schema", None)
+
+    started = time.monotonic()
+    request_bytes = payload_bytes(contents) + payload_bytes(kwargs.get("system_instruction"))
+    record = partial(record_ai_call, call_name, provider.name, request_bytes=request_bytes)
+
+    if kwargs.get("stream"):
+        try:
+            response = provider.generate_content(contents, **kwargs)
+        except RETRYABLE_ERRORS as e:
+            circuit_breaker.record_failure()
+            record(time.monotonic() - started, error=type(e).__name__, stream=True)
+            raise
+        except Exception as e:
+            # The AI answered (e.g. rejected the request), so it is reachable - this
+            # also releases a half-open trial that would otherwise block every call
+            circuit_breaker.record_success()
+            record(time.monotonic() - started, error=type(e).__name__, stream=True)
+            raise
+        circuit_breaker.record_success()
+        record(time.monotonic() - started, stream=True)
+        return response
+
+    last_error = None
+    for attempt in range(1, AI_MAX_RETRIES + 1):
+        try:
+            response = _run_attempt(provider, contents, kwargs)
+        except RETRYABLE_ERRORS as e:
+            last_error = e
+            if attempt < AI_MAX_RETRIES:
+                delay = random.uniform(0, AI_RETRY_BASE_SECONDS * (2 ** (attempt - 1)))
+                print(f"[AI Client] Attempt {attempt} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+            continue
+        except Exception as e:
+            # The AI answered (e.g. rejected the request), so it is reachable
+            circuit_breaker.record_success()
+            record(time.monotonic() - started, attempts=attempt, error=type(e).__name__)
+            raise
+
+        circuit_breaker.record_success()
+        record(
+            time.monotonic() - started,
+            response_bytes=_response_bytes(response),
+            usage=token_usage(response),
+            attempts=attempt
+        )
+        return response
+
+    circuit_breaker.record_failure()
+    record(time.monotonic() - started, attempts=AI_MAX_RETRIES, error=type(last_error).__name__)
+    raise AIUnavailableError(f"AI call failed after {AI_MAX_RETRIES} attempts: {last_error}") from last_error
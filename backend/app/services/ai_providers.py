@@ -0,0 +1,529 @@
+"""
+AI Providers - Pluggable backends for model calls
+
+Every model request goes through an AIProvider selected with the AI_PROVIDER
+setting, so an SDK is only configured when it is actually used:
+
+- "gemini" / "openai": a single hosted provider
+- "auto": every provider with an API key behind a router that sends each call
+  to the fastest healthy one, using per-provider EWMA latency and error rates
+- "replay": an offline stand-in that serves responses recorded earlier,
+  keyed by a hash of the prompt and image bytes, with configurable latency
+  and injected failures. Used for load tests and benchmarks without network.
+- "record": calls the live provider(s) and saves every response as a replay fixture
+
+All providers take the same request contents (prompt strings and
+{"mime_type", "data"} image parts) for both vision analysis and outfit
+generation, plus an optional ``system_instruction`` for static rules and an
+optional ``response_schema`` (see ai_schemas). Gemini serves a system
+instruction from provider-side context caching when the model supports it;
+OpenAI sends it as the leading system message so its automatic prefix caching
+applies. A response schema switches the provider to its structured-output mode.
+New backends are added with register_provider.
+"""
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from app.config import settings
+from app.services.ai_schemas import to_gemini_schema, to_openai_schema, wrap_array_schema
+from app.core.constants import (
+    AI_TIMEOUT_SECONDS,
+    AI_ROUTER_EWMA_ALPHA,
+    AI_ROUTER_MAX_ERROR_RATE,
+    AI_ROUTER_RETRY_SECONDS,
+    AI_CONTEXT_CACHE_TTL_SECONDS
+)
+
+# Size of the text chunks a replayed streaming response is split into
+REPLAY_STREAM_CHUNK_CHARS = 64
+
+
+class ReplayMissError(Exception):
+    """No recorded response exists for a request in replay mode"""
+
+
+class AIProvider:
+    """Interface every AI backend implements"""
+
+    name = "base"
+
+    def generate_content(self, contents: Any, stream: bool = False, **kwargs) -> Any:
+        """
+        Run a model request.
+
+        Accepts ``system_instruction`` (static text sent ahead of the contents)
+        and ``response_schema`` (the JSON shape the response must follow)
+        alongside the SDK keyword arguments.
+
+        Returns:
+            A response with a ``.text`` attribute, or when ``stream`` is true an
+            iterable of chunks that each have ``.text``
+        """
+        raise NotImplementedError
+
+
+class GeminiProvider(AIProvider):
+    """Google Gemini via the google-generativeai SDK"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str):
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY environment variable not set.")
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self._model = genai.GenerativeModel(model_name)
+        # system instruction -> (model, expires_at); expires_at is None when not context-cached
+        self._instruction_models: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _create_instruction_model(self, system_instruction: str) -> tuple:
+        """A model bound to the instruction, served from a context cache when possible"""
+        if settings.AI_CONTEXT_CACHE:
+            try:
+                from google.generativeai import caching
+                cached = caching.CachedContent.create(
+                    model=self.model_name,
+                    system_instruction=system_instruction,
+                    ttl=timedelta(seconds=AI_CONTEXT_CACHE_TTL_SECONDS)
+                )
+                print(f"[AI Providers] Cached system instruction ({len(system_instruction)} chars) as {cached.name}")
+                # Renew a minute early so in-flight calls never reference an expired cache
+                expires_at = time.monotonic() + AI_CONTEXT_CACHE_TTL_SECONDS - 60
+                return genai.GenerativeModel.from_cached_content(cached), expires_at
+            except Exception as e:
+                # Models without caching support, or instructions under the minimum cacheable size
+                print(f"[AI Providers] Context cache unavailable, sending system instruction inline: {str(e)}")
+        return genai.GenerativeModel(self.model_name, system_instruction=system_instruction), None
+
+    def _model_for(self, system_instruction: Optional[str]) -> Any:
+        if not system_instruction:
+            return self._model
+        with self._lock:
+            model, expires_at = self._instruction_models.get(system_instruction, (None, None))
+            if model is None or (expires_at is not None and time.monotonic() >= expires_at):
+                model, expires_at = self._create_instruction_model(system_instruction)
+                self._instruction_models[system_instruction] = (model, expires_at)
+            return model
+
+    def generate_content(
+        self,
+        contents: Any,
+        stream: bool = False,
+        system_instruction: Optional[str] = None,
+        response_schema: Optional[Dict] = None,
+        **kwargs
+    ) -> Any:
+        if response_schema is not None:
+            kwargs["generation_config"] = {
+                **(kwargs.get("generation_config") or {}),
+                "response_mime_type": "application/json",
+                "response_schema": to_gemini_schema(response_schema)
+            }
+        return self._model_for(system_instruction).generate_content(contents, stream=stream, **kwargs)
+
+
+class TextResponse:
+    """A plain-text response, shaped like the Gemini SDK's response and stream chunks"""
+
+    def __init__(self, text: str, usage: Optional[Dict[str, int]] = None):
+        self.text = text
+        self.usage = usage
+
+    def chunks(self) -> Iterator["TextResponse"]:
+        for start in range(0, max(len(self.text), 1), REPLAY_STREAM_CHUNK_CHARS):
+            yield TextResponse(self.text[start:start + REPLAY_STREAM_CHUNK_CHARS])
+
+
+class OpenAIProvider(AIProvider):
+    """OpenAI chat completions (vision-capable models)"""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, model_name: str):
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable not set.")
+        from openai import OpenAI
+        self.model_name = model_name
+        self._client = OpenAI(api_key=api_key)
+
+    @staticmethod
+    def _to_message_content(contents: Any) -> List[Dict]:
+        """Convert Gemini-style request parts into chat message content parts"""
+        parts = []
+        for part in _flatten(contents):
+            if isinstance(part, dict) and "data" in part:
+                data = part["data"] if isinstance(part["data"], bytes) else str(part["data"]).encode("utf-8")
+                encoded = base64.b64encode(data).decode("ascii")
+                parts.append({
+                    "type": "image_url",
+                    "image_url": {"url": f"data:{part.get('mime_type', 'image/jpeg')};base64,{encoded}"}
+                })
+            else:
+                parts.append({"type": "text", "text": str(part)})
+        return parts
+
+    def generate_content(
+        self,
+        contents: Any,
+        stream: bool = False,
+        system_instruction: Optional[str] = None,
+        response_schema: Optional[Dict] = None,
+        **kwargs
+    ) -> Any:
+        timeout = (kwargs.get("request_options") or {}).get("timeout", AI_TIMEOUT_SECONDS)
+        messages = [{"role": "user", "content": self._to_message_content(contents)}]
+        if system_instruction:
+            # Leading static text is what OpenAI's automatic prompt caching matches on
+            messages.insert(0, {"role": "system", "content": system_instruction})
+
+        # Structured outputs need an object at the root, so arrays are wrapped and
+        # unwrapped again below. Streams keep the prompt's prose JSON instructions:
+        # a wrapped array would only complete when the whole response has arrived.
+        wrapped = False
+        extra = {}
+        if response_schema is not None and not stream:
+            wrapped = response_schema["type"] == "array"
+            schema = wrap_array_schema(response_schema) if wrapped else response_schema
+            extra["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "strict": True, "schema": to_openai_schema(schema)}
+            }
+
+        completion = self._client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            stream=stream,
+            timeout=timeout,
+            **extra
+        )
+        if not stream:
+            text = completion.choices[0].message.content or ""
+            if wrapped:
+                try:
+                    text = json.dumps(json.loads(text)["items"])
+                except (ValueError, KeyError, TypeError):
+                    pass
+            usage = None
+            if completion.usage is not None:
+                details = getattr(completion.usage, "prompt_tokens_details", None)
+                usage = {
+                    "prompt_tokens": completion.usage.prompt_tokens,
+                    "cached_tokens": (getattr(details, "cached_tokens", None) or 0) if details else 0,
+                    "output_tokens": completion.usage.completion_tokens
+                }
+            return TextResponse(text, usage)
+        return (
+            TextResponse(chunk.choices[0].delta.content)
+            for chunk in completion
+            if chunk.choices and chunk.choices[0].delta.content
+        )
+
+
+def token_usage(response: Any) -> Optional[Dict[str, int]]:
+    """Prompt, cached and output token counts of a non-streamed response, when the provider reports them"""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return usage
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is None:
+        return None
+    return {
+        "prompt_tokens": getattr(metadata, "prompt_token_count", 0) or 0,
+        "cached_tokens": getattr(metadata, "cached_content_token_count", 0) or 0,
+        "output_tokens": getattr(metadata, "candidates_token_count", 0) or 0
+    }
+
+
+def request_fingerprint(contents: Any) -> str:
+    """Stable hash of a request's prompt text and image bytes"""
+    digest = hashlib.sha256()
+
+    def update(part: Any) -> None:
+        if isinstance(part, (list, tuple)):
+            for item in part:
+                update(item)
+        elif isinstance(part, dict):
+            if "data" in part:
+                data = part["data"]
+                digest.update(b"image:")
+                digest.update(data if isinstance(data, bytes) else str(data).encode("utf-8"))
+            else:
+                digest.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+        elif isinstance(part, bytes):
+            digest.update(part)
+        else:
+            digest.update(b"text:")
+            digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+
+    update(contents)
+    return digest.hexdigest()
+
+
+class ReplayProvider(AIProvider):
+    """
+    Offline stand-in that replays recorded responses.
+
+    Fixtures are JSON files named by request_fingerprint in fixture_dir. In
+    record mode every call is forwarded to ``recorder`` and its response saved.
+    Replayed calls sleep for a latency drawn from ``latency`` and fail with the
+    configured probabilities, so retry, timeout and circuit breaker behaviour
+    can be exercised offline.
+
+    Latency specs: "recorded" (the latency measured when recording),
+    "fixed:MS", "normal:MEAN_MS,STDDEV_MS" or "lognormal:MEDIAN_MS,SIGMA".
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        fixture_dir: str,
+        latency: str = "recorded",
+        failure_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        recorder: Optional[AIProvider] = None
+    ):
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.hang_rate = hang_rate
+        self.recorder = recorder
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        os.makedirs(fixture_dir, exist_ok=True)
+
+    def _fixture_path(self, key: str) -> str:
+        return os.path.join(self.fixture_dir, f"{key}.json")
+
+    def _sample_latency(self, recorded_ms: float) -> float:
+        """Latency in seconds for one replayed call"""
+        kind, _, params = self.latency.partition(":")
+        values = [float(value) for value in params.split(",") if value]
+        with self._lock:
+            if kind == "fixed":
+                latency_ms = values[0]
+            elif kind == "normal":
+                latency_ms = self._random.gauss(values[0], values[1])
+            elif kind == "lognormal":
+                latency_ms = self._random.lognormvariate(0, values[1]) * values[0]
+            else:
+                latency_ms = recorded_ms
+        return max(0.0, latency_ms) / 1000.0
+
+    def _inject_failure(self) -> None:
+        """Raise or stall according to the configured failure rates"""
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.failure_rate:
+            raise google_exceptions.ServiceUnavailable("Injected failure (replay provider)")
+        if roll < self.failure_rate + self.hang_rate:
+            # Outlast the per-attempt timeout
+            time.sleep(AI_TIMEOUT_SECONDS * 2)
+
+    def _record(self, key: str, contents: Any, stream: bool, kwargs: dict) -> TextResponse:
+        started = time.monotonic()
+        response = self.recorder.generate_content(contents, stream=stream, **kwargs)
+        text = "".join(chunk.text for chunk in response) if stream else response.text
+        usage = None if stream else token_usage(response)
+        latency_ms = (time.monotonic() - started) * 1000
+
+        preview = next((part for part in _flatten(contents) if isinstance(part, str)), "")
+        with open(self._fixture_path(key), "w") as fixture:
+            json.dump({
+                "text": text,
+                "latency_ms": round(latency_ms, 1),
+                "usage": usage,
+                "provider": self.recorder.name,
+                "prompt_preview": preview[:200],
+                "recorded_at": datetime.utcnow().isoformat()
+            }, fixture, indent=2)
+        return TextResponse(text, usage)
+
+    def generate_content(self, contents: Any, stream: bool = False, **kwargs) -> Any:
+        # Instructions and schemas shape the response, so they are part of the key
+        extras = [kwargs[name] for name in ("system_instruction", "response_schema") if kwargs.get(name)]
+        key = request_fingerprint(extras + [contents] if extras else contents)
+
+        if self.recorder is not None:
+            response = self._record(key, contents, stream, kwargs)
+        else:
+            try:
+                with open(self._fixture_path(key)) as fixture:
+                    recorded = json.load(fixture)
+            except FileNotFoundError:
+                raise ReplayMissError(f"No recorded AI response for request {key[:12]}")
+
+            self._inject_failure()
+            time.sleep(self._sample_latency(recorded.get("latency_ms", 0.0)))
+            response = TextResponse(recorded["text"], recorded.get("usage"))
+
+        return response.chunks() if stream else response
+
+
+def _flatten(contents: Any) -> List[Any]:
+    """Request parts as a flat list"""
+    if isinstance(contents, (list, tuple)):
+        return [part for item in contents for part in _flatten(item)]
+    return [contents]
+
+
+class ProviderStats:
+    """Exponentially weighted latency and error rate of one provider"""
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.last_failure_at: Optional[float] = None
+
+    def record(self, seconds: Optional[float], failed: bool) -> None:
+        """Count a call; seconds is None for calls whose latency is not comparable (streams)"""
+        self.calls += 1
+        if failed:
+            self.last_failure_at = time.monotonic()
+        elif seconds is not None:
+            self.latency = seconds if self.latency is None else (
+                AI_ROUTER_EWMA_ALPHA * seconds + (1 - AI_ROUTER_EWMA_ALPHA) * self.latency
+            )
+        self.error_rate = AI_ROUTER_EWMA_ALPHA * (1.0 if failed else 0.0) + (1 - AI_ROUTER_EWMA_ALPHA) * self.error_rate
+
+    def is_healthy(self) -> bool:
+        """Low recent error rate, or failures long enough ago to try again"""
+        return (
+            self.error_rate < AI_ROUTER_MAX_ERROR_RATE
+            or self.last_failure_at is None
+            or time.monotonic() - self.last_failure_at > AI_ROUTER_RETRY_SECONDS
+        )
+
+
+class ProviderRouter(AIProvider):
+    """
+    Send each call to the fastest healthy provider.
+
+    Providers without latency samples are tried first so every provider gets
+    measured. When none is healthy the one with the lowest error rate is used.
+
+    Only full (non-stream) calls feed the latency average - a stream returns
+    once it opens, so its time is not comparable. Only transient errors
+    (ai_client.RETRYABLE_ERRORS) count against a provider's health; a bad
+    request says nothing about the provider.
+    """
+
+    name = "router"
+
+    def __init__(self, providers: List[AIProvider]):
+        if not providers:
+            raise ValueError("ProviderRouter needs at least one provider")
+        self.providers = providers
+        self.stats = {provider.name: ProviderStats() for provider in providers}
+        self._lock = threading.Lock()
+
+    def choose(self) -> AIProvider:
+        with self._lock:
+            healthy = [provider for provider in self.providers if self.stats[provider.name].is_healthy()]
+            if not healthy:
+                return min(self.providers, key=lambda provider: self.stats[provider.name].error_rate)
+            return min(
+                healthy,
+                key=lambda provider: self.stats[provider.name].latency if self.stats[provider.name].latency is not None else -1.0
+            )
+
+    def _record(self, provider: AIProvider, seconds: Optional[float], failed: bool) -> None:
+        with self._lock:
+            self.stats[provider.name].record(seconds, failed)
+
+    def generate_content(self, contents: Any, stream: bool = False, **kwargs) -> Any:
+        # Imported here because ai_client builds on this module
+        from app.services.ai_client import RETRYABLE_ERRORS
+
+        provider = self.choose()
+        started = time.monotonic()
+        try:
+            response = provider.generate_content(contents, stream=stream, **kwargs)
+        except RETRYABLE_ERRORS:
+            self._record(provider, None, failed=True)
+            raise
+        self._record(provider, None if stream else time.monotonic() - started, failed=False)
+        return response
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Current routing statistics per provider"""
+        with self._lock:
+            return {
+                name: {
+                    "ewma_latency_ms": round(stats.latency * 1000, 1) if stats.latency is not None else None,
+                    "ewma_error_rate": round(stats.error_rate, 3),
+                    "calls": stats.calls,
+                    "healthy": stats.is_healthy()
+                }
+                for name, stats in self.stats.items()
+            }
+
+
+# Provider name -> factory, and -> check whether its credentials are set
+_registry: Dict[str, Callable[[], AIProvider]] = {}
+_configured: Dict[str, Callable[[], bool]] = {}
+
+
+def register_provider(name: str, factory: Callable[[], AIProvider], is_configured: Callable[[], bool]) -> None:
+    """Make a provider available to AI_PROVIDER and the router"""
+    _registry[name] = factory
+    _configured[name] = is_configured
+
+
+register_provider(
+    "gemini",
+    lambda: GeminiProvider(settings.GEMINI_API_KEY, settings.GEMINI_MODEL),
+    lambda: bool(settings.GEMINI_API_KEY)
+)
+register_provider(
+    "openai",
+    lambda: OpenAIProvider(settings.OPENAI_API_KEY, settings.OPENAI_MODEL),
+    lambda: bool(settings.OPENAI_API_KEY)
+)
+
+
+def _build_live_provider(selection: str) -> AIProvider:
+    """A single registered provider, or a router over every configured one"""
+    if selection in _registry:
+        return _registry[selection]()
+
+    providers = [factory() for name, factory in _registry.items() if _configured[name]()]
+    if not providers:
+        raise ValueError("No AI provider is configured - set GEMINI_API_KEY or OPENAI_API_KEY")
+    return providers[0] if len(providers) == 1 else ProviderRouter(providers)
+
+
+_provider: Optional[AIProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_ai_provider() -> AIProvider:
+    """The provider selected by AI_PROVIDER, created on first use"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            if settings.AI_PROVIDER in ("replay", "record"):
+                _provider = ReplayProvider(
+                    settings.AI_REPLAY_DIR,
+                    latency=settings.AI_REPLAY_LATENCY,
+                    failure_rate=settings.AI_REPLAY_FAILURE_RATE,
+                    hang_rate=settings.AI_REPLAY_HANG_RATE,
+                    recorder=_build_live_provider("auto") if settings.AI_PROVIDER == "record" else None
+                )
+            else:
+                _provider = _build_live_provider(settings.AI_PROVIDER)
+            print(f"[AI Providers] Using {settings.AI_PROVIDER} provider ({_provider.name})")
+        return _provider
@@ -0,0 +1,67 @@
+"""
+AI Schemas - Response schemas for structured model output
+
+Call sites describe the JSON they expect with a small provider-neutral schema
+(a subset of JSON Schema: type, properties, items, required, nullable) and pass
+it to call_model as ``response_schema``. Each provider converts it to its own
+structured-output mode, so the model is constrained to return exactly that
+shape instead of being asked for JSON in prose.
+"""
+import copy
+from typing import Dict, Iterable
+
+# SQLAlchemy column Python type -> schema type
+_COLUMN_TYPES = {str: "string", float: "number", int: "integer", bool: "boolean"}
+
+
+def string_field(nullable: bool = False) -> Dict:
+    return {"type": "string", "nullable": True} if nullable else {"type": "string"}
+
+
+def object_schema(properties: Dict[str, Dict]) -> Dict:
+    """An object whose properties are all required (nullable ones may be null)"""
+    return {"type": "object", "properties": properties, "required": list(properties)}
+
+
+def array_schema(items: Dict) -> Dict:
+    return {"type": "array", "items": items}
+
+
+def model_fields_schema(model, fields: Iterable[str]) -> Dict:
+    """Object schema for the given columns of a SQLAlchemy model, every field nullable"""
+    columns = model.__table__.columns
+    return object_schema({
+        field: {"type": _COLUMN_TYPES.get(columns[field].type.python_type, "string"), "nullable": True}
+        for field in fields
+    })
+
+
+def to_gemini_schema(schema: Dict) -> Dict:
+    """Gemini response_schema: upper-case types, nullable kept as a flag"""
+    converted = {"type": schema["type"].upper()}
+    if schema.get("nullable"):
+        converted["nullable"] = True
+    if "properties" in schema:
+        converted["properties"] = {name: to_gemini_schema(value) for name, value in schema["properties"].items()}
+        converted["required"] = list(schema.get("required", []))
+    if "items" in schema:
+        converted["items"] = to_gemini_schema(schema["items"])
+    return converted
+
+
+def to_openai_schema(schema: Dict) -> Dict:
+    """OpenAI strict JSON schema: nullable becomes a null type, no extra properties allowed"""
+    converted = {"type": [schema["type"], "null"] if schema.get("nullable") else schema["type"]}
+    if "properties" in schema:
+        converted["properties"] = {name: to_openai_schema(value) for name, value in schema["properties"].items()}
+        # Strict mode requires every property to be listed as required
+        converted["required"] = list(schema["properties"])
+        converted["additionalProperties"] = False
+    if "items" in schema:
+        converted["items"] = to_openai_schema(schema["items"])
+    return converted
+
+
+def wrap_array_schema(schema: Dict, key: str = "items") -> Dict:
+    """Object wrapper for providers whose structured output must be an object at the root"""
+    return object_schema({key: copy.deepcopy(schema)})
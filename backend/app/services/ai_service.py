@@ -1,56 +1,53 @@
-import google.generativeai as genai
-import json
-import base64
 import os
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from app.services.image_pipeline import load_image_for_ai
 from app.services.outfit_builder import (
     build_outfit_candidates,
     validate_outfit_combination,
     categorize_item
 )
+from app.services.local_outfit_engine import (
+    generate_local_outfits,
+    rank_local_outfits,
+    describe_local_outfit,
+    repair_outfit
+)
+from app.services.batch_scoring import EncodedWardrobe
+from app.services.wardrobe_encoding import encode_wardrobe, estimate_tokens, select_items_for_budget
+from app.services.item_features import feature_dict
+from app.services.color_science import outfit_color_harmony
+from app.config import settings
+from app.services.llm_json import JsonValueStream, parse_json_object, parse_json_objects, record_parse_outcome
+from app.services.ai_client import call_model
+from app.services.ai_providers import token_usage
+from app.services.ai_schemas import array_schema, model_fields_schema, object_schema, string_field
+from app.models.clothing import ClothingItem
+from app.models.style_dna import StyleDNA
+from app.core.constants import MAX_OUTFIT_SUGGESTIONS, HYBRID_SHORTLIST_SIZE
 
-# Configure Gemini API
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY environment variable not set.")
+# Bump whenever the clothing analysis prompt changes so cached analyses are not reused
+CLOTHING_ANALYSIS_PROMPT_VERSION = "v1"
 
-genai.configure(api_key=GEMINI_API_KEY)
+# ClothingItem columns populated from a clothing analysis result
+CLOTHING_ANALYSIS_FIELDS = (
+    "category", "subcategory", "brand", "model", "color", "secondary_colors",
+    "fit_type", "silhouette", "sleeve_type", "sleeve_fit", "neckline",
+    "collar_type", "collar_closure", "texture", "fabric_type", "fabric_weight",
+    "pattern", "pattern_description", "length", "waist_type",
+    "pant_type", "pant_fit", "pant_rise", "condition", "distressing_level",
+    "occasion_tags", "style_tags", "season_tags", "special_features",
+    "detailed_description", "quality_score",
+)
 
+# Structured-output schemas derived from the ClothingItem columns they populate
+CLOTHING_ANALYSIS_RESPONSE_SCHEMA = model_fields_schema(ClothingItem, CLOTHING_ANALYSIS_FIELDS)
+CLOTHING_BATCH_ANALYSIS_RESPONSE_SCHEMA = array_schema(object_schema({
+    "image_index": {"type": "integer"},
+    **CLOTHING_ANALYSIS_RESPONSE_SCHEMA["properties"]
+}))
 
-def analyze_clothing_image(image_path: str) -> dict:
-    """
-    Analyze a clothing image and extract comprehensive attributes using Gemini Vision API.
-    """
-    
-    try:
-        # Check if file exists
-        if not os.path.exists(image_path):
-            return {
-                "analysis_successful": False,
-                "error": f"Image file not found: {image_path}"
-            }
-        
-        # Determine MIME type from file extension
-        mime_type = "image/jpeg"
-        if image_path.lower().endswith((".png", ".PNG")):
-            mime_type = "image/png"
-        elif image_path.lower().endswith((".gif", ".GIF")):
-            mime_type = "image/gif"
-        elif image_path.lower().endswith((".webp", ".WEBP")):
-            mime_type = "image/webp"
-        
-        # Read image as bytes
-        with open(image_path, "rb") as img_file:
-            image_bytes = img_file.read()
-        
-        # Encode to base64
-        image_data = base64.standard_b64encode(image_bytes).decode("utf-8")
-        
-        model = genai.GenerativeModel("gemini-3.1-flash-lite-preview")
-        
-        analysis_prompt = """Analyze this clothing/accessory/footwear item image in EXTREME DETAIL and return ONLY a valid JSON object (no markdown, no extra text).
-
-CRITICAL CONFIDENCE RULES:
+CLOTHING_ANALYSIS_RULES = """CRITICAL CONFIDENCE RULES:
 1. ONLY include brand/model if you are VERY CONFIDENT (90%+ certain)
 2. For shoes: Try to identify specific models (Air Max 90, Samba, Chuck Taylor, etc.)
 3. For watches: Try to identify models (Series 9, G-Shock GA-2100, etc.)
@@ -62,9 +59,9 @@ CONFIDENCE HIERARCHY (Apple's way):
 - High confidence: brand + model + subcategory
 - Medium confidence: brand + subcategory
 - Low confidence: just descriptive subcategory + color
-- Set null for any field you're not confident about
+- Set null for any field you're not confident about"""
 
-{
+CLOTHING_ANALYSIS_SCHEMA = """{
   "category": "main category (shirt, pants, dress, jacket, shoes, sneakers, boots, watch, bag, sunglasses, hat, jewelry, etc.)",
   "subcategory": "specific type (t-shirt, running-shoes, smartwatch, luxury-watch, backpack, tote, etc.)",
   "brand": "ONLY if 90%+ confident: Nike, Adidas, Apple, Casio, Rolex, Gucci, etc. Otherwise null",
@@ -96,46 +93,61 @@ CONFIDENCE HIERARCHY (Apple's way):
   "special_features": "pockets, hood, drawstring, belt, collar, cuffs, zip, buttons, adjustable, waterproof, touchscreen, GPS, heart-rate, etc. or null",
   "detailed_description": "A comprehensive 2-3 sentence description including brand/model only if confident",
   "quality_score": 7.5
-}
+}"""
 
-EXAMPLES OF PROPER CONFIDENCE:
+CLOTHING_ANALYSIS_EXAMPLES = """EXAMPLES OF PROPER CONFIDENCE:
 ✅ GOOD: "brand": "Adidas", "model": "Samba" (if you clearly see it's Samba)
 ✅ GOOD: "brand": "Adidas", "model": null (if you see Adidas logo but unsure of model)
 ✅ GOOD: "brand": null, "model": null (if uncertain about brand)
 ❌ BAD: "brand": "possibly Nike" (never use qualifiers - null instead)
-❌ BAD: "model": "unknown sneaker" (null instead)
+❌ BAD: "model": "unknown sneaker" (null instead)"""
+
+CLOTHING_ANALYSIS_PROMPT = f"""Analyze this clothing/accessory/footwear item image in EXTREME DETAIL and return ONLY a valid JSON object (no markdown, no extra text).
 
-Return ONLY valid JSON. Start with { and end with }."""
+{CLOTHING_ANALYSIS_RULES}
+
+{CLOTHING_ANALYSIS_SCHEMA}
+
+{CLOTHING_ANALYSIS_EXAMPLES}
+
+Return ONLY valid JSON. Start with {{ and end with }}."""
+
+
+def analyze_clothing_image(image_path: str) -> dict:
+    """
+    Analyze a clothing image and extract comprehensive attributes using Gemini Vision API.
+    """
+    
+    try:
+        # Check if file exists
+        if not os.path.exists(image_path):
+            return {
+                "analysis_successful": False,
+                "error": f"Image file not found: {image_path}"
+            }
+        
+        # Load image (auto-oriented, metadata stripped, downscaled)
+        image_part = load_image_for_ai(image_path)
+        
+        analysis_prompt = CLOTHING_ANALYSIS_PROMPT
         
         # Call Gemini with image
-        response = model.generate_content([
-            {
-                "mime_type": mime_type,
-                "data": image_data,
-            },
+        response = call_model([
+            image_part,
             analysis_prompt
-        ])
+        ], call_name="clothing_analysis", response_schema=CLOTHING_ANALYSIS_RESPONSE_SCHEMA)
         
         # Get response text
         response_text = response.text.strip()
         
-        # Try to parse as JSON
-        try:
-            if response_text.startswith("{"):
-                clothing_data = json.loads(response_text)
-                clothing_data["analysis_successful"] = True
-                return clothing_data
-            else:
-                # Try to find JSON in response
-                start_idx = response_text.find("{")
-                end_idx = response_text.rfind("}") + 1
-                if start_idx != -1 and end_idx > start_idx:
-                    clothing_data = json.loads(response_text[start_idx:end_idx])
-                    clothing_data["analysis_successful"] = True
-                    return clothing_data
-        except json.JSONDecodeError as e:
-            print(f"JSON Parse Error: {e}")
-            print(f"Response: {response_text[:500]}")
+        # Parse JSON (tolerates markdown fences and surrounding prose)
+        clothing_data = parse_json_object(response_text)
+        record_parse_outcome("clothing_analysis", clothing_data is not None)
+        if clothing_data is not None:
+            clothing_data["analysis_successful"] = True
+            return clothing_data
+        
+        print(f"JSON Parse Error - Response: {response_text[:500]}")
         
         return {
             "analysis_successful": False,
@@ -156,6 +168,79 @@ Return ONLY valid JSON. Start with { and end with }."""
         }
 
 
+def analyze_clothing_images_batch(image_paths: list) -> list:
+    """
+    Analyze several clothing images in a single Gemini Vision request.
+    
+    The analysis rules and schema are sent once for the whole batch and the model
+    returns a JSON array keyed by image index. Any image whose result is missing or
+    unparseable is re-analyzed on its own with analyze_clothing_image.
+    
+    Returns:
+        List of analysis results aligned with image_paths
+    """
+    results = [None] * len(image_paths)
+    
+    # Load every image that exists; missing files fail immediately
+    content = []
+    batch_indices = []
+    for idx, image_path in enumerate(image_paths):
+        if not os.path.exists(image_path):
+            results[idx] = {
+                "analysis_successful": False,
+                "error": f"Image file not found: {image_path}"
+            }
+            continue
+        content.append(f"Image {idx}:")
+        content.append(load_image_for_ai(image_path))
+        batch_indices.append(idx)
+    
+    if len(batch_indices) == 1:
+        idx = batch_indices[0]
+        results[idx] = analyze_clothing_image(image_paths[idx])
+        return results
+    
+    if batch_indices:
+        batch_prompt = f"""Analyze each of the {len(batch_indices)} clothing/accessory/footwear item images above in EXTREME DETAIL. Each image is preceded by its label "Image N:".
+
+{CLOTHING_ANALYSIS_RULES}
+
+Return ONLY a valid JSON array (no markdown, no extra text) with exactly one object per image. Each object MUST include "image_index" (the N from the image label) plus these fields:
+
+{CLOTHING_ANALYSIS_SCHEMA}
+
+{CLOTHING_ANALYSIS_EXAMPLES}
+
+Return ONLY the JSON array. Start with [ and end with ]."""
+        content.append(batch_prompt)
+        
+        try:
+            response = call_model(
+                content,
+                call_name="clothing_analysis_batch",
+                response_schema=CLOTHING_BATCH_ANALYSIS_RESPONSE_SCHEMA
+            )
+            response_text = response.text.strip()
+            
+            for clothing_data in parse_json_objects(response_text):
+                idx = clothing_data.pop("image_index", None)
+                if isinstance(idx, int) and idx in batch_indices and results[idx] is None:
+                    clothing_data["analysis_successful"] = True
+                    results[idx] = clothing_data
+            # One outcome per image, so single and batched analysis rates compare directly
+            for idx in batch_indices:
+                record_parse_outcome("clothing_analysis_batch", results[idx] is not None)
+        except Exception as e:
+            print(f"[AI Service] Batch analysis failed, falling back to single-image calls: {str(e)}")
+    
+    # Fall back to one call per image for anything the batch did not answer
+    for idx in batch_indices:
+        if results[idx] is None:
+            results[idx] = analyze_clothing_image(image_paths[idx])
+    
+    return results
+
+
 def calculate_outfit_score(
     outfit_items: list, 
     occasion: str, 
@@ -225,8 +310,8 @@ def calculate_outfit_score(
         quality = item.get('quality_score', 7.0)
         quality_score += (quality / 10.0) * (15.0 / len(outfit_items))
     
-    # 4. Color Coordination (10% weight, same)
-    color_score = 10.0  # Default to full score (assume AI already checked this)
+    # 4. Color Coordination (10% weight, same) - mean Lab pair harmony of the primary colors
+    color_score = 10.0 * outfit_color_harmony(outfit_items)
     
     # Base score (total: 80 points)
     base_score = occasion_score + style_score + quality_score + color_score
@@ -265,191 +350,27 @@ def calculate_outfit_score(
     return round(max(0, score), 2)
 
 
-def generate_outfit_suggestions(
-    clothing_list: list, 
-    occasion: str = "casual", 
-    style_dna: dict = None, 
-    previous_suggestions: str = None,
-    underused_items: list = None,
-    recent_combinations: list = None,
-    force_include_item_ids: list = None
-) -> list:
-    """
-    Generate outfit suggestions using Gemini 2.0-Flash model.
-    Enhanced with usage stats to promote wardrobe diversity and novelty.
-    
-    Args:
-        clothing_list: List of available clothing items with their IDs and descriptions
-        occasion: The occasion for the outfit (casual, formal, business, party, etc.)
-        style_dna: User's style preferences dictionary
-        previous_suggestions: Previous outfit combinations to avoid
-        underused_items: List of underutilized items to prioritize
-        recent_combinations: Recent outfit combinations to avoid repeating
-        force_include_item_ids: List of item IDs that MUST be included in every outfit
-    
-    Returns:
-        List of outfit suggestions in JSON format with proper structure, sorted by enhanced relevance score
-    """
-    
-    try:
-        # Format the clothing items for the prompt
-        clothing_descriptions = []
-        for item in clothing_list:
-            default_desc = f"{item.get('category')} - {item.get('color')}"
-            desc = f"ID: {item.get('id')}, {item.get('detailed_description', default_desc)}"
-            clothing_descriptions.append(desc)
-        
-        clothing_text = "\n".join(clothing_descriptions)
-        
-        print(f"\n[AI Service] Generating outfits for: {occasion}")
-        print(f"[AI Service] Available items count: {len(clothing_list)}")
-        print(f"[AI Service] Item IDs available: {[item.get('id') for item in clothing_list]}")
-        
-        # Build style preferences context
-        style_context = ""
-        if style_dna:
-            style_prefs = []
-            if style_dna.get('custom_preferences'):
-                style_prefs.append(f"Personal Preferences: {style_dna['custom_preferences']}")
-            if style_dna.get('body_type'):
-                style_prefs.append(f"Body type: {style_dna['body_type']}")
-            if style_dna.get('skin_tone'):
-                style_prefs.append(f"Skin tone: {style_dna['skin_tone']}")
-            if style_dna.get('favorite_colors'):
-                style_prefs.append(f"Favorite colors: {style_dna['favorite_colors']}")
-            if style_dna.get('avoid_colors'):
-                style_prefs.append(f"Colors to avoid: {style_dna['avoid_colors']}")
-            if style_dna.get('style_preferences'):
-                style_prefs.append(f"Preferred styles: {style_dna['style_preferences']}")
-            if style_dna.get('fit_preference'):
-                style_prefs.append(f"Preferred fit: {style_dna['fit_preference']}")
-            if style_dna.get('preferred_patterns'):
-                style_prefs.append(f"Preferred patterns: {style_dna['preferred_patterns']}")
-            if style_dna.get('avoid_patterns'):
-                style_prefs.append(f"Patterns to avoid: {style_dna['avoid_patterns']}")
-            if style_dna.get('formality_level'):
-                style_prefs.append(f"Formality preference: {style_dna['formality_level']}")
-            
-            if style_prefs:
-                style_context = "\n\nUser's Style Preferences:\n" + "\n".join(style_prefs)
-        
-        # Add previous suggestions context to avoid duplicates
-        avoid_context = ""
-        if previous_suggestions:
-            avoid_context = f"\n\nIMPORTANT: The user has already seen these outfit combinations. Create COMPLETELY DIFFERENT outfits:\n{previous_suggestions}\n\nDo NOT repeat any of these combinations. Use different items, different color schemes, and different styling approaches."
-        
-        # Add underused items context for wardrobe coverage
-        underused_context = ""
-        if underused_items and len(underused_items) > 0:
-            underused_descriptions = []
-            for item in underused_items:
-                desc = f"ID {item.get('id')}: {item.get('category')}"
-                if item.get('brand'):
-                    desc += f" - {item.get('brand')}"
-                if item.get('color'):
-                    desc += f" ({item.get('color')})"
-                underused_descriptions.append(desc)
-            
-            underused_context = f"\n\n🎯 PRIORITIZE THESE UNDERUSED ITEMS (if stylistically appropriate):\n" + "\n".join(underused_descriptions) + "\n\nThese items haven't been featured recently. Try to include at least ONE in each outfit if it fits the aesthetic and occasion."
-        
-        if recent_combinations and len(recent_combinations) > 0:
-            from app.services.usage_stats_service import format_recent_combinations_for_prompt
-            formatted_recent = format_recent_combinations_for_prompt(recent_combinations)
-            recent_avoid_context = f"\n\n⚠️ AVOID REPEATING THESE RECENT COMBINATIONS:\nRecent item ID sets: {formatted_recent}\n\nDo NOT use the same 3+ items together that appear in these recent outfits."
-
-        # Add forced items context with detailed styling guidance
-        forced_context = ""
-        if force_include_item_ids:
-            from app.services.outfit_builder import categorize_item
-            
-            forced_items_desc = []
-            forced_item_details = []
-            for item in clothing_list:
-                if item.get('id') in force_include_item_ids:
-                    # Determine slot for the forced item
-                    item_slot = categorize_item(item)
-                    slot_name_map = {
-                        'base_top': 'BASE TOP',
-                        'layer': 'LAYER',
-                        'bottom': 'BOTTOM',
-                        'shoes': 'SHOES',
-                        'accessory': 'ACCESSORY'
-                    }
-                    
-                    # Build detailed description for AI context
-                    desc = f"ID {item.get('id')}: {item.get('category')}"
-                    if item.get('brand'):
-                        desc += f" by {item.get('brand')}"
-                    if item.get('model'):
-                        desc += f" ({item.get('model')})"
-                    desc += f" - {item.get('color')}"
-                    if item.get('pattern') and item.get('pattern') != 'solid':
-                        desc += f", {item.get('pattern')} pattern"
-                    if item.get('style_tags'):
-                        desc += f" [{item.get('style_tags')}]"
-                    desc += f" **SLOT: {slot_name_map.get(item_slot, item_slot)}**"
-                    
-                    forced_items_desc.append(desc)
-                    forced_item_details.append((item, item_slot))
-            
-            # Build slot warning based on forced item type
-            slot_warnings = []
-            for item, slot in forced_item_details:
-                if slot == 'base_top':
-                    slot_warnings.append("🚨🚨🚨 CRITICAL: This is a BASE TOP (shirt/tee/blouse)")
-                    slot_warnings.append("❌ DO NOT ADD: another shirt, t-shirt, polo, sweater, or any other BASE TOP")
-                    slot_warnings.append("✅ YOU MAY ADD: jacket/blazer (as LAYER), + pants + shoes + accessories")
-                elif slot == 'layer':
-                    slot_warnings.append("🚨🚨🚨 CRITICAL: This is a LAYER (jacket/blazer/coat)")
-                    slot_warnings.append("❌ DO NOT ADD: another jacket, blazer, or coat")
-                    slot_warnings.append("✅ YOU MUST ADD: shirt/tee underneath (BASE TOP), + pants + shoes")
-                elif slot == 'bottom':
-                    slot_warnings.append("🚨🚨🚨 CRITICAL: This is a BOTTOM (pants/jeans/skirt)")
-                    slot_warnings.append("❌ DO NOT ADD: another pants, jeans, or shorts")
-                    slot_warnings.append("✅ YOU MUST ADD: shirt/tee (BASE TOP), + shoes + optional jacket")
-                elif slot == 'shoes':
-                    slot_warnings.append("🚨🚨🚨 CRITICAL: These are SHOES")
-                    slot_warnings.append("❌ DO NOT ADD: another pair of shoes")
-                    slot_warnings.append("✅ YOU MUST ADD: shirt/tee (BASE TOP), + pants (BOTTOM)")
-            
-            # Create context that encourages thoughtful outfit building
-            forced_context = f"""
-
-🚨 FEATURED ITEM - BUILD OUTFITS AROUND THIS:
-{chr(10).join(forced_items_desc)}
-
-{chr(10).join(slot_warnings)}
-
-⚠️ OUTFIT STRUCTURE RULE (NEVER VIOLATE THIS):
-- EXACTLY ONE item from each required slot
-- BASE TOP slot = shirt OR tee OR polo OR sweater OR blouse (pick ONE only)
-- LAYER slot = jacket OR blazer OR coat OR cardigan (optional, max ONE)  
-- BOTTOM slot = pants OR jeans OR shorts OR skirt (pick ONE only)
-- SHOES slot = one pair of footwear (pick ONE only)
-- ACCESSORIES = watch, jewelry, belt, etc. (optional, 0-2 items)
+# Outfit generation response: the 4-field outfit format the prompts describe
+OUTFIT_RESPONSE_SCHEMA = array_schema(object_schema({
+    "outfit_name": string_field(),
+    "description": string_field(),
+    "item_ids": array_schema({"type": "integer"}),
+    "styling_tips": string_field()
+}))
 
-CRITICAL STYLING RULES FOR FEATURED ITEM:
-1. This item MUST be the star/focal point of EVERY outfit
-2. Build complementary pieces around it - don't compete with it
-3. If the featured item is bold/patterned: pair with solid neutrals
-4. If the featured item is neutral/basic: add interest through layering or accessories
-5. Consider the item's formality level and match other pieces accordingly
-6. Think about color harmony - use the color wheel (complementary, analogous, or monochromatic)
-7. Create DISTINCT outfits - vary the vibe (casual→smart casual→elevated casual)
+# Hybrid generation response: picks from the local candidate shortlist by index
+HYBRID_PICKS_RESPONSE_SCHEMA = array_schema(object_schema({
+    "candidate_index": {"type": "integer"},
+    "outfit_name": string_field(),
+    "description": string_field(),
+    "styling_tips": string_field()
+}))
 
-THINK LIKE A PROFESSIONAL STYLIST:
-- Outfit 1: Most wearable, everyday option
-- Outfit 2: Slightly elevated, date/dinner appropriate
-- Outfit 3: Creative/fashion-forward interpretation
-
-Each outfit should showcase a DIFFERENT way to wear this item!"""
-        
-        prompt = f"""You are an elite personal stylist with 20+ years of experience working with celebrities, fashion weeks, and luxury brands. You have an impeccable eye for style, color theory, proportions, and modern fashion trends. Your expertise spans from timeless classic looks to cutting-edge contemporary fashion.
 
-Your mission: Create 3 EXCEPTIONAL outfit combinations for a {occasion} occasion that will make the wearer look and feel their absolute best.
-
-Available clothing items:
-{clothing_text}{style_context}{avoid_context}{underused_context}{recent_avoid_context}{forced_context}
+# Static stylist rules, sent as the system instruction of outfit generation requests
+# (cacheable provider-side); bump the version whenever the text changes
+OUTFIT_STYLIST_INSTRUCTION_VERSION = "v1"
+OUTFIT_STYLIST_INSTRUCTION = """You are an elite personal stylist with 20+ years of experience working with celebrities, fashion weeks, and luxury brands. You have an impeccable eye for style, color theory, proportions, and modern fashion trends. Your expertise spans from timeless classic looks to cutting-edge contemporary fashion.
 
 STYLING PHILOSOPHY:
 - Every outfit should tell a cohesive story
@@ -660,22 +581,389 @@ For each outfit:
 CRITICAL: Return ONLY a JSON array with no other text. The response MUST start with '[' and end with ']'.
 
 Format: [
-  {{
+  {
     "outfit_name": "Clean, evocative name (2-4 words)",
     "description": "Why this outfit works - mention color harmony, proportion balance, and occasion fit",
     "item_ids": [id1, id2, id3, id4, id5],
     "styling_tips": "One professional tip: tucking, rolling, posture, or how to wear it best"
-  }},
-  {{...}},
-  {{...}}
+  },
+  {...},
+  {...}
 ]
 
 Each outfit MUST have exactly these 4 fields: outfit_name, description, item_ids, styling_tips.
 item_ids MUST be an array of numbers.
 Return ONLY the JSON array, no markdown, no code blocks, no explanation."""
 
-        model = genai.GenerativeModel("gemini-3.1-flash-lite-preview")
-        response = model.generate_content(prompt)
+
+def items_for_ai(clothing_items: List[ClothingItem]) -> List[dict]:
+    """Serialize clothing items into the dicts the outfit generators expect"""
+    return [
+        {
+            "id": item.id,
+            "category": item.category,
+            "subcategory": item.subcategory,
+            "color": item.color,
+            "style_tags": item.style_tags,
+            "occasion_tags": item.occasion_tags,
+            "season_tags": item.season_tags,
+            "fit_type": item.fit_type,
+            "pattern": item.pattern,
+            **feature_dict(item)
+        }
+        for item in clothing_items
+    ]
+
+
+def style_dna_for_ai(style_dna: Optional[StyleDNA]) -> Optional[dict]:
+    """Serialize a user's Style DNA for the outfit generators"""
+    if not style_dna:
+        return None
+    return {
+        "custom_preferences": style_dna.custom_preferences,
+        "body_type": style_dna.body_type,
+        "skin_tone": style_dna.skin_tone,
+        "favorite_colors": style_dna.favorite_colors,
+        "avoid_colors": style_dna.avoid_colors,
+        "style_preferences": style_dna.style_preferences,
+        "fit_preference": style_dna.fit_preference,
+        "preferred_patterns": style_dna.preferred_patterns,
+        "avoid_patterns": style_dna.avoid_patterns,
+        "formality_level": style_dna.formality_level
+    }
+
+
+def _format_style_context(style_dna: dict) -> str:
+    """Format the user's Style DNA as a prompt section ("" when there is none)"""
+    style_context = ""
+    if style_dna:
+        style_prefs = []
+        if style_dna.get('custom_preferences'):
+            style_prefs.append(f"Personal Preferences: {style_dna['custom_preferences']}")
+        if style_dna.get('body_type'):
+            style_prefs.append(f"Body type: {style_dna['body_type']}")
+        if style_dna.get('skin_tone'):
+            style_prefs.append(f"Skin tone: {style_dna['skin_tone']}")
+        if style_dna.get('favorite_colors'):
+            style_prefs.append(f"Favorite colors: {style_dna['favorite_colors']}")
+        if style_dna.get('avoid_colors'):
+            style_prefs.append(f"Colors to avoid: {style_dna['avoid_colors']}")
+        if style_dna.get('style_preferences'):
+            style_prefs.append(f"Preferred styles: {style_dna['style_preferences']}")
+        if style_dna.get('fit_preference'):
+            style_prefs.append(f"Preferred fit: {style_dna['fit_preference']}")
+        if style_dna.get('preferred_patterns'):
+            style_prefs.append(f"Preferred patterns: {style_dna['preferred_patterns']}")
+        if style_dna.get('avoid_patterns'):
+            style_prefs.append(f"Patterns to avoid: {style_dna['avoid_patterns']}")
+        if style_dna.get('formality_level'):
+            style_prefs.append(f"Formality preference: {style_dna['formality_level']}")
+        
+        if style_prefs:
+            style_context = "\n\nUser's Style Preferences:\n" + "\n".join(style_prefs)
+    
+    return style_context
+
+
+def _log_outfit_token_usage(response, prompt: str) -> None:
+    """Report the per-request prompt size next to the static instruction it no longer repeats"""
+    usage = token_usage(response)
+    print(
+        f"[AI Service] Outfit prompt: {len(prompt)} chars per request + "
+        f"{len(OUTFIT_STYLIST_INSTRUCTION)} chars system instruction {OUTFIT_STYLIST_INSTRUCTION_VERSION}"
+    )
+    if usage:
+        print(
+            f"[AI Service] Tokens: {usage['prompt_tokens']} prompt "
+            f"({usage['cached_tokens']} served from cache, {usage['prompt_tokens'] - usage['cached_tokens']} billed in full), "
+            f"{usage['output_tokens']} output"
+        )
+
+
+class OutfitSuggestions(list):
+    """
+    A list of outfit suggestions that records whether the AI failed.
+
+    degraded is True when the AI call errored or its response could not be
+    parsed and the outfits came from the local engine instead. Callers must
+    not cache such results as AI suggestions.
+    """
+
+    def __init__(self, outfits=(), degraded: bool = False):
+        super().__init__(outfits)
+        self.degraded = degraded
+
+
+def is_degraded(suggestions) -> bool:
+    """Whether suggestions are a local fallback for a failed AI call"""
+    return getattr(suggestions, "degraded", False)
+
+
+def _generate_local_fallback(
+    clothing_list: list,
+    occasion: str,
+    style_dna: dict,
+    underused_items: list,
+    recent_combinations: list,
+    force_include_item_ids: list,
+    top_k: int = MAX_OUTFIT_SUGGESTIONS,
+    season: str = None
+) -> list:
+    """Build outfits with the local engine when Gemini errors, times out or returns garbage"""
+    try:
+        return generate_local_outfits(
+            clothing_list, occasion, style_dna, underused_items, recent_combinations, force_include_item_ids, top_k,
+            season
+        )
+    except Exception as e:
+        print(f"[AI Service] Local outfit engine failed: {str(e)}")
+        return []
+
+
+def _top_up_with_local(
+    outfits: list,
+    clothing_list: list,
+    occasion: str,
+    style_dna: dict,
+    underused_items: list,
+    recent_combinations: list,
+    force_include_item_ids: list,
+    season: str = None
+) -> list:
+    """Add distinct local-engine outfits until MAX_OUTFIT_SUGGESTIONS are returned, without another AI call"""
+    missing = MAX_OUTFIT_SUGGESTIONS - len(outfits)
+    if missing <= 0:
+        return outfits
+    
+    seen = {frozenset(outfit.get('item_ids', [])) for outfit in outfits}
+    topped_up = list(outfits)
+    # Ask for extra candidates since some may repeat an AI outfit
+    for outfit in _generate_local_fallback(
+        clothing_list, occasion, style_dna, underused_items, recent_combinations, force_include_item_ids,
+        MAX_OUTFIT_SUGGESTIONS + len(outfits), season
+    ):
+        if len(topped_up) >= MAX_OUTFIT_SUGGESTIONS:
+            break
+        if frozenset(outfit['item_ids']) not in seen:
+            seen.add(frozenset(outfit['item_ids']))
+            topped_up.append(outfit)
+    
+    if len(topped_up) > len(outfits):
+        print(f"[AI Service] Topped up with {len(topped_up) - len(outfits)} local outfit(s)")
+    return topped_up
+
+
+def build_outfit_prompt(
+    clothing_list: list,
+    occasion: str = "casual",
+    style_dna: dict = None,
+    previous_suggestions: str = None,
+    underused_items: list = None,
+    recent_combinations: list = None,
+    force_include_item_ids: list = None,
+    season: str = None
+) -> str:
+    """Build the full-wardrobe outfit generation prompt (args as generate_outfit_suggestions)"""
+    print(f"\n[AI Service] Generating outfits for: {occasion}")
+    print(f"[AI Service] Available items count: {len(clothing_list)}")
+    
+    if settings.AI_WARDROBE_ENCODING == "compact":
+        # Legend + fixed-width coded lines, trimmed to the most relevant items over budget
+        underused_ids = {item.get('id') for item in underused_items} if underused_items else set()
+        prompt_items = select_items_for_budget(
+            clothing_list, settings.AI_WARDROBE_TOKEN_BUDGET, occasion, season, underused_ids, force_include_item_ids
+        )
+        clothing_text = encode_wardrobe(prompt_items)
+        if len(prompt_items) < len(clothing_list):
+            print(f"[AI Service] Token budget: listing {len(prompt_items)} of {len(clothing_list)} items")
+    else:
+        # Format the clothing items for the prompt
+        clothing_descriptions = []
+        for item in clothing_list:
+            default_desc = f"{item.get('category')} - {item.get('color')}"
+            desc = f"ID: {item.get('id')}, {item.get('detailed_description', default_desc)}"
+            clothing_descriptions.append(desc)
+        
+        clothing_text = "\n".join(clothing_descriptions)
+    
+    listing_note = " (coded - see legend; use the numeric IDs in item_ids)" if settings.AI_WARDROBE_ENCODING == "compact" else ""
+    print(f"[AI Service] Wardrobe listing: ~{estimate_tokens(clothing_text)} tokens ({settings.AI_WARDROBE_ENCODING} encoding)")
+    
+    # Build style preferences context
+    style_context = _format_style_context(style_dna)
+    
+    # Add previous suggestions context to avoid duplicates
+    avoid_context = ""
+    if previous_suggestions:
+        avoid_context = f"\n\nIMPORTANT: The user has already seen these outfit combinations. Create COMPLETELY DIFFERENT outfits:\n{previous_suggestions}\n\nDo NOT repeat any of these combinations. Use different items, different color schemes, and different styling approaches."
+    
+    # Add underused items context for wardrobe coverage
+    underused_context = ""
+    if underused_items and len(underused_items) > 0:
+        underused_descriptions = []
+        for item in underused_items:
+            desc = f"ID {item.get('id')}: {item.get('category')}"
+            if item.get('brand'):
+                desc += f" - {item.get('brand')}"
+            if item.get('color'):
+                desc += f" ({item.get('color')})"
+            underused_descriptions.append(desc)
+        
+        underused_context = f"\n\n🎯 PRIORITIZE THESE UNDERUSED ITEMS (if stylistically appropriate):\n" + "\n".join(underused_descriptions) + "\n\nThese items haven't been featured recently. Try to include at least ONE in each outfit if it fits the aesthetic and occasion."
+    
+    recent_avoid_context = ""
+    if recent_combinations and len(recent_combinations) > 0:
+        from app.services.usage_stats_service import format_recent_combinations_for_prompt
+        formatted_recent = format_recent_combinations_for_prompt(recent_combinations)
+        recent_avoid_context = f"\n\n⚠️ AVOID REPEATING THESE RECENT COMBINATIONS:\nRecent item ID sets: {formatted_recent}\n\nDo NOT use the same 3+ items together that appear in these recent outfits."
+
+    # Add forced items context with detailed styling guidance
+    forced_context = ""
+    if force_include_item_ids:
+        from app.services.outfit_builder import categorize_item
+        
+        forced_items_desc = []
+        forced_item_details = []
+        for item in clothing_list:
+            if item.get('id') in force_include_item_ids:
+                # Determine slot for the forced item
+                item_slot = categorize_item(item)
+                slot_name_map = {
+                    'base_top': 'BASE TOP',
+                    'layer': 'LAYER',
+                    'bottom': 'BOTTOM',
+                    'shoes': 'SHOES',
+                    'accessory': 'ACCESSORY'
+                }
+                
+                # Build detailed description for AI context
+                desc = f"ID {item.get('id')}: {item.get('category')}"
+                if item.get('brand'):
+                    desc += f" by {item.get('brand')}"
+                if item.get('model'):
+                    desc += f" ({item.get('model')})"
+                desc += f" - {item.get('color')}"
+                if item.get('pattern') and item.get('pattern') != 'solid':
+                    desc += f", {item.get('pattern')} pattern"
+                if item.get('style_tags'):
+                    desc += f" [{item.get('style_tags')}]"
+                desc += f" **SLOT: {slot_name_map.get(item_slot, item_slot)}**"
+                
+                forced_items_desc.append(desc)
+                forced_item_details.append((item, item_slot))
+        
+        # Build slot warning based on forced item type
+        slot_warnings = []
+        for item, slot in forced_item_details:
+            if slot == 'base_top':
+                slot_warnings.append("🚨🚨🚨 CRITICAL: This is a BASE TOP (shirt/tee/blouse)")
+                slot_warnings.append("❌ DO NOT ADD: another shirt, t-shirt, polo, sweater, or any other BASE TOP")
+                slot_warnings.append("✅ YOU MAY ADD: jacket/blazer (as LAYER), + pants + shoes + accessories")
+            elif slot == 'layer':
+                slot_warnings.append("🚨🚨🚨 CRITICAL: This is a LAYER (jacket/blazer/coat)")
+                slot_warnings.append("❌ DO NOT ADD: another jacket, blazer, or coat")
+                slot_warnings.append("✅ YOU MUST ADD: shirt/tee underneath (BASE TOP), + pants + shoes")
+            elif slot == 'bottom':
+                slot_warnings.append("🚨🚨🚨 CRITICAL: This is a BOTTOM (pants/jeans/skirt)")
+                slot_warnings.append("❌ DO NOT ADD: another pants, jeans, or shorts")
+                slot_warnings.append("✅ YOU MUST ADD: shirt/tee (BASE TOP), + shoes + optional jacket")
+            elif slot == 'shoes':
+                slot_warnings.append("🚨🚨🚨 CRITICAL: These are SHOES")
+                slot_warnings.append("❌ DO NOT ADD: another pair of shoes")
+                slot_warnings.append("✅ YOU MUST ADD: shirt/tee (BASE TOP), + pants (BOTTOM)")
+        
+        # Create context that encourages thoughtful outfit building
+        forced_context = f"""
+
+🚨 FEATURED ITEM - BUILD OUTFITS AROUND THIS:
+{chr(10).join(forced_items_desc)}
+
+{chr(10).join(slot_warnings)}
+
+⚠️ OUTFIT STRUCTURE RULE (NEVER VIOLATE THIS):
+- EXACTLY ONE item from each required slot
+- BASE TOP slot = shirt OR tee OR polo OR sweater OR blouse (pick ONE only)
+- LAYER slot = jacket OR blazer OR coat OR cardigan (optional, max ONE)  
+- BOTTOM slot = pants OR jeans OR shorts OR skirt (pick ONE only)
+- SHOES slot = one pair of footwear (pick ONE only)
+- ACCESSORIES = watch, jewelry, belt, etc. (optional, 0-2 items)
+
+CRITICAL STYLING RULES FOR FEATURED ITEM:
+1. This item MUST be the star/focal point of EVERY outfit
+2. Build complementary pieces around it - don't compete with it
+3. If the featured item is bold/patterned: pair with solid neutrals
+4. If the featured item is neutral/basic: add interest through layering or accessories
+5. Consider the item's formality level and match other pieces accordingly
+6. Think about color harmony - use the color wheel (complementary, analogous, or monochromatic)
+7. Create DISTINCT outfits - vary the vibe (casual→smart casual→elevated casual)
+
+THINK LIKE A PROFESSIONAL STYLIST:
+- Outfit 1: Most wearable, everyday option
+- Outfit 2: Slightly elevated, date/dinner appropriate
+- Outfit 3: Creative/fashion-forward interpretation
+
+Each outfit should showcase a DIFFERENT way to wear this item!"""
+    
+    prompt = f"""Your mission: Create 3 EXCEPTIONAL outfit combinations for a {occasion} occasion that will make the wearer look and feel their absolute best.
+
+Available clothing items{listing_note}:
+{clothing_text}{style_context}{avoid_context}{underused_context}{recent_avoid_context}{forced_context}
+
+Follow the slot structure, color, pattern, formality and accessory rules from your instructions.
+Return ONLY the JSON array in the required format."""
+    
+    return prompt
+
+
+def generate_outfit_suggestions(
+    clothing_list: list, 
+    occasion: str = "casual", 
+    style_dna: dict = None, 
+    previous_suggestions: str = None,
+    underused_items: list = None,
+    recent_combinations: list = None,
+    force_include_item_ids: list = None,
+    season: str = None
+) -> list:
+    """
+    Generate outfit suggestions using Gemini 2.0-Flash model.
+    Enhanced with usage stats to promote wardrobe diversity and novelty.
+    
+    Args:
+        clothing_list: List of available clothing items with their IDs and descriptions
+        occasion: The occasion for the outfit (casual, formal, business, party, etc.)
+        style_dna: User's style preferences dictionary
+        previous_suggestions: Previous outfit combinations to avoid
+        underused_items: List of underutilized items to prioritize
+        recent_combinations: Recent outfit combinations to avoid repeating
+        force_include_item_ids: List of item IDs that MUST be included in every outfit
+        season: Optional season, used to keep the most relevant items when the wardrobe is trimmed to the prompt budget
+                and to pre-filter items for local outfits and repairs
+    
+    Returns:
+        List of outfit suggestions in JSON format with proper structure, sorted by enhanced relevance score.
+        When the AI fails, an OutfitSuggestions list of local-engine outfits marked degraded.
+    """
+    
+    try:
+        prompt = build_outfit_prompt(
+            clothing_list,
+            occasion,
+            style_dna,
+            previous_suggestions,
+            underused_items,
+            recent_combinations,
+            force_include_item_ids,
+            season
+        )
+
+        response = call_model(
+            prompt,
+            call_name="outfit_generation",
+            system_instruction=OUTFIT_STYLIST_INSTRUCTION,
+            response_schema=OUTFIT_RESPONSE_SCHEMA
+        )
+        _log_outfit_token_usage(response, prompt)
         
         response_text = response.text.strip()
         print(f"\n[AI Service] Generated outfit suggestions for occasion: {occasion}")
@@ -689,102 +977,66 @@ Return ONLY the JSON array, no markdown, no code blocks, no explanation."""
         # Prepare scoring context
         underused_ids = set(item.get('id') for item in underused_items) if underused_items else set()
         
-        # Extract JSON array from response
-        if response_text.startswith("["):
-            try:
-                outfits = json.loads(response_text)
-                if isinstance(outfits, list):
-                    # Validate and filter outfits
-                    valid_outfits = []
-                    for outfit in outfits:
-                        item_ids = outfit.get('item_ids', [])
-                        print(f"[AI Service] Outfit '{outfit.get('outfit_name')}' item_ids: {item_ids}")
-                        outfit_items = [item for item in clothing_list if item.get('id') in item_ids]
-                        
-                        # Validate outfit structure
-                        is_valid, error_msg = validate_outfit_combination(outfit_items)
-                        if is_valid:
-                            score = calculate_outfit_score(outfit_items, occasion, underused_ids, recent_combinations, force_include_item_ids)
-                            valid_outfits.append((score, outfit))
-                            print(f"[AI Service] ✅ Valid outfit: {outfit.get('outfit_name')} (score: {score})")
-                        else:
-                            print(f"[AI Service] ❌ Invalid outfit: {outfit.get('outfit_name')} - {error_msg}")
-                    
-                    # Sort by score (descending)
-                    valid_outfits.sort(key=lambda x: x[0], reverse=True)
-                    
-                    # Return valid outfits without scores
-                    return [outfit for score, outfit in valid_outfits] if valid_outfits else [{
-                        "outfit_name": "Unable to generate",
-                        "description": "No valid outfit combinations found with current wardrobe",
-                        "item_ids": [],
-                        "styling_tips": ""
-                    }]
-            except json.JSONDecodeError:
-                pass
-        
-        # Try to find the JSON array in the response
-        start_idx = response_text.find("[")
-        end_idx = response_text.rfind("]") + 1
-        
-        if start_idx != -1 and end_idx > start_idx:
-            try:
-                outfits = json.loads(response_text[start_idx:end_idx])
-                if isinstance(outfits, list):
-                    # Validate and filter outfits
-                    valid_outfits = []
-                    for outfit in outfits:
-                        item_ids = outfit.get('item_ids', [])
-                        outfit_items = [item for item in clothing_list if item.get('id') in item_ids]
-                        
-                        # Validate outfit structure
-                        is_valid, error_msg = validate_outfit_combination(outfit_items)
-                        if is_valid:
-                            score = calculate_outfit_score(outfit_items, occasion, underused_ids, recent_combinations, force_include_item_ids)
-                            valid_outfits.append((score, outfit))
-                        else:
-                            print(f"[AI Service] ❌ Invalid outfit: {outfit.get('outfit_name')} - {error_msg}")
-                    
-                    # Sort by score (descending)
-                    valid_outfits.sort(key=lambda x: x[0], reverse=True)
-                    
-                    # Return valid outfits without scores
-                    return [outfit for score, outfit in valid_outfits] if valid_outfits else [{
-                        "outfit_name": "Unable to generate",
-                        "description": "No valid outfit combinations found with current wardrobe",
-                        "item_ids": [],
-                        "styling_tips": ""
-                    }]
-            except json.JSONDecodeError:
-                pass
-        
-        # Fallback: Try to extract outfit objects using regex
-        import re
-        outfit_pattern = r'\{[^{}]*"outfit_name"[^{}]*"item_ids"[^{}]*\}'
-        matches = re.findall(outfit_pattern, response_text)
-        
-        if matches:
-            outfits = []
-            for match in matches[:3]:
-                try:
-                    outfit = json.loads(match)
-                    outfits.append(outfit)
-                except:
-                    pass
-            if outfits:
-                # Calculate scores and sort
-                scored_outfits = []
-                for outfit in outfits:
-                    item_ids = outfit.get('item_ids', [])
-                    outfit_items = [item for item in clothing_list if item.get('id') in item_ids]
-                    score = calculate_outfit_score(outfit_items, occasion, underused_ids, recent_combinations, force_include_item_ids)
-                    scored_outfits.append((score, outfit))
+        # Single tolerant pass: handles markdown, surrounding prose, bare objects and truncated arrays
+        outfits = parse_json_objects(response_text)
+        record_parse_outcome("outfit_generation", bool(outfits))
+        if outfits:
+            # Validate, repairing invalid outfits locally instead of dropping them
+            valid_outfits = []
+            seen_item_sets = set()
+            wardrobe = None
+            for outfit in outfits:
+                item_ids = outfit.get('item_ids', [])
+                print(f"[AI Service] Outfit '{outfit.get('outfit_name')}' item_ids: {item_ids}")
+                outfit_items = [item for item in clothing_list if item.get('id') in item_ids]
+                
+                # Validate outfit structure
+                is_valid, error_msg = validate_outfit_combination(outfit_items)
+                if not is_valid:
+                    print(f"[AI Service] ❌ Invalid outfit: {outfit.get('outfit_name')} - {error_msg}")
+                    # The wardrobe is encoded once, on the first repair
+                    wardrobe = wardrobe or EncodedWardrobe(clothing_list, underused_ids)
+                    outfit_items = repair_outfit(
+                        outfit_items, clothing_list, occasion, style_dna, underused_items,
+                        recent_combinations, force_include_item_ids, wardrobe, season
+                    )
+                    if outfit_items is None:
+                        continue
+                    outfit = {**outfit, "item_ids": [item.get('id') for item in outfit_items]}
+                    print(f"[AI Service] 🔧 Repaired outfit: {outfit.get('outfit_name')} -> {outfit['item_ids']}")
                 
-                # Sort by score (descending)
-                scored_outfits.sort(key=lambda x: x[0], reverse=True)
+                item_set = frozenset(item.get('id') for item in outfit_items)
+                if item_set in seen_item_sets:
+                    continue
+                seen_item_sets.add(item_set)
                 
-                # Return outfits without scores
-                return [outfit for score, outfit in scored_outfits]
+                score = calculate_outfit_score(outfit_items, occasion, underused_ids, recent_combinations, force_include_item_ids)
+                valid_outfits.append((score, outfit))
+                print(f"[AI Service] ✅ Valid outfit: {outfit.get('outfit_name')} (score: {score})")
+            
+            # Sort by score (descending)
+            valid_outfits.sort(key=lambda x: x[0], reverse=True)
+            
+            # Return valid outfits without scores, topped up locally if the AI fell short
+            suggestions = _top_up_with_local(
+                [outfit for score, outfit in valid_outfits],
+                clothing_list, occasion, style_dna, underused_items, recent_combinations, force_include_item_ids,
+                season
+            )
+            return suggestions if suggestions else [{
+                "outfit_name": "Unable to generate",
+                "description": "No valid outfit combinations found with current wardrobe",
+                "item_ids": [],
+                "styling_tips": ""
+            }]
+        
+        local_outfits = _generate_local_fallback(
+            clothing_list, occasion, style_dna, underused_items, recent_combinations, force_include_item_ids,
+            season=season
+        )
+        if local_outfits:
+            print("[AI Service] Could not parse AI response, using local outfit engine")
+            return OutfitSuggestions(local_outfits, degraded=True)
         
         return [{
             "outfit_name": "Unable to generate",
@@ -794,9 +1046,239 @@ Return ONLY the JSON array, no markdown, no code blocks, no explanation."""
         }]
     
     except Exception as e:
+        print(f"[AI Service] Outfit generation failed, using local outfit engine: {str(e)}")
+        local_outfits = _generate_local_fallback(
+            clothing_list, occasion, style_dna, underused_items, recent_combinations, force_include_item_ids,
+            season=season
+        )
+        if local_outfits:
+            return OutfitSuggestions(local_outfits, degraded=True)
+        
         return [{
             "outfit_name": "Error",
             "description": f"Error generating outfit: {str(e)}",
             "item_ids": [],
             "styling_tips": ""
         }]
+
+
+def _chunk_texts(response) -> Iterator[str]:
+    """Text of each chunk of a streamed model response"""
+    for chunk in response:
+        try:
+            yield chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. the final finish-reason chunk)
+            continue
+
+
+def stream_outfit_suggestions(
+    clothing_list: list,
+    occasion: str = "casual",
+    style_dna: dict = None,
+    previous_suggestions: str = None,
+    underused_items: list = None,
+    recent_combinations: list = None,
+    force_include_item_ids: list = None,
+    season: str = None
+) -> Iterator[Dict]:
+    """
+    Stream outfit suggestions as Gemini generates them.
+    
+    The response is parsed incrementally and every outfit is validated and
+    yielded as soon as its JSON object completes, so the first outfit arrives
+    long before the full response. Outfits are yielded in generation order
+    (not re-sorted by score); invalid ones are repaired locally. If the stream
+    fails or yields fewer than MAX_OUTFIT_SUGGESTIONS outfits, the rest come
+    from the local engine.
+    
+    Args mirror generate_outfit_suggestions.
+    
+    Returns (as the generator's return value) True when the stream failed or
+    could not be parsed, i.e. the outfits are a degraded local fallback.
+    """
+    streamed = []
+    degraded = False
+    seen_item_sets = set()
+    wardrobe = None
+    parsed = 0
+    try:
+        prompt = build_outfit_prompt(
+            clothing_list,
+            occasion,
+            style_dna,
+            previous_suggestions,
+            underused_items,
+            recent_combinations,
+            force_include_item_ids,
+            season
+        )
+        
+        response = call_model(
+            prompt,
+            call_name="outfit_stream",
+            stream=True,
+            system_instruction=OUTFIT_STYLIST_INSTRUCTION,
+            response_schema=OUTFIT_RESPONSE_SCHEMA
+        )
+        
+        for outfit in JsonValueStream(unwrap_arrays=True).iter_values(_chunk_texts(response)):
+            if not isinstance(outfit, dict):
+                continue
+            parsed += 1
+            item_ids = outfit.get('item_ids', [])
+            outfit_items = [item for item in clothing_list if item.get('id') in item_ids]
+            
+            is_valid, error_msg = validate_outfit_combination(outfit_items)
+            if not is_valid:
+                print(f"[AI Service] ❌ Invalid outfit: {outfit.get('outfit_name')} - {error_msg}")
+                if wardrobe is None:
+                    underused_ids = {item.get('id') for item in underused_items} if underused_items else set()
+                    wardrobe = EncodedWardrobe(clothing_list, underused_ids)
+                outfit_items = repair_outfit(
+                    outfit_items, clothing_list, occasion, style_dna, underused_items,
+                    recent_combinations, force_include_item_ids, wardrobe, season
+                )
+                if outfit_items is None:
+                    continue
+                outfit = {**outfit, "item_ids": [item.get('id') for item in outfit_items]}
+                print(f"[AI Service] 🔧 Repaired outfit: {outfit.get('outfit_name')} -> {outfit['item_ids']}")
+            
+            item_set = frozenset(item.get('id') for item in outfit_items)
+            if item_set in seen_item_sets:
+                continue
+            seen_item_sets.add(item_set)
+            
+            print(f"[AI Service] ✅ Streamed outfit: {outfit.get('outfit_name')}")
+            streamed.append(outfit)
+            yield outfit
+        record_parse_outcome("outfit_stream", parsed > 0)
+        degraded = parsed == 0
+    except Exception as e:
+        print(f"[AI Service] Outfit stream failed: {str(e)}")
+        degraded = True
+    
+    if len(streamed) < MAX_OUTFIT_SUGGESTIONS:
+        print(f"[AI Service] {len(streamed)} valid streamed outfit(s), topping up with the local outfit engine")
+        topped_up = _top_up_with_local(
+            streamed, clothing_list, occasion, style_dna, underused_items, recent_combinations, force_include_item_ids,
+            season
+        )
+        for outfit in topped_up[len(streamed):]:
+            yield outfit
+    return degraded
+
+
+def generate_hybrid_outfit_suggestions(
+    clothing_list: list,
+    occasion: str = "casual",
+    style_dna: dict = None,
+    underused_items: list = None,
+    recent_combinations: list = None,
+    force_include_item_ids: list = None,
+    season: str = None
+) -> list:
+    """
+    Generate outfit suggestions from a locally computed shortlist.
+    
+    The local engine first finds HYBRID_SHORTLIST_SIZE structurally valid,
+    compatible candidates; Gemini only sees those candidates and picks, names
+    and annotates the best ones by index. The prompt stays small regardless of
+    wardrobe size and every returned outfit is valid by construction.
+    
+    Args mirror generate_outfit_suggestions.
+    
+    Returns:
+        List of outfit suggestions in the same format as generate_outfit_suggestions
+    """
+    candidates = rank_local_outfits(
+        clothing_list, occasion, style_dna, underused_items, recent_combinations,
+        force_include_item_ids, HYBRID_SHORTLIST_SIZE, season
+    )
+    if not candidates:
+        return [{
+            "outfit_name": "Unable to generate",
+            "description": "No valid outfit combinations found with current wardrobe",
+            "item_ids": [],
+            "styling_tips": ""
+        }]
+    
+    print(f"\n[AI Service] Hybrid generation for: {occasion} ({len(candidates)} candidates from {len(clothing_list)} items)")
+    
+    # Candidates are already valid - with too few to choose from, skip the AI entirely
+    if len(candidates) <= MAX_OUTFIT_SUGGESTIONS:
+        return [describe_local_outfit(items, occasion) for items in candidates]
+    
+    try:
+        candidate_lines = []
+        for index, items in enumerate(candidates):
+            pieces = "; ".join(
+                f"{item.get('color')} {item.get('subcategory') or item.get('category')}"
+                + (f" ({item.get('pattern')})" if item.get('pattern') and item.get('pattern') != 'solid' else "")
+                for item in items
+            )
+            candidate_lines.append(f"{index}: {pieces}")
+        
+        prompt = f"""You are an expert fashion stylist. These candidate outfits were assembled from the user's wardrobe for a {occasion} occasion.
+Every candidate is already complete and color/pattern/formality compatible - do NOT change, add or remove items.{_format_style_context(style_dna)}
+
+CANDIDATES (index: items):
+{chr(10).join(candidate_lines)}
+
+Pick the {MAX_OUTFIT_SUGGESTIONS} best, most distinct candidates for this user and occasion, best first.
+
+Return ONLY a JSON array, no markdown:
+[
+  {{
+    "candidate_index": 0,
+    "outfit_name": "Clean, evocative name (2-4 words)",
+    "description": "Why this outfit works - color harmony, proportion balance, occasion fit",
+    "styling_tips": "One professional tip: tucking, rolling, posture, or how to wear it best"
+  }}
+]"""
+        
+        response = call_model(
+            prompt,
+            call_name="hybrid_outfit_generation",
+            response_schema=HYBRID_PICKS_RESPONSE_SCHEMA
+        )
+        response_text = response.text.strip()
+        print(f"[AI Service] Hybrid prompt: {len(prompt)} chars, AI Response: {response_text[:300]}...")
+        
+        suggestions = []
+        used_indexes = set()
+        picks = parse_json_objects(response_text)
+        record_parse_outcome("hybrid_outfit_generation", bool(picks))
+        for pick in picks:
+            index = pick.get('candidate_index')
+            if not isinstance(index, int) or not 0 <= index < len(candidates) or index in used_indexes:
+                print(f"[AI Service] ❌ Ignoring invalid candidate index: {index}")
+                continue
+            used_indexes.add(index)
+            
+            local = describe_local_outfit(candidates[index], occasion)
+            suggestions.append({
+                "outfit_name": pick.get('outfit_name') or local['outfit_name'],
+                "description": pick.get('description') or local['description'],
+                "item_ids": local['item_ids'],
+                "styling_tips": pick.get('styling_tips') or local['styling_tips']
+            })
+            if len(suggestions) >= MAX_OUTFIT_SUGGESTIONS:
+                break
+        
+        if suggestions:
+            # Top up from the local ranking if the model picked fewer than requested
+            for index, items in enumerate(candidates):
+                if len(suggestions) >= MAX_OUTFIT_SUGGESTIONS:
+                    break
+                if index not in used_indexes:
+                    suggestions.append(describe_local_outfit(items, occasion))
+            return suggestions
+        print("[AI Service] Could not parse hybrid AI response, using local ranking")
+    except Exception as e:
+        print(f"[AI Service] Hybrid generation failed, using local ranking: {str(e)}")
+    
+    return OutfitSuggestions(
+        [describe_local_outfit(items, occasion) for items in candidates[:MAX_OUTFIT_SUGGESTIONS]],
+        degraded=True
+    )
@@ -0,0 +1,279 @@
+"""
+AI Telemetry - Per-call measurements of every model request
+
+call_model records one entry per request: wall time (including retries),
+request and response payload bytes, token counts from the provider's usage
+metadata, attempts, error and the parse outcome reported afterwards by the
+call site. Entries are labelled with the API route that triggered them (set by
+a middleware, "background" for jobs) and the call name (which prompt).
+
+Entries feed in-process latency histograms per route and call, and are
+written in batches by a daemon thread to a rolling SQLite table that keeps
+the most recent AI_TELEMETRY_MAX_ROWS calls. Both are exposed through the
+admin routes.
+"""
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+from app.core.constants import AI_TELEMETRY_FLUSH_SECONDS, AI_TELEMETRY_LATENCY_BUCKETS_MS
+
+# API route of the request being served; background jobs keep the default
+current_route: ContextVar[str] = ContextVar("ai_telemetry_route", default="background")
+
+_COLUMNS = (
+    "recorded_at", "route", "call", "provider", "stream", "latency_ms",
+    "request_bytes", "response_bytes", "prompt_tokens", "cached_tokens",
+    "output_tokens", "attempts", "error", "parsed"
+)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with running totals for one route/call pair"""
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(AI_TELEMETRY_LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.retries = 0
+        self.parsed = 0
+        self.unparsed = 0
+
+    def observe(self, entry: Dict) -> None:
+        latency_ms = entry["latency_ms"]
+        index = next(
+            (i for i, bound in enumerate(AI_TELEMETRY_LATENCY_BUCKETS_MS) if latency_ms <= bound),
+            len(AI_TELEMETRY_LATENCY_BUCKETS_MS)
+        )
+        self.bucket_counts[index] += 1
+        self.count += 1
+        self.errors += 1 if entry["error"] else 0
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+        self.request_bytes += entry["request_bytes"]
+        self.response_bytes += entry["response_bytes"] or 0
+        self.prompt_tokens += entry["prompt_tokens"] or 0
+        self.output_tokens += entry["output_tokens"] or 0
+        self.retries += max(0, entry["attempts"] - 1)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given fraction of calls (max for the overflow bucket)"""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            seen += bucket_count
+            if seen >= target:
+                if index < len(AI_TELEMETRY_LATENCY_BUCKETS_MS):
+                    return float(AI_TELEMETRY_LATENCY_BUCKETS_MS[index])
+                break
+        return round(self.max_ms, 1)
+
+    def summary(self) -> Dict:
+        parse_reported = self.parsed + self.unparsed
+        return {
+            "calls": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "latency_ms": {
+                "mean": round(self.total_ms / self.count, 1) if self.count else None,
+                "p50": self.percentile(0.50),
+                "p95": self.percentile(0.95),
+                "p99": self.percentile(0.99),
+                "max": round(self.max_ms, 1)
+            },
+            "buckets_ms": dict(zip(
+                [f"<={bound}" for bound in AI_TELEMETRY_LATENCY_BUCKETS_MS] + ["inf"],
+                self.bucket_counts
+            )),
+            "avg_request_bytes": round(self.request_bytes / self.count) if self.count else None,
+            "avg_response_bytes": round(self.response_bytes / self.count) if self.count else None,
+            "avg_prompt_tokens": round(self.prompt_tokens / self.count) if self.count else None,
+            "avg_output_tokens": round(self.output_tokens / self.count) if self.count else None,
+            "parse_failure_rate": round(self.unparsed / parse_reported, 4) if parse_reported else None
+        }
+
+
+_histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+_pending_rows: List[Dict] = []
+_lock = threading.Lock()
+# Last entry recorded on this thread per call name, awaiting its parse outcome
+_awaiting_parse = threading.local()
+
+_writer_started = False
+
+
+def payload_bytes(contents: Any) -> int:
+    """Size of a request's text and image parts in bytes"""
+    if isinstance(contents, (list, tuple)):
+        return sum(payload_bytes(part) for part in contents)
+    if isinstance(contents, dict):
+        data = contents.get("data", b"")
+        return len(data) if isinstance(data, bytes) else len(str(data).encode("utf-8"))
+    if isinstance(contents, bytes):
+        return len(contents)
+    if contents is None:
+        return 0
+    return len(str(contents).encode("utf-8"))
+
+
+def record_ai_call(
+    call: str,
+    provider: str,
+    latency_seconds: float,
+    request_bytes: int,
+    response_bytes: Optional[int] = None,
+    usage: Optional[Dict[str, int]] = None,
+    attempts: int = 1,
+    error: Optional[str] = None,
+    stream: bool = False
+) -> None:
+    """Record one model call. Streamed calls are timed until the stream opened."""
+    entry = {
+        "recorded_at": datetime.utcnow().isoformat(),
+        "route": current_route.get(),
+        "call": call,
+        "provider": provider,
+        "stream": int(stream),
+        "latency_ms": round(latency_seconds * 1000, 1),
+        "request_bytes": request_bytes,
+        "response_bytes": response_bytes,
+        "prompt_tokens": (usage or {}).get("prompt_tokens"),
+        "cached_tokens": (usage or {}).get("cached_tokens"),
+        "output_tokens": (usage or {}).get("output_tokens"),
+        "attempts": attempts,
+        "error": error[:200] if error else None,
+        "parsed": None
+    }
+    with _lock:
+        _histograms.setdefault((entry["route"], call), LatencyHistogram()).observe(entry)
+        _pending_rows.append(entry)
+    if not error:
+        if not hasattr(_awaiting_parse, "entries"):
+            _awaiting_parse.entries = {}
+        _awaiting_parse.entries[call] = entry
+    _ensure_writer()
+
+
+def record_call_parse_outcome(call: str, parsed: bool) -> None:
+    """Attach a parse outcome to the latest call of that name made on this thread"""
+    entry = getattr(_awaiting_parse, "entries", {}).pop(call, None)
+    if entry is None:
+        return
+    with _lock:
+        # Rows are written in batches, so the pending row usually still takes the update
+        entry["parsed"] = int(parsed)
+        histogram = _histograms.get((entry["route"], call))
+        if histogram is not None:
+            if parsed:
+                histogram.parsed += 1
+            else:
+                histogram.unparsed += 1
+
+
+def telemetry_snapshot() -> Dict[str, Dict]:
+    """Histogram summaries keyed by "route call", slowest p95 first"""
+    with _lock:
+        summaries = {
+            f"{route} {call}": histogram.summary()
+            for (route, call), histogram in _histograms.items()
+        }
+    return dict(sorted(
+        summaries.items(),
+        key=lambda entry: entry[1]["latency_ms"]["p95"] or 0,
+        reverse=True
+    ))
+
+
+def _connect() -> sqlite3.Connection:
+    connection = sqlite3.connect(settings.AI_TELEMETRY_DB, timeout=5)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS ai_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recorded_at TEXT, route TEXT, call TEXT, provider TEXT, stream INTEGER,
+            latency_ms REAL, request_bytes INTEGER, response_bytes INTEGER,
+            prompt_tokens INTEGER, cached_tokens INTEGER, output_tokens INTEGER,
+            attempts INTEGER, error TEXT, parsed INTEGER
+        )
+    """)
+    return connection
+
+
+def flush_telemetry() -> int:
+    """Write pending entries and trim the table to the newest rows. Returns rows written."""
+    with _lock:
+        rows = [tuple(entry[column] for column in _COLUMNS) for entry in _pending_rows]
+        _pending_rows.clear()
+    if not rows:
+        return 0
+
+    connection = _connect()
+    try:
+        with connection:
+            connection.executemany(
+                f"INSERT INTO ai_calls ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                rows
+            )
+            connection.execute(
+                "DELETE FROM ai_calls WHERE id <= (SELECT MAX(id) FROM ai_calls) - ?",
+                (settings.AI_TELEMETRY_MAX_ROWS,)
+            )
+    finally:
+        connection.close()
+    return len(rows)
+
+
+def recent_ai_calls(limit: int = 100, route: Optional[str] = None, call: Optional[str] = None, slowest: bool = False) -> List[Dict]:
+    """Rows from the rolling table, newest (or slowest) first"""
+    flush_telemetry()
+    filters, params = [], []
+    if route:
+        filters.append("route = ?")
+        params.append(route)
+    if call:
+        filters.append("call = ?")
+        params.append(call)
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+    order = "latency_ms DESC" if slowest else "id DESC"
+
+    connection = _connect()
+    try:
+        connection.row_factory = sqlite3.Row
+        rows = connection.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM ai_calls {where} ORDER BY {order} LIMIT ?",
+            params + [limit]
+        ).fetchall()
+    finally:
+        connection.close()
+    return [dict(row) for row in rows]
+
+
+def _writer_loop() -> None:
+    while True:
+        time.sleep(AI_TELEMETRY_FLUSH_SECONDS)
+        try:
+            flush_telemetry()
+        except Exception as e:
+            print(f"[AI Telemetry] Flush failed: {str(e)}")
+
+
+def _ensure_writer() -> None:
+    """Start the background writer on first use"""
+    global _writer_started
+    if _writer_started:
+        return
+    with _lock:
+        if _writer_started:
+            return
+        _writer_started = True
+    threading.Thread(target=_writer_loop, name="ai-telemetry-writer", daemon=True).start()
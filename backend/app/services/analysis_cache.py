@@ -0,0 +1,161 @@
+"""
+Analysis Cache Service - Content-addressed cache for clothing image analyses
+
+Identical image bytes analyzed with the same prompt version always produce a
+reusable result, so re-uploads, client retries and re-runs of batch analysis
+are answered from the database instead of another Gemini round-trip.
+"""
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.clothing import ClothingAnalysisCache
+from app.services.ai_service import (
+    analyze_clothing_image,
+    analyze_clothing_images_batch,
+    CLOTHING_ANALYSIS_PROMPT_VERSION
+)
+from app.services.ai_client import run_ai_call
+from app.core.constants import ANALYSIS_CACHE_MAX_ENTRIES
+
+
+def hash_image_file(image_path: str) -> str:
+    """Compute the SHA-256 hex digest of an image file"""
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as img_file:
+        for chunk in iter(lambda: img_file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_cached_analysis(
+    db: Session,
+    image_hash: str,
+    prompt_version: str = CLOTHING_ANALYSIS_PROMPT_VERSION
+) -> Optional[Dict]:
+    """Return a cached analysis for the image hash, refreshing its LRU timestamp"""
+    entry = db.query(ClothingAnalysisCache).filter(
+        ClothingAnalysisCache.image_hash == image_hash,
+        ClothingAnalysisCache.prompt_version == prompt_version
+    ).first()
+
+    if not entry:
+        return None
+
+    entry.hit_count = (entry.hit_count or 0) + 1
+    entry.last_accessed_at = datetime.utcnow()
+    db.commit()
+
+    return json.loads(entry.analysis_json)
+
+
+def store_analysis(
+    db: Session,
+    image_hash: str,
+    analysis_result: Dict,
+    prompt_version: str = CLOTHING_ANALYSIS_PROMPT_VERSION
+) -> None:
+    """Cache a successful analysis and evict least-recently-used entries over the size bound"""
+    entry = ClothingAnalysisCache(
+        image_hash=image_hash,
+        prompt_version=prompt_version,
+        analysis_json=json.dumps(analysis_result),
+        hit_count=0
+    )
+    db.add(entry)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request cached the same image concurrently
+        db.rollback()
+        return
+
+    evict_stale_entries(db)
+
+
+def evict_stale_entries(db: Session, max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES) -> int:
+    """Delete the least-recently-used entries beyond max_entries. Returns number evicted."""
+    total = db.query(ClothingAnalysisCache).count()
+    overflow = total - max_entries
+    if overflow <= 0:
+        return 0
+
+    stale_ids = [
+        row.id for row in db.query(ClothingAnalysisCache.id)
+        .order_by(ClothingAnalysisCache.last_accessed_at.asc())
+        .limit(overflow)
+        .all()
+    ]
+    db.query(ClothingAnalysisCache).filter(
+        ClothingAnalysisCache.id.in_(stale_ids)
+    ).delete(synchronize_session=False)
+    db.commit()
+
+    return len(stale_ids)
+
+
+async def analyze_clothing_image_cached(db: Session, image_path: str) -> Dict:
+    """
+    Analyze a clothing image, answering from the cache when the same bytes were seen before.
+
+    Only successful analyses are cached so failures are retried on the next attempt.
+    """
+    try:
+        image_hash = hash_image_file(image_path)
+    except FileNotFoundError:
+        return {
+            "analysis_successful": False,
+            "error": f"Image file not found: {image_path}"
+        }
+
+    cached = get_cached_analysis(db, image_hash)
+    if cached is not None:
+        print(f"[Analysis Cache] Hit for {image_hash[:12]}")
+        return cached
+
+    analysis_result = await run_ai_call(analyze_clothing_image, image_path)
+    if analysis_result.get("analysis_successful"):
+        store_analysis(db, image_hash, analysis_result)
+
+    return analysis_result
+
+
+async def analyze_clothing_images_cached(db: Session, image_paths: List[str]) -> List[Dict]:
+    """
+    Analyze several clothing images, answering cached ones locally and sending
+    all remaining images to Gemini in a single batched request.
+
+    Returns results aligned with image_paths.
+    """
+    results: List[Optional[Dict]] = [None] * len(image_paths)
+    image_hashes: Dict[int, str] = {}
+
+    for idx, image_path in enumerate(image_paths):
+        try:
+            image_hashes[idx] = hash_image_file(image_path)
+        except FileNotFoundError:
+            results[idx] = {
+                "analysis_successful": False,
+                "error": f"Image file not found: {image_path}"
+            }
+            continue
+
+        cached = get_cached_analysis(db, image_hashes[idx])
+        if cached is not None:
+            results[idx] = cached
+
+    misses = [idx for idx in range(len(image_paths)) if results[idx] is None]
+    if misses:
+        print(f"[Analysis Cache] {len(image_paths) - len(misses)} hit(s), batching {len(misses)} miss(es)")
+        batch_results = await run_ai_call(
+            analyze_clothing_images_batch,
+            [image_paths[idx] for idx in misses]
+        )
+        for idx, analysis_result in zip(misses, batch_results):
+            results[idx] = analysis_result
+            if analysis_result.get("analysis_successful"):
+                store_analysis(db, image_hashes[idx], analysis_result)
+
+    return results
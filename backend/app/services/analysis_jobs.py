@@ -0,0 +1,369 @@
+"""
+Analysis Job Service - Durable background queue for batch clothing analysis
+
+Jobs and their per-item state live in the database, so work committed before a
+restart is never lost and unfinished jobs are resumed on startup. Each job runs
+a small pool of async workers that analyze batches of items concurrently (one
+multi-image Gemini request per batch), commit every item as soon as it finishes
+and retry failures individually with exponential backoff.
+
+A running job holds a lease: its updated_at is refreshed as items commit and
+every ANALYSIS_JOB_HEARTBEAT_SECONDS. Other worker processes only take over a
+running job once its lease has expired, so a job is never processed twice.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.clothing import ClothingItem, AnalysisJob, AnalysisJobItem
+from app.services.ai_service import CLOTHING_ANALYSIS_FIELDS
+from app.services.analysis_cache import analyze_clothing_image_cached, analyze_clothing_images_cached
+from app.services import wardrobe_events
+from app.services.item_features import apply_item_features
+from app.core.constants import (
+    ANALYSIS_JOB_WORKERS,
+    ANALYSIS_BATCH_SIZE,
+    ANALYSIS_JOB_MAX_ATTEMPTS,
+    ANALYSIS_JOB_RETRY_BASE_SECONDS,
+    ANALYSIS_JOB_HEARTBEAT_SECONDS,
+    ANALYSIS_JOB_LEASE_SECONDS
+)
+
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+# Strong references to running job tasks so they are not garbage collected
+_running_tasks: Set[asyncio.Task] = set()
+
+
+def apply_analysis_result(item: ClothingItem, analysis_result: Dict) -> None:
+    """Copy a successful analysis result onto a clothing item"""
+    for field in CLOTHING_ANALYSIS_FIELDS:
+        setattr(item, field, analysis_result.get(field))
+    apply_item_features(item)
+    item.analyzed = 1
+    item.analysis_timestamp = datetime.utcnow()
+
+
+def create_analysis_job(db: Session, user_id: int) -> Optional[AnalysisJob]:
+    """
+    Queue a job for all of the user's unanalyzed items.
+
+    Returns the user's already-active job if there is one, or None when there is
+    nothing to analyze.
+    """
+    active_job = db.query(AnalysisJob).filter(
+        AnalysisJob.user_id == user_id,
+        AnalysisJob.status.in_(ACTIVE_JOB_STATUSES)
+    ).first()
+    if active_job:
+        return active_job
+
+    unanalyzed = db.query(ClothingItem.id).filter(
+        ClothingItem.user_id == user_id,
+        ClothingItem.analyzed == 0
+    ).all()
+    if not unanalyzed:
+        return None
+
+    job = AnalysisJob(user_id=user_id, status="queued", total_items=len(unanalyzed))
+    db.add(job)
+    db.flush()
+
+    for row in unanalyzed:
+        db.add(AnalysisJobItem(job_id=job.id, item_id=row.id, status="pending", attempts=0))
+
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job_progress(db: Session, job: AnalysisJob) -> Dict:
+    """Summarize a job's progress from its per-item states"""
+    counts = dict(
+        db.query(AnalysisJobItem.status, func.count(AnalysisJobItem.id))
+        .filter(AnalysisJobItem.job_id == job.id)
+        .group_by(AnalysisJobItem.status)
+        .all()
+    )
+    errors = [
+        f"Error analyzing item {row.item_id}: {row.last_error}"
+        for row in db.query(AnalysisJobItem).filter(
+            AnalysisJobItem.job_id == job.id,
+            AnalysisJobItem.status == "failed"
+        ).all()
+    ]
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "total_items": job.total_items,
+        "analyzed_count": counts.get("done", 0),
+        "failed_count": counts.get("failed", 0),
+        "pending_count": counts.get("pending", 0),
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "errors": errors if errors else None
+    }
+
+
+def start_analysis_job(job_id: int, delay_seconds: float = 0) -> None:
+    """Schedule a job on the running event loop, optionally after a delay"""
+    task = asyncio.create_task(process_analysis_job(job_id, delay_seconds))
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+
+
+def _claim_job(db: Session, job: AnalysisJob) -> bool:
+    """
+    Atomically mark an active job running.
+
+    Queued jobs can always be claimed; running ones only once their lease has
+    expired (no heartbeat for ANALYSIS_JOB_LEASE_SECONDS). The UPDATE only
+    matches the status and updated_at this session read, so of several tasks or
+    workers racing for the same job exactly one wins.
+    """
+    if job.status not in ACTIVE_JOB_STATUSES:
+        return False
+    now = datetime.utcnow()
+    if (
+        job.status == "running"
+        and job.updated_at is not None
+        and now - job.updated_at < timedelta(seconds=ANALYSIS_JOB_LEASE_SECONDS)
+    ):
+        # Another worker is still processing it
+        return False
+    claimed = db.query(AnalysisJob).filter(
+        AnalysisJob.id == job.id,
+        AnalysisJob.status == job.status,
+        AnalysisJob.updated_at.is_(None) if job.updated_at is None else AnalysisJob.updated_at == job.updated_at
+    ).update({
+        AnalysisJob.status: "running",
+        AnalysisJob.started_at: job.started_at or now,
+        AnalysisJob.updated_at: now
+    }, synchronize_session=False)
+    db.commit()
+    db.refresh(job)
+    return claimed == 1
+
+
+def _heartbeat(db: Session, job_id: int) -> None:
+    """Renew a running job's lease"""
+    db.query(AnalysisJob).filter(
+        AnalysisJob.id == job_id,
+        AnalysisJob.status == "running"
+    ).update({AnalysisJob.updated_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+
+async def _keep_lease(job_id: int) -> None:
+    """Renew a job's lease periodically, covering long backoff waits between commits"""
+    while True:
+        await asyncio.sleep(ANALYSIS_JOB_HEARTBEAT_SECONDS)
+        db = SessionLocal()
+        try:
+            _heartbeat(db, job_id)
+        except Exception as e:
+            print(f"[Analysis Jobs] Heartbeat for job {job_id} failed: {str(e)}")
+        finally:
+            db.close()
+
+
+def resume_analysis_jobs() -> int:
+    """
+    Restart jobs left queued or running by a previous process. Returns number scheduled.
+
+    Every worker process schedules them, but each job is claimed by only one.
+    A running job is retried once its lease would expire: if the worker running
+    it is alive the heartbeat has renewed the lease and the claim is skipped.
+    """
+    db = SessionLocal()
+    try:
+        jobs = db.query(AnalysisJob.id, AnalysisJob.status, AnalysisJob.updated_at).filter(
+            AnalysisJob.status.in_(ACTIVE_JOB_STATUSES)
+        ).all()
+    finally:
+        db.close()
+
+    now = datetime.utcnow()
+    for job_id, status, updated_at in jobs:
+        delay = 0.0
+        if status == "running" and updated_at is not None:
+            lease_ends = updated_at + timedelta(seconds=ANALYSIS_JOB_LEASE_SECONDS)
+            delay = max(0.0, (lease_ends - now).total_seconds())
+        start_analysis_job(job_id, delay)
+
+    return len(jobs)
+
+
+async def process_analysis_job(job_id: int, delay_seconds: float = 0) -> None:
+    """Analyze every pending item of a job with a bounded pool of workers"""
+    if delay_seconds:
+        await asyncio.sleep(delay_seconds)
+    db = SessionLocal()
+    try:
+        job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
+        if not job or not _claim_job(db, job):
+            return
+
+        pending_ids = [
+            row.id for row in db.query(AnalysisJobItem.id).filter(
+                AnalysisJobItem.job_id == job_id,
+                AnalysisJobItem.status == "pending"
+            ).all()
+        ]
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for job_item_id in pending_ids:
+            queue.put_nowait(job_item_id)
+
+        workers = [
+            asyncio.create_task(_analysis_worker(queue))
+            for _ in range(min(ANALYSIS_JOB_WORKERS, len(pending_ids)))
+        ]
+        lease = asyncio.create_task(_keep_lease(job_id))
+        try:
+            if workers:
+                await asyncio.gather(*workers)
+        except BaseException:
+            # Stop the remaining workers so a requeued run never overlaps this one
+            for worker in workers:
+                worker.cancel()
+            raise
+        finally:
+            lease.cancel()
+
+        job.status = "completed"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        print(f"[Analysis Jobs] Job {job_id} completed ({len(pending_ids)} items processed)")
+    except Exception as e:
+        # Requeue the job so the next analyze request or startup resumes it
+        print(f"[Analysis Jobs] Job {job_id} interrupted: {str(e)}")
+        try:
+            db.rollback()
+            db.query(AnalysisJob).filter(AnalysisJob.id == job_id).update(
+                {AnalysisJob.status: "queued", AnalysisJob.updated_at: datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.commit()
+        except Exception as requeue_error:
+            print(f"[Analysis Jobs] Could not requeue job {job_id}: {str(requeue_error)}")
+    finally:
+        db.close()
+
+
+async def _analysis_worker(queue: asyncio.Queue) -> None:
+    """Pull batches of job items off the queue until it is empty"""
+    while True:
+        batch = []
+        while len(batch) < ANALYSIS_BATCH_SIZE:
+            try:
+                batch.append(queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        if not batch:
+            return
+        await _process_job_batch(batch)
+
+
+async def _process_job_batch(job_item_ids: List[int]) -> None:
+    """
+    Make the first attempt for a batch of items with one multi-image request,
+    then retry any failures individually with backoff.
+    """
+    db = SessionLocal()
+    retry_ids = []
+    try:
+        job_items = db.query(AnalysisJobItem).filter(AnalysisJobItem.id.in_(job_item_ids)).all()
+        items_by_id = {
+            item.id: item for item in db.query(ClothingItem).filter(
+                ClothingItem.id.in_([job_item.item_id for job_item in job_items])
+            ).all()
+        }
+
+        # Items resumed mid-backoff or already deleted go through the single-item path
+        batch = [
+            job_item for job_item in job_items
+            if job_item.item_id in items_by_id and job_item.attempts == 0
+        ]
+        retry_ids = [job_item.id for job_item in job_items if job_item not in batch]
+
+        if batch:
+            try:
+                # Stored paths are URL paths ("/uploads/..."), resolve them relative to the backend dir
+                analysis_results = await analyze_clothing_images_cached(
+                    db, [items_by_id[job_item.item_id].image_path.lstrip("/") for job_item in batch]
+                )
+            except Exception as e:
+                analysis_results = [{"analysis_successful": False, "error": str(e)}] * len(batch)
+
+            for job_item, analysis_result in zip(batch, analysis_results):
+                job_item.attempts += 1
+                item = items_by_id[job_item.item_id]
+                if analysis_result.get("analysis_successful"):
+                    apply_analysis_result(item, analysis_result)
+                    job_item.status = "done"
+                    job_item.last_error = None
+                    db.commit()
+                    wardrobe_events.item_saved(item.user_id, item.id)
+                else:
+                    job_item.last_error = analysis_result.get("error", "Analysis failed")
+                    job_item.next_attempt_at = datetime.utcnow() + timedelta(seconds=ANALYSIS_JOB_RETRY_BASE_SECONDS)
+                    retry_ids.append(job_item.id)
+                    db.commit()
+            _heartbeat(db, batch[0].job_id)
+    finally:
+        db.close()
+
+    if retry_ids:
+        await asyncio.gather(*[_process_job_item(job_item_id) for job_item_id in retry_ids])
+
+
+async def _process_job_item(job_item_id: int) -> None:
+    """Analyze one item, retrying with exponential backoff, and commit its outcome"""
+    db = SessionLocal()
+    try:
+        job_item = db.query(AnalysisJobItem).filter(AnalysisJobItem.id == job_item_id).first()
+        item = db.query(ClothingItem).filter(ClothingItem.id == job_item.item_id).first()
+
+        if not item:
+            job_item.status = "failed"
+            job_item.last_error = "Item no longer exists"
+            db.commit()
+            return
+
+        while job_item.attempts < ANALYSIS_JOB_MAX_ATTEMPTS:
+            # Honour backoff persisted by a previous process
+            if job_item.next_attempt_at and job_item.next_attempt_at > datetime.utcnow():
+                await asyncio.sleep((job_item.next_attempt_at - datetime.utcnow()).total_seconds())
+
+            job_item.attempts += 1
+            try:
+                # Stored paths are URL paths ("/uploads/..."), resolve them relative to the backend dir
+                analysis_result = await analyze_clothing_image_cached(db, item.image_path.lstrip("/"))
+                error = None if analysis_result.get("analysis_successful") else analysis_result.get("error", "Analysis failed")
+            except Exception as e:
+                analysis_result, error = None, str(e)
+
+            if error is None:
+                apply_analysis_result(item, analysis_result)
+                job_item.status = "done"
+                job_item.last_error = None
+                db.commit()
+                wardrobe_events.item_saved(item.user_id, item.id)
+                _heartbeat(db, job_item.job_id)
+                return
+
+            job_item.last_error = error
+            delay = ANALYSIS_JOB_RETRY_BASE_SECONDS * (2 ** (job_item.attempts - 1))
+            job_item.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            db.commit()
+            _heartbeat(db, job_item.job_id)
+
+        job_item.status = "failed"
+        db.commit()
+    finally:
+        db.close()
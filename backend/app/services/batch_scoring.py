@@ -0,0 +1,177 @@
+"""
+Batch Scoring Service - Vectorized outfit scoring with NumPy
+
+calculate_outfit_score in ai_service scores one outfit at a time and re-parses
+every item's tags on each call. Here a wardrobe is encoded once into arrays
+(style tag bitmasks, occasion tags, quality, underused flags, slots, pairwise
+color harmony) and any
+number of candidate outfits are then scored in a single vectorized pass.
+
+Semantics match calculate_outfit_score, which stays the reference
+implementation; outfits are lists of distinct item IDs from the wardrobe.
+"""
+from typing import Dict, List, Optional, Set
+import numpy as np
+from app.services.outfit_builder import categorize_item
+from app.services.color_science import item_color_vector, pair_harmony_matrix
+
+SLOTS = ('base_top', 'layer', 'bottom', 'shoes', 'accessory', 'unknown')
+
+
+class EncodedWardrobe:
+    """A user's items encoded once into arrays for batch scoring"""
+
+    def __init__(self, clothing_list: list, underused_items: Optional[Set[int]] = None):
+        self.ids = np.array([item.get('id') for item in clothing_list], dtype=np.int64)
+        self.row_by_id: Dict[int, int] = {item.get('id'): row for row, item in enumerate(clothing_list)}
+        # Row n is padding for outfits shorter than the longest one in a batch
+        self.pad_row = len(clothing_list)
+
+        self.occasion_tags = [(item.get('occasion_tags') or '').lower() for item in clothing_list]
+        self._occasion_match: Dict[str, np.ndarray] = {}
+
+        # Missing or empty quality scores count as the 7.0 default
+        self.quality = np.array(
+            [item.get('quality_score') if item.get('quality_score') is not None else 7.0 for item in clothing_list]
+            + [0.0],
+            dtype=np.float64
+        )
+
+        underused = underused_items or set()
+        self.underused = np.array(
+            [item.get('id') in underused for item in clothing_list] + [False], dtype=bool
+        )
+
+        self.slots = np.array(
+            [SLOTS.index(categorize_item(item)) for item in clothing_list] + [SLOTS.index('unknown')],
+            dtype=np.int8
+        )
+
+        # Color harmony of every item pair; the padding row harmonizes with everything
+        self.color_harmony = np.ones((len(clothing_list) + 1, len(clothing_list) + 1), dtype=np.float64)
+        if clothing_list:
+            self.color_harmony[:-1, :-1] = pair_harmony_matrix(
+                np.array([item_color_vector(item) for item in clothing_list], dtype=np.float64)
+            )
+
+        # Style tags are split exactly like calculate_outfit_score does, then packed
+        # into 64-bit words; the padding row is all ones so it never breaks an AND
+        item_tags = []
+        vocabulary: Dict[str, int] = {}
+        for item in clothing_list:
+            style_tags = (item.get('style_tags') or '').lower()
+            tags = set(style_tags.split(', ')) if style_tags else set()
+            for tag in tags:
+                vocabulary.setdefault(tag, len(vocabulary))
+            item_tags.append(tags)
+
+        words = max(1, (len(vocabulary) + 63) // 64)
+        self.style_masks = np.zeros((len(clothing_list) + 1, words), dtype=np.uint64)
+        for row, tags in enumerate(item_tags):
+            for tag in tags:
+                bit = vocabulary[tag]
+                self.style_masks[row, bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        self.style_masks[self.pad_row] = np.iinfo(np.uint64).max
+
+    def occasion_match(self, occasion: str) -> np.ndarray:
+        """Per-item flag: occasion is a substring of the item's occasion tags"""
+        occasion_lower = occasion.lower()
+        if occasion_lower not in self._occasion_match:
+            self._occasion_match[occasion_lower] = np.array(
+                [occasion_lower in tags for tags in self.occasion_tags] + [False], dtype=bool
+            )
+        return self._occasion_match[occasion_lower]
+
+    def rows(self, outfits: List[List[int]]) -> np.ndarray:
+        """Outfits as a padded (outfits x max_items) matrix of item rows"""
+        width = max((len(outfit) for outfit in outfits), default=0)
+        matrix = np.full((len(outfits), max(width, 1)), self.pad_row, dtype=np.int64)
+        for index, outfit in enumerate(outfits):
+            matrix[index, :len(outfit)] = [self.row_by_id[item_id] for item_id in outfit]
+        return matrix
+
+
+def score_outfits_batch(
+    wardrobe: EncodedWardrobe,
+    outfits: List[List[int]],
+    occasion: str,
+    recent_combinations: list = None,
+    force_include_item_ids: list = None
+) -> np.ndarray:
+    """
+    Score many outfits at once, equivalent to calculate_outfit_score per outfit.
+
+    Args:
+        wardrobe: Encoded wardrobe the outfits were built from
+        outfits: Candidate outfits as lists of item IDs
+        occasion: The requested occasion
+        recent_combinations: List of recent outfit combinations (sets of item IDs)
+        force_include_item_ids: List of item IDs that MUST be included
+
+    Returns:
+        Array of scores, one per outfit (rounded to 2 decimals like the scalar function)
+    """
+    if not outfits:
+        return np.zeros(0, dtype=np.float64)
+
+    rows = wardrobe.rows(outfits)
+    present = rows != wardrobe.pad_row
+    sizes = present.sum(axis=1)
+    safe_sizes = np.maximum(sizes, 1)
+
+    # 1. Occasion match (30) and 3. quality (15) are per-item averages
+    occasion_score = wardrobe.occasion_match(occasion)[rows].sum(axis=1) * 30.0 / safe_sizes
+    quality_score = (wardrobe.quality[rows] / 10.0).sum(axis=1) * 15.0 / safe_sizes
+
+    # 2. Style coherence: 25 if all items share a tag (or single item), else 12
+    common_styles = np.bitwise_and.reduce(wardrobe.style_masks[rows], axis=1).any(axis=1)
+    style_score = np.where(common_styles | (sizes <= 1), 25.0, 12.0)
+
+    # 4. Color coordination: 10 x mean harmony over the outfit's item pairs
+    width = rows.shape[1]
+    pair_mask = present[:, :, None] & present[:, None, :] & np.triu(np.ones((width, width), dtype=bool), k=1)
+    pair_counts = pair_mask.sum(axis=(1, 2))
+    harmony_sums = np.where(pair_mask, wardrobe.color_harmony[rows[:, :, None], rows[:, None, :]], 0.0).sum(axis=(1, 2))
+    color_score = 10.0 * np.where(pair_counts > 0, harmony_sums / np.maximum(pair_counts, 1), 1.0)
+    base_score = occasion_score + style_score + quality_score + color_score
+
+    # 5-6. Variety (15 if any underused item) and coverage (10 per underused item, max 15)
+    underused_count = wardrobe.underused[rows].sum(axis=1)
+    variety_score = np.where(underused_count > 0, 15.0, 0.0)
+    coverage_bonus = np.minimum(15.0, underused_count * 10.0)
+
+    # 7-8. Pair novelty and rotation penalty from overlaps with recent outfits
+    pair_novelty = np.full(len(outfits), 10.0)
+    rotation_penalty = np.zeros(len(outfits))
+    if recent_combinations:
+        recent_members = np.zeros((wardrobe.pad_row + 1, len(recent_combinations)), dtype=np.int32)
+        for column, recent_set in enumerate(recent_combinations):
+            for item_id in recent_set:
+                row = wardrobe.row_by_id.get(item_id)
+                if row is not None:
+                    recent_members[row, column] = 1
+        overlap_ratio = recent_members[rows].sum(axis=1) / safe_sizes[:, None]
+
+        overlap_count = (overlap_ratio >= 0.5).sum(axis=1)
+        pair_novelty = np.maximum(0, 10 - overlap_count * 2).astype(np.float64)
+
+        # Penalty comes from the first of the last five outfits over the threshold
+        recent_five = overlap_ratio[:, :5]
+        over_threshold = recent_five > 0.5
+        first_over = over_threshold.argmax(axis=1)
+        first_ratio = recent_five[np.arange(len(outfits)), first_over]
+        rotation_penalty = np.where(
+            over_threshold.any(axis=1), np.minimum(20.0, (first_ratio - 0.5) * 40), 0.0
+        )
+
+    score = base_score + variety_score + coverage_bonus + pair_novelty - rotation_penalty
+    score = np.round(np.maximum(0, score), 2)
+
+    # 0. Outfits missing a forced item (or empty outfits) score zero
+    if force_include_item_ids:
+        for item_id in force_include_item_ids:
+            row = wardrobe.row_by_id.get(item_id)
+            if row is None:
+                return np.zeros(len(outfits), dtype=np.float64)
+            score = np.where((rows == row).any(axis=1), score, 0.0)
+    return np.where(sizes > 0, score, 0.0)
@@ -0,0 +1,239 @@
+"""
+Color Science - Local color harmony scoring in CIE Lab
+
+Color names (the edit UI palette from get_category_options plus common
+free-text shades) are converted once, at import, from sRGB to CIE Lab into a
+lookup table. Free-text item colors resolve to a Lab vector through that table
+("dark olive" -> olive, darkened; "navy blue" -> navy), memoized per string.
+
+Pair harmony is computed for whole sets of colors at once with NumPy: ΔE
+(CIE76) catches near-identical shades that read as a mismatch, and the hue
+angle difference classifies chromatic pairs as monochrome, analogous,
+complementary, triadic or clashing - the same rules the stylist prompt asks
+the model to follow, so local ranking can judge color harmony itself.
+"""
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.services.outfit_builder import get_color_family
+
+# Name -> (sRGB hex, neutral). Neutrals pair with anything.
+PALETTE = {
+    # get_category_options colors
+    'black': ('#1a1a1a', True), 'white': ('#f8f8f6', True), 'navy': ('#1f2a44', True),
+    'blue': ('#2f5fb3', False), 'light blue': ('#9cc3e6', False), 'grey': ('#8c8c8c', True),
+    'charcoal': ('#36454f', True), 'brown': ('#6b4226', True), 'tan': ('#c8a27a', True),
+    'beige': ('#e3d5b8', True), 'cream': ('#f3ead3', True), 'khaki': ('#c3b091', True),
+    'olive': ('#6b6b2a', False), 'green': ('#2e7d32', False), 'red': ('#c62828', False),
+    'burgundy': ('#6d1a2a', False), 'maroon': ('#5c1a1b', False), 'pink': ('#f4a7b9', False),
+    'coral': ('#ff7f61', False), 'orange': ('#ef7d22', False), 'yellow': ('#f2c94c', False),
+    'purple': ('#6a3d9a', False), 'lavender': ('#c3b1e1', False), 'teal': ('#00807f', False),
+    'indigo': ('#3f3a8c', False),
+    # Common free-text shades
+    'gray': ('#8c8c8c', True), 'silver': ('#c0c0c0', True), 'ivory': ('#fffff0', True),
+    'off-white': ('#f5f2e8', True), 'camel': ('#c19a6b', True), 'taupe': ('#8b7d6b', True),
+    'stone': ('#b5ad9e', True), 'sand': ('#d8c7a0', True), 'denim': ('#4a6a8a', True),
+    'chocolate': ('#4e2a1e', True), 'cognac': ('#9a463d', False), 'rust': ('#b7410e', False),
+    'mustard': ('#d4a017', False), 'gold': ('#c9a227', False), 'sage': ('#9caf88', False),
+    'mint': ('#a8e6cf', False), 'emerald': ('#1f8a5b', False), 'forest': ('#228b22', False),
+    'sky': ('#87ceeb', False), 'cobalt': ('#0047ab', False), 'turquoise': ('#30c5c0', False),
+    'magenta': ('#c2185b', False), 'fuchsia': ('#d63384', False), 'plum': ('#673147', False),
+    'mauve': ('#b784a7', False), 'lilac': ('#c8a2c8', False), 'violet': ('#7f4fc9', False),
+    'wine': ('#722f37', False), 'oxblood': ('#4a0000', False), 'peach': ('#ffcba4', False),
+    'salmon': ('#fa8072', False), 'blush': ('#e8b4b8', False), 'rose': ('#e07a8f', False),
+    'lemon': ('#fff44f', False), 'crimson': ('#b0102c', False)
+}
+
+# Color family (get_color_family) -> palette entry, for free text no palette name matches
+_FAMILY_FALLBACK = {
+    'navy': 'navy', 'white': 'white', 'black': 'black', 'gray': 'grey', 'beige': 'beige',
+    'brown': 'brown', 'red': 'red', 'pink': 'pink', 'orange': 'orange', 'yellow': 'yellow',
+    'green': 'green', 'blue': 'blue', 'purple': 'purple'
+}
+
+# Lightness shifts applied for shade modifiers in free text
+_LIGHTNESS_MODIFIERS = {'light': 18.0, 'pale': 22.0, 'pastel': 20.0, 'dark': -18.0, 'deep': -15.0}
+
+# Chroma below which a color counts as neutral regardless of its name
+NEUTRAL_CHROMA = 12.0
+
+# ΔE range of shades that are close enough to look like a failed match
+NEAR_MISS_DELTA_E = (3.0, 10.0)
+
+# Lab hue angle differences (degrees) of chromatic pairs. Lab hue is not the
+# painter's wheel: blue/orange and red/green sit about 120-180 degrees apart.
+MONOCHROME_HUE_DIFF = 15.0
+ANALOGOUS_HUE_DIFF = 45.0
+TRIADIC_HUE_DIFF = 90.0
+COMPLEMENTARY_HUE_DIFF = 120.0
+
+# Pair harmony scores (0-1)
+HARMONY_SCORES = {
+    'neutral': 1.0,
+    'match': 0.9,
+    'monochrome': 0.9,
+    'analogous': 0.85,
+    'complementary': 0.8,
+    'triadic': 0.65,
+    'multicolor': 0.6,
+    'near_miss': 0.5,
+    'clash': 0.3
+}
+
+# Vector layout: L, a, b, neutral flag, multicolor flag (NaN Lab for unknown colors)
+UNKNOWN_COLOR = (np.nan, np.nan, np.nan, 0.0, 0.0)
+MULTICOLOR = (np.nan, np.nan, np.nan, 0.0, 1.0)
+
+
+def srgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Convert an (n, 3) array of 0-255 sRGB values to CIE Lab (D65)"""
+    linear = rgb / 255.0
+    linear = np.where(linear <= 0.04045, linear / 12.92, ((linear + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ np.array([
+        [0.4124564, 0.2126729, 0.0193339],
+        [0.3575761, 0.7151522, 0.1191920],
+        [0.1804375, 0.0721750, 0.9503041]
+    ])
+    xyz = xyz / np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1)
+
+
+_PALETTE_NAMES = list(PALETTE)
+_PALETTE_LAB = srgb_to_lab(np.array(
+    [[int(hex_code[i:i + 2], 16) for i in (1, 3, 5)] for hex_code, _ in PALETTE.values()],
+    dtype=np.float64
+))
+LAB_TABLE: Dict[str, Tuple[float, float, float]] = {
+    name: tuple(float(value) for value in lab) for name, lab in zip(_PALETTE_NAMES, _PALETTE_LAB)
+}
+# Longest names first so "light blue" wins over "blue"
+_NAMES_BY_LENGTH = sorted(_PALETTE_NAMES, key=len, reverse=True)
+
+
+@lru_cache(maxsize=4096)
+def color_vector(color: Optional[str]) -> Tuple[float, float, float, float, float]:
+    """Lab vector plus neutral/multicolor flags for a free-text color"""
+    text = (color or '').lower().strip()
+    if not text:
+        return UNKNOWN_COLOR
+    if get_color_family({'color': text}) == 'multicolor':
+        return MULTICOLOR
+
+    name = text if text in PALETTE else None
+    if name is None:
+        # Longest palette name in the text, earliest on ties ("navy blue" -> navy)
+        matches = [candidate for candidate in _NAMES_BY_LENGTH if candidate in text]
+        if matches:
+            longest = len(matches[0])
+            name = min((match for match in matches if len(match) == longest), key=text.index)
+    if name is None:
+        name = _FAMILY_FALLBACK.get(get_color_family({'color': text}))
+    if name is None:
+        return UNKNOWN_COLOR
+
+    lightness, a, b = LAB_TABLE[name]
+    for word in text.replace('-', ' ').split():
+        # "light blue" is already a palette shade; "light olive" is not
+        if word in _LIGHTNESS_MODIFIERS and word not in name:
+            lightness = float(np.clip(lightness + _LIGHTNESS_MODIFIERS[word], 0.0, 100.0))
+            break
+    neutral = PALETTE[name][1] or float(np.hypot(a, b)) < NEUTRAL_CHROMA
+    return (lightness, a, b, float(neutral), 0.0)
+
+
+def item_color_vector(item: Dict) -> Tuple[float, float, float, float, float]:
+    """Color vector of an item's primary color"""
+    return color_vector(item.get('color'))
+
+
+def pair_harmony_matrix(vectors: np.ndarray) -> np.ndarray:
+    """
+    Harmony score (0-1) of every pair of colors, from an (n, 5) array of color vectors.
+
+    Unknown colors score 1.0 with anything so missing data is never penalized.
+    """
+    lab = vectors[:, :3]
+    neutral = vectors[:, 3] > 0
+    multicolor = vectors[:, 4] > 0
+    known = ~np.isnan(lab[:, 0])
+
+    delta_e = np.linalg.norm(lab[:, None, :] - lab[None, :, :], axis=2)
+    hue = np.degrees(np.arctan2(lab[:, 2], lab[:, 1]))
+    hue_diff = np.abs(hue[:, None] - hue[None, :]) % 360.0
+    hue_diff = np.minimum(hue_diff, 360.0 - hue_diff)
+
+    both_known = known[:, None] & known[None, :]
+    any_neutral = neutral[:, None] | neutral[None, :]
+    any_multicolor = multicolor[:, None] | multicolor[None, :]
+    both_multicolor = multicolor[:, None] & multicolor[None, :]
+    # Only chromatic shades can be a near miss - neutrals pair with anything
+    near_miss = (
+        both_known & ~any_neutral
+        & (delta_e > NEAR_MISS_DELTA_E[0]) & (delta_e < NEAR_MISS_DELTA_E[1])
+    )
+
+    with np.errstate(invalid='ignore'):
+        scores = np.select(
+            [
+                both_multicolor,
+                any_multicolor & any_neutral,
+                any_multicolor,
+                ~both_known,
+                any_neutral,
+                near_miss,
+                delta_e <= NEAR_MISS_DELTA_E[0],
+                hue_diff <= MONOCHROME_HUE_DIFF,
+                hue_diff <= ANALOGOUS_HUE_DIFF,
+                hue_diff >= COMPLEMENTARY_HUE_DIFF,
+                hue_diff >= TRIADIC_HUE_DIFF
+            ],
+            [
+                HARMONY_SCORES['clash'],
+                HARMONY_SCORES['neutral'],
+                HARMONY_SCORES['multicolor'],
+                1.0,
+                HARMONY_SCORES['neutral'],
+                HARMONY_SCORES['near_miss'],
+                HARMONY_SCORES['match'],
+                HARMONY_SCORES['monochrome'],
+                HARMONY_SCORES['analogous'],
+                HARMONY_SCORES['complementary'],
+                HARMONY_SCORES['triadic']
+            ],
+            default=HARMONY_SCORES['clash']
+        )
+    np.fill_diagonal(scores, 1.0)
+    return scores
+
+
+def outfit_color_harmony(items: List[Dict]) -> float:
+    """Mean pair harmony of an outfit's primary colors (1.0 for fewer than two items)"""
+    if len(items) < 2:
+        return 1.0
+    scores = pair_harmony_matrix(np.array([item_color_vector(item) for item in items], dtype=np.float64))
+    upper = np.triu_indices(len(items), k=1)
+    return float(scores[upper].mean())
+
+
+# Canonical pairs and the harmony they must get (python -m app.services.color_science)
+CANONICAL_PAIRS = [
+    ('white', 'ivory', 'neutral'),
+    ('white', 'off-white', 'neutral'),
+    ('tan', 'camel', 'neutral'),
+    ('navy', 'white', 'neutral'),
+    ('burgundy', 'wine', 'near_miss'),
+    ('mustard', 'gold', 'near_miss'),
+    ('blue', 'orange', 'complementary'),
+    ('blue', 'yellow', 'complementary')
+]
+
+
+if __name__ == "__main__":
+    failures = 0
+    for first, second, expected in CANONICAL_PAIRS:
+        score = pair_harmony_matrix(np.array([color_vector(first), color_vector(second)]))[0, 1]
+        ok = score == HARMONY_SCORES[expected]
+        failures += not ok
+        print(f"{first} + {second}: {score:.2f} {'ok' if ok else f'FAIL (expected {expected})'}")
+    raise SystemExit(1 if failures else 0)
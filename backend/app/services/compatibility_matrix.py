@@ -0,0 +1,303 @@
+"""
+Compatibility Matrix - Pairwise item compatibility as per-wardrobe bitsets
+
+Formality, pattern and color compatibility only change when the wardrobe
+changes, and each check is pairwise (a set of items passes exactly when every
+pair passes). So instead of rescanning items for every candidate outfit, each
+wardrobe keeps an item x item bit matrix per check: bit j of row i is set when
+items i and j are compatible. An outfit is compatible when, for each of its
+items, the row ANDed with the outfit's mask is the whole mask.
+
+Matrices are built once per user, updated one row and column at a time when an
+item is saved or deleted (through wardrobe_events) and persisted compactly
+(zlib-compressed bit rows) in the wardrobe_compatibility table. Loaded
+matrices are kept in a bounded in-process cache.
+"""
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.clothing import ClothingItem, WardrobeCompatibility
+from app.services.outfit_builder import (
+    check_formality_compatibility,
+    check_pattern_compatibility,
+    check_color_compatibility,
+    get_formality_score,
+    get_pattern_intensity,
+    get_color_family
+)
+from app.core.constants import COMPAT_MATRIX_CACHE_USERS
+
+# Pairwise check per matrix, each applied to two items' features
+KINDS = ('formality', 'pattern', 'color')
+_PAIR_CHECKS = {
+    'formality': check_formality_compatibility,
+    'pattern': check_pattern_compatibility,
+    'color': check_color_compatibility
+}
+
+Features = Tuple[int, int, Optional[str]]
+
+
+def item_features(item: Dict) -> Features:
+    """The features compatibility depends on: formality, pattern intensity, color family"""
+    return (get_formality_score(item), get_pattern_intensity(item), get_color_family(item))
+
+
+def _feature_item(features: Features) -> Dict:
+    formality, pattern, color = features
+    return {'formality_score': formality, 'pattern_intensity': pattern, 'color_family': color}
+
+
+def _drop_bit(row: int, index: int) -> int:
+    """Remove bit index from a row, shifting the higher bits down"""
+    low = row & ((1 << index) - 1)
+    return low | ((row >> (index + 1)) << index)
+
+
+class CompatibilityMatrix:
+    """Item x item compatibility bitsets of one wardrobe, one matrix per check"""
+
+    def __init__(self):
+        self.item_ids: List[int] = []
+        self.features: List[Features] = []
+        self.index: Dict[int, int] = {}
+        self.rows: Dict[str, List[int]] = {kind: [] for kind in KINDS}
+        # AND of all kinds, what outfit checks use by default
+        self.combined: List[int] = []
+        self._lock = threading.RLock()
+
+    @classmethod
+    def build(cls, items: Iterable[Dict]) -> "CompatibilityMatrix":
+        matrix = cls()
+        for item in items:
+            matrix.upsert(item.get('id'), item_features(item))
+        return matrix
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+    def upsert(self, item_id: int, features: Features) -> bool:
+        """Add an item or refresh its row and column. Returns False when nothing changed."""
+        with self._lock:
+            row = self.index.get(item_id)
+            if row is not None and self.features[row] == features:
+                return False
+            if row is None:
+                row = len(self.item_ids)
+                self.index[item_id] = row
+                self.item_ids.append(item_id)
+                self.features.append(features)
+                for kind in KINDS:
+                    self.rows[kind].append(0)
+                self.combined.append(0)
+            else:
+                self.features[row] = features
+
+            item = _feature_item(features)
+            bit = 1 << row
+            for kind, check in _PAIR_CHECKS.items():
+                rows = self.rows[kind]
+                new_row = bit  # every item is compatible with itself
+                for other, other_features in enumerate(self.features):
+                    if other == row:
+                        continue
+                    if check([item, _feature_item(other_features)]):
+                        new_row |= 1 << other
+                        rows[other] |= bit
+                    else:
+                        rows[other] &= ~bit
+                rows[row] = new_row
+            self._recombine()
+            return True
+
+    def remove(self, item_id: int) -> bool:
+        """Drop an item's row and column. Returns False when it was not in the matrix."""
+        with self._lock:
+            row = self.index.pop(item_id, None)
+            if row is None:
+                return False
+            del self.item_ids[row]
+            del self.features[row]
+            for kind in KINDS:
+                del self.rows[kind][row]
+                self.rows[kind] = [_drop_bit(bits, row) for bits in self.rows[kind]]
+            self.index = {item_id: index for index, item_id in enumerate(self.item_ids)}
+            self._recombine()
+            return True
+
+    def _recombine(self) -> None:
+        self.combined = [
+            formality & pattern & color
+            for formality, pattern, color in zip(*(self.rows[kind] for kind in KINDS))
+        ]
+
+    def sync(self, items: Iterable[Dict]) -> None:
+        """Upsert any of the given items that are missing or whose features changed"""
+        for item in items:
+            self.upsert(item.get('id'), item_features(item))
+
+    def is_compatible(self, item_ids: Iterable[int], kind: Optional[str] = None) -> bool:
+        """
+        Whether every pair of the items passes the given check (all checks by default)
+
+        Items no longer in the matrix (deleted while a request was in flight)
+        are skipped rather than failing the check.
+        """
+        with self._lock:
+            rows = self.rows[kind] if kind else self.combined
+            positions = [self.index[item_id] for item_id in item_ids if item_id in self.index]
+            mask = 0
+            for position in positions:
+                mask |= 1 << position
+            return all(rows[position] & mask == mask for position in positions)
+
+    def to_record(self) -> Tuple[str, bytes]:
+        """Item features as JSON and the rows of every kind as compressed little-endian bitsets"""
+        with self._lock:
+            row_bytes = (len(self.item_ids) + 7) // 8
+            features = json.dumps([[item_id, *features] for item_id, features in zip(self.item_ids, self.features)])
+            bits = b"".join(
+                bits.to_bytes(row_bytes, "little") for kind in KINDS for bits in self.rows[kind]
+            )
+            return features, zlib.compress(bits)
+
+    @classmethod
+    def from_record(cls, features_json: str, matrix_blob: bytes) -> "CompatibilityMatrix":
+        matrix = cls()
+        for item_id, formality, pattern, color in json.loads(features_json):
+            matrix.index[item_id] = len(matrix.item_ids)
+            matrix.item_ids.append(item_id)
+            matrix.features.append((formality, pattern, color))
+        size = len(matrix.item_ids)
+        row_bytes = (size + 7) // 8
+        bits = zlib.decompress(matrix_blob)
+        for kind_index, kind in enumerate(KINDS):
+            offset = kind_index * size * row_bytes
+            matrix.rows[kind] = [
+                int.from_bytes(bits[offset + row * row_bytes:offset + (row + 1) * row_bytes], "little")
+                for row in range(size)
+            ]
+        matrix._recombine()
+        return matrix
+
+
+# user_id -> loaded matrix, least recently used first
+_matrices: "OrderedDict[int, CompatibilityMatrix]" = OrderedDict()
+# item_id -> user_id of the cached matrix holding it
+_owner_by_item: Dict[int, int] = {}
+_cache_lock = threading.Lock()
+
+
+def _cache(user_id: int, matrix: CompatibilityMatrix) -> None:
+    with _cache_lock:
+        _matrices[user_id] = matrix
+        _matrices.move_to_end(user_id)
+        _owner_by_item.update({item_id: user_id for item_id in matrix.item_ids})
+        while len(_matrices) > COMPAT_MATRIX_CACHE_USERS:
+            evicted_user, evicted = _matrices.popitem(last=False)
+            for item_id in evicted.item_ids:
+                if _owner_by_item.get(item_id) == evicted_user:
+                    del _owner_by_item[item_id]
+
+
+def _item_dict(item: ClothingItem) -> Dict:
+    """The attributes of a stored item that its compatibility features come from"""
+    return {
+        'id': item.id,
+        'category': item.category,
+        'subcategory': item.subcategory,
+        'pattern': item.pattern,
+        'color': item.color,
+        'formality_score': item.formality_score,
+        'pattern_intensity': item.pattern_intensity,
+        'color_family': item.color_family
+    }
+
+
+def _persist(db: Session, user_id: int, matrix: CompatibilityMatrix) -> None:
+    features, blob = matrix.to_record()
+    record = db.query(WardrobeCompatibility).filter(WardrobeCompatibility.user_id == user_id).first()
+    if record is None:
+        record = WardrobeCompatibility(user_id=user_id)
+        db.add(record)
+    record.item_features = features
+    record.matrix = blob
+    record.updated_at = datetime.utcnow()
+    db.commit()
+
+
+def _load_cached_or_stored(db: Session, user_id: int) -> Optional[CompatibilityMatrix]:
+    with _cache_lock:
+        matrix = _matrices.get(user_id)
+        if matrix is not None:
+            _matrices.move_to_end(user_id)
+            return matrix
+    record = db.query(WardrobeCompatibility).filter(WardrobeCompatibility.user_id == user_id).first()
+    if record is None:
+        return None
+    matrix = CompatibilityMatrix.from_record(record.item_features, record.matrix)
+    _cache(user_id, matrix)
+    return matrix
+
+
+def load_compatibility_matrix(db: Session, user_id: int) -> CompatibilityMatrix:
+    """The user's matrix from memory or the database, built and stored on first use"""
+    matrix = _load_cached_or_stored(db, user_id)
+    if matrix is None:
+        items = db.query(ClothingItem).filter(ClothingItem.user_id == user_id).all()
+        matrix = CompatibilityMatrix.build([_item_dict(item) for item in items])
+        _persist(db, user_id, matrix)
+        _cache(user_id, matrix)
+        print(f"[Compatibility] Built {len(matrix)}x{len(matrix)} matrix for user {user_id}")
+    return matrix
+
+
+def compatibility_for(items: List[Dict]) -> CompatibilityMatrix:
+    """
+    A matrix covering the given item dicts.
+
+    Uses the owner's loaded matrix when there is one (upserting any item whose
+    features changed since), otherwise builds a throwaway matrix over just
+    these items.
+    """
+    with _cache_lock:
+        owners = {_owner_by_item.get(item.get('id')) for item in items} - {None}
+        matrix = _matrices.get(owners.pop()) if len(owners) == 1 else None
+    if matrix is None:
+        return CompatibilityMatrix.build(items)
+    matrix.sync(items)
+    return matrix
+
+
+def update_item(user_id: int, item_id: int) -> None:
+    """Refresh one item's row and column in the user's matrix, if it has been built"""
+    db = SessionLocal()
+    try:
+        matrix = _load_cached_or_stored(db, user_id)
+        item = db.query(ClothingItem).filter(ClothingItem.id == item_id).first()
+        if matrix is None or item is None:
+            return
+        if matrix.upsert(item_id, item_features(_item_dict(item))):
+            with _cache_lock:
+                _owner_by_item[item_id] = user_id
+            _persist(db, user_id, matrix)
+    finally:
+        db.close()
+
+
+def remove_item(user_id: int, item_id: int) -> None:
+    """Drop a deleted item's row and column from the user's matrix, if it has been built"""
+    db = SessionLocal()
+    try:
+        matrix = _load_cached_or_stored(db, user_id)
+        if matrix is not None and matrix.remove(item_id):
+            with _cache_lock:
+                _owner_by_item.pop(item_id, None)
+            _persist(db, user_id, matrix)
+    finally:
+        db.close()
@@ -0,0 +1,147 @@
+"""
+Image Pipeline - Normalize photos before they are sent to the AI
+
+Phone photos are often 4-12 MB, far larger than a vision model needs. Before an
+image is attached to a Gemini request it is auto-oriented from its EXIF data,
+stripped of all metadata, downscaled to a configurable longest edge and
+re-encoded as JPEG. Decoding and resizing run in a separate process pool so
+the CPU work never holds the GIL of the worker serving requests.
+
+A pool whose process died (e.g. killed by the OOM killer on a huge image) is
+broken for good, so it is replaced and the image retried once; an image that
+takes longer than IMAGE_NORMALIZE_TIMEOUT_SECONDS is abandoned, its pool
+replaced, and the original bytes are sent instead.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Optional, Tuple
+from PIL import Image, ImageOps
+from app.config import settings
+from app.core.constants import IMAGE_NORMALIZE_TIMEOUT_SECONDS
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """Create the normalization process pool on first use"""
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=settings.AI_IMAGE_WORKERS,
+                # Spawn instead of fork: the server process runs threads (AI pool, SQLAlchemy)
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool
+
+
+def _reset_process_pool(pool: ProcessPoolExecutor) -> None:
+    """Discard a broken or stuck pool so the next image gets a fresh one"""
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is not pool:
+            # Another thread already replaced it
+            return
+        _process_pool = None
+    # A stuck worker never returns on its own - stop it instead of leaking it
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _normalize_in_pool(image_path: str) -> Tuple[bytes, str]:
+    """Normalize an image in the process pool, retrying once on a fresh pool if it broke"""
+    for attempt in range(2):
+        pool = _get_process_pool()
+        try:
+            future = pool.submit(
+                _normalize_image_file,
+                image_path,
+                settings.AI_IMAGE_MAX_EDGE,
+                settings.AI_IMAGE_JPEG_QUALITY
+            )
+            return future.result(timeout=IMAGE_NORMALIZE_TIMEOUT_SECONDS)
+        except BrokenProcessPool:
+            _reset_process_pool(pool)
+            if attempt:
+                raise
+            print(f"[Image Pipeline] Process pool broke, retrying {image_path} on a new pool")
+        except FutureTimeoutError:
+            future.cancel()
+            _reset_process_pool(pool)
+            raise
+
+
+def guess_mime_type(image_path: str) -> str:
+    """Determine MIME type from file extension"""
+    lowered = image_path.lower()
+    if lowered.endswith(".png"):
+        return "image/png"
+    elif lowered.endswith(".gif"):
+        return "image/gif"
+    elif lowered.endswith(".webp"):
+        return "image/webp"
+    return "image/jpeg"
+
+
+def normalize_image_bytes(image_bytes: bytes, max_edge: int, quality: int) -> Tuple[bytes, str]:
+    """
+    Auto-orient, strip metadata, downscale and re-encode an image as JPEG.
+
+    Returns:
+        (jpeg_bytes, mime_type)
+    """
+    with Image.open(BytesIO(image_bytes)) as img:
+        img = ImageOps.exif_transpose(img)
+
+        # JPEG has no alpha channel - flatten transparent images onto white
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        # Saving without exif/icc arguments drops all metadata
+        output = BytesIO()
+        img.save(output, format="JPEG", quality=quality, optimize=True)
+
+    return output.getvalue(), "image/jpeg"
+
+
+def _normalize_image_file(image_path: str, max_edge: int, quality: int) -> Tuple[bytes, str]:
+    """Read and normalize an image file (executed inside the process pool)"""
+    with open(image_path, "rb") as img_file:
+        return normalize_image_bytes(img_file.read(), max_edge, quality)
+
+
+def load_image_for_ai(image_path: str) -> dict:
+    """
+    Load an image file as an inline-data part for a vision request.
+
+    The image is normalized in the process pool; if it cannot be decoded in
+    time the original bytes are sent unchanged so the AI call can still be
+    attempted.
+    """
+    try:
+        image_bytes, mime_type = _normalize_in_pool(image_path)
+    except FileNotFoundError:
+        raise
+    except Exception as e:
+        print(f"[Image Pipeline] Normalization failed for {image_path}, sending original: {type(e).__name__} {str(e)}")
+        with open(image_path, "rb") as img_file:
+            image_bytes = img_file.read()
+        mime_type = guess_mime_type(image_path)
+
+    # Raw bytes - the SDK handles transport encoding, no base64 copy needed
+    return {
+        "mime_type": mime_type,
+        "data": image_bytes,
+    }
@@ -0,0 +1,76 @@
+"""
+Item Features - Derived clothing attributes persisted at write time
+
+Slot, formality score, pattern intensity and color family only change when an
+item's category, subcategory, pattern or color change, so they are computed
+once whenever an item is uploaded, analyzed or edited and stored as indexed
+columns on ClothingItem. The outfit builder's getters read the stored values
+from item dicts and only fall back to deriving them for items that have not
+been backfilled yet.
+"""
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+from app.models.clothing import ClothingItem
+from app.services.outfit_builder import (
+    categorize_item,
+    get_formality_score,
+    get_pattern_intensity,
+    get_color_family
+)
+
+FEATURE_FIELDS = ("slot", "formality_score", "pattern_intensity", "color_family")
+
+
+def derive_item_features(item: ClothingItem) -> Dict:
+    """Compute the derived features from an item's raw attributes"""
+    raw = {
+        "category": item.category,
+        "subcategory": item.subcategory,
+        "pattern": item.pattern,
+        "color": item.color
+    }
+    return {
+        "slot": categorize_item(raw),
+        "formality_score": get_formality_score(raw),
+        "pattern_intensity": get_pattern_intensity(raw),
+        "color_family": get_color_family(raw)
+    }
+
+
+def apply_item_features(item: ClothingItem) -> None:
+    """Recompute and set an item's derived features (before committing a write)"""
+    for field, value in derive_item_features(item).items():
+        setattr(item, field, value)
+
+
+def feature_dict(item: ClothingItem) -> Dict:
+    """The stored derived features, for the item dicts passed to the outfit generators"""
+    return {field: getattr(item, field) for field in FEATURE_FIELDS}
+
+
+def backfill_item_features(db: Session, user_id: Optional[int] = None, batch_size: int = 500) -> int:
+    """
+    Recompute the derived features of every item (or one user's items).
+
+    Commits after each batch. Returns the number of items whose stored
+    features changed.
+    """
+    query = db.query(ClothingItem).order_by(ClothingItem.id)
+    if user_id is not None:
+        query = query.filter(ClothingItem.user_id == user_id)
+
+    changed = 0
+    last_id = 0
+    while True:
+        batch = query.filter(ClothingItem.id > last_id).limit(batch_size).all()
+        if not batch:
+            break
+        for item in batch:
+            features = derive_item_features(item)
+            if any(getattr(item, field) != value for field, value in features.items()):
+                for field, value in features.items():
+                    setattr(item, field, value)
+                changed += 1
+        db.commit()
+        last_id = batch[-1].id
+    return changed
@@ -0,0 +1,223 @@
+"""
+LLM JSON Helpers - Parse JSON returned by language models
+
+Model output is not always clean JSON: it may be wrapped in markdown fences,
+preceded or followed by prose, truncated, or (when streamed) arrive in
+arbitrary chunks. Every AI call site parses responses through JsonValueStream,
+a tolerant single-pass scanner, so malformed output is handled the same way
+everywhere and no response text is parsed more than once.
+
+Call sites report whether each response parsed with record_parse_outcome, per
+call and per output mode (schema-constrained or prose), so the parse failure
+rate of structured output can be compared against prose-only prompts.
+"""
+import json
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.config import settings
+from app.services.ai_telemetry import record_call_parse_outcome
+
+# (call, mode) -> [responses, failures]
+_parse_outcomes: Dict[Tuple[str, str], List[int]] = {}
+_parse_lock = threading.Lock()
+
+
+class JsonValueStream:
+    """
+    Incrementally extract JSON values from model output in a single pass.
+
+    Feed raw text chunks as they arrive; every call returns the values completed
+    by that chunk, and finish() returns what can still be recovered once the
+    text has ended. Text outside JSON (markdown fences, prose) is skipped and a
+    malformed value is dropped without affecting the ones around it.
+
+    A bracket in prose ("see {below}" is fine, "pick one {" is not) opens a
+    value that never closes and would swallow everything after it, so at the
+    end of the text a value still open that produced nothing is rescanned from
+    just after its opening bracket.
+
+    With unwrap_arrays=True the elements of top-level arrays are returned one by
+    one as each completes, so a truncated array still yields its finished
+    elements; top-level objects outside an array are returned as they are.
+    """
+
+    def __init__(self, unwrap_arrays: bool = False):
+        self.unwrap_arrays = unwrap_arrays
+        self._buffer = ""
+        self._position = 0
+        self._depth = 0
+        self._in_array = False
+        self._in_string = False
+        self._escaped = False
+        self._value_start = None
+        # Where the open top-level value or array began, and how many values it has produced
+        self._open_start = None
+        self._open_values = 0
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume a chunk of text and return any newly completed values"""
+        if not chunk:
+            return []
+
+        self._buffer += chunk
+        values = []
+
+        while self._position < len(self._buffer):
+            char = self._buffer[self._position]
+
+            if self._depth == 0:
+                # Between values - only an opening bracket matters
+                if char == "[" and self.unwrap_arrays:
+                    self._in_array = True
+                    self._depth = 1
+                elif char in "[{":
+                    self._value_start = self._position
+                    self._depth = 1
+                if self._depth:
+                    self._open_start = self._position
+                    self._open_values = 0
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+                if self._at_element_level() and self._value_start is None:
+                    self._value_start = self._position
+            elif char in "[{":
+                if self._at_element_level() and self._value_start is None:
+                    self._value_start = self._position
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if not self._in_array:
+                    if self._depth == 0:
+                        values.extend(self._complete_value(self._position + 1))
+                        self._open_start = None
+                elif self._depth == 1 and self._value_start is not None:
+                    values.extend(self._complete_value(self._position + 1))
+                elif self._depth == 0:
+                    # End of the array - flush a trailing scalar element
+                    values.extend(self._complete_value(self._position))
+                    self._in_array = False
+                    self._open_start = None
+            elif char == "," and self._at_element_level():
+                values.extend(self._complete_value(self._position))
+            elif self._at_element_level() and self._value_start is None and not char.isspace():
+                # Start of a scalar array element (number, true, false, null)
+                self._value_start = self._position
+
+            self._position += 1
+
+        # Drop consumed text so long streams do not grow the buffer; an open value is
+        # kept whole in case finish() has to rescan it
+        if self._open_start is not None:
+            keep_from = self._open_start
+        elif self._value_start is not None:
+            keep_from = self._value_start
+        else:
+            keep_from = self._position
+        self._buffer = self._buffer[keep_from:]
+        self._position -= keep_from
+        if self._open_start is not None:
+            self._open_start -= keep_from
+        if self._value_start is not None:
+            self._value_start -= keep_from
+
+        return values
+
+    def finish(self) -> List[Any]:
+        """
+        Signal the end of the text and return the values recovered from it.
+
+        A truncated trailing value is dropped. An open value that produced
+        nothing (usually a stray bracket in prose) is rescanned from just after
+        its opening bracket, repeatedly if the rest has one too.
+        """
+        values = []
+        if self._open_start is not None and not self._open_values:
+            print(f"[LLM JSON] Unclosed value, rescanning after: {self._buffer[self._open_start:self._open_start + 100]}")
+        while self._open_start is not None and not self._open_values:
+            rest = self._buffer[self._open_start + 1:]
+            self._reset()
+            values.extend(self.feed(rest))
+        self._reset()
+        return values
+
+    def iter_values(self, chunks: Iterable[str]) -> Iterator[Any]:
+        """Feed every chunk, yielding values as they complete and then those finish() recovers"""
+        for chunk in chunks:
+            yield from self.feed(chunk)
+        yield from self.finish()
+
+    def _reset(self) -> None:
+        self.__init__(self.unwrap_arrays)
+
+    def _at_element_level(self) -> bool:
+        """Directly inside an unwrapped top-level array"""
+        return self._in_array and self._depth == 1
+
+    def _complete_value(self, end: int) -> List[Any]:
+        """Decode the value that started at _value_start and ends before end"""
+        start, self._value_start = self._value_start, None
+        if start is None:
+            return []
+
+        text = self._buffer[start:end].strip()
+        if not text:
+            return []
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            print(f"[LLM JSON] Skipping malformed JSON value: {text[:100]}")
+            return []
+        if self._in_array:
+            self._open_values += 1
+        return [value]
+
+
+def parse_json_object(response_text: str) -> Optional[Dict]:
+    """Return the first JSON object in a model response, or None if there is none"""
+    for value in JsonValueStream(unwrap_arrays=True).iter_values([response_text]):
+        if isinstance(value, dict):
+            return value
+    return None
+
+
+def parse_json_objects(response_text: str) -> List[Dict]:
+    """Return every JSON object in a model response, unwrapping top-level arrays"""
+    return [
+        value for value in JsonValueStream(unwrap_arrays=True).iter_values([response_text])
+        if isinstance(value, dict)
+    ]
+
+
+def record_parse_outcome(call: str, parsed: bool) -> None:
+    """Count one model response of the given call as parsed or unparseable"""
+    mode = "schema" if settings.AI_STRUCTURED_OUTPUT else "prose"
+    with _parse_lock:
+        counts = _parse_outcomes.setdefault((call, mode), [0, 0])
+        counts[0] += 1
+        if not parsed:
+            counts[1] += 1
+        responses, failures = counts
+    record_call_parse_outcome(call, parsed)
+    if not parsed:
+        print(f"[LLM JSON] {call} ({mode}): {failures}/{responses} responses unparseable ({failures / responses:.1%})")
+
+
+def parse_failure_stats() -> Dict[str, Dict]:
+    """Responses, failures and failure rate per call and output mode"""
+    with _parse_lock:
+        return {
+            f"{call}:{mode}": {
+                "responses": responses,
+                "failures": failures,
+                "failure_rate": round(failures / responses, 4)
+            }
+            for (call, mode), (responses, failures) in _parse_outcomes.items()
+        }
@@ -0,0 +1,300 @@
+"""
+Local Outfit Engine - Deterministic outfit generation without an LLM round-trip
+
+Builds outfits directly from the slot pools produced by build_outfit_candidates:
+core base_top/bottom/shoes combinations are enumerated, pruned with the
+formality, pattern and color compatibility bit matrix, ranked with the
+vectorized outfit scorer and then extended with an optional layer and accessory
+by beam search. Used for engine=local, as the candidate shortlist for
+engine=hybrid and as the fallback when Gemini fails. repair_outfit fixes
+AI outfits that fail validation by swapping items from the same slot pools.
+"""
+from itertools import product
+from typing import Dict, List, Optional, Set, Tuple
+from app.services.outfit_builder import (
+    build_outfit_candidates,
+    categorize_item,
+    organize_by_slots,
+    validate_outfit_combination
+)
+from app.services.batch_scoring import EncodedWardrobe, score_outfits_batch
+from app.services.compatibility_matrix import CompatibilityMatrix, compatibility_for
+from app.core.constants import MAX_OUTFIT_SUGGESTIONS
+
+# Candidates kept per slot before combinations are enumerated
+CORE_POOL_SIZE = 6
+OPTIONAL_POOL_SIZE = 4
+
+# Partial outfits kept between beam search stages
+BEAM_WIDTH = 24
+
+# Share of items two returned outfits may have in common
+MAX_SHARED_ITEM_RATIO = 0.75
+
+
+def _item_prior(item: Dict, occasion: str, underused_ids: Set[int]) -> float:
+    """Cheap per-item relevance used to trim slot pools before enumeration"""
+    prior = 0.0
+    if occasion.lower() in (item.get('occasion_tags') or '').lower():
+        prior += 3.0
+    prior += (item.get('quality_score') or 7.0) / 10.0 * 2.0
+    if item.get('id') in underused_ids:
+        prior += 2.0
+    return prior
+
+
+def _is_compatible(compatibility: CompatibilityMatrix, items: List[Dict]) -> bool:
+    """All advisory compatibility checks pass for every pair of items"""
+    return compatibility.is_compatible([item.get('id') for item in items])
+
+
+def describe_local_outfit(items: List[Dict], occasion: str) -> Dict:
+    """Build a deterministic name, description and tip for a local outfit"""
+    by_slot: Dict[str, Dict] = {}
+    for item in items:
+        by_slot.setdefault(categorize_item(item), item)
+
+    def label(item: Optional[Dict]) -> str:
+        if not item:
+            return ""
+        piece = item.get('subcategory') or item.get('category') or 'piece'
+        color = item.get('color')
+        return f"{color} {piece}" if color else piece
+
+    top = by_slot.get('base_top') or by_slot.get('layer')
+    hero = top or items[0]
+    name = f"{(hero.get('color') or occasion).title()} {occasion.title()} Look"
+
+    description = f"{label(top).capitalize()} with {label(by_slot.get('bottom'))} and {label(by_slot.get('shoes'))}"
+    if by_slot.get('layer') and by_slot.get('layer') is not top:
+        description += f", layered under a {label(by_slot['layer'])}"
+    description += f" - formality-matched for {occasion} with no pattern or color clashes."
+
+    if by_slot.get('layer') and by_slot.get('layer') is not top:
+        tip = f"Wear the {label(by_slot['layer'])} open so the {label(top)} stays visible."
+    elif by_slot.get('accessory'):
+        tip = f"Let the {label(by_slot['accessory'])} be the single finishing detail."
+    else:
+        tip = f"Tuck the {label(top)} slightly at the front for a cleaner line."
+
+    return {
+        "outfit_name": name,
+        "description": description,
+        "item_ids": [item.get('id') for item in items],
+        "styling_tips": tip
+    }
+
+
+def rank_local_outfits(
+    clothing_list: list,
+    occasion: str = "casual",
+    style_dna: dict = None,
+    underused_items: list = None,
+    recent_combinations: list = None,
+    force_include_item_ids: list = None,
+    limit: int = MAX_OUTFIT_SUGGESTIONS,
+    season: str = None
+) -> List[List[Dict]]:
+    """
+    Find up to limit structurally valid, mutually distinct outfits.
+
+    Returns:
+        List of outfits (each a list of item dicts), best first. Empty if the
+        wardrobe cannot form a complete outfit.
+    """
+    underused_ids = {item.get('id') for item in underused_items} if underused_items else set()
+    forced_ids = set(force_include_item_ids or [])
+
+    slots = build_outfit_candidates(clothing_list, occasion, style_dna, season)
+
+    # Forced items pin their slot, even if occasion/Style DNA filtering removed them
+    forced_by_slot: Dict[str, List[Dict]] = {}
+    for item in clothing_list:
+        if item.get('id') in forced_ids:
+            forced_by_slot.setdefault(categorize_item(item), []).append(item)
+
+    def pool(slot: str, size: int) -> List[Dict]:
+        if slot in forced_by_slot:
+            return forced_by_slot[slot][:1]
+        ranked = sorted(
+            slots.get(slot, []),
+            key=lambda item: _item_prior(item, occasion, underused_ids),
+            reverse=True
+        )
+        return ranked[:size]
+
+    # Each item is encoded once; every stage is scored in one vectorized pass
+    wardrobe = EncodedWardrobe(clothing_list, underused_ids)
+
+    def score_all(candidates: List[List[Dict]]) -> List[Tuple[float, List[Dict]]]:
+        scores = score_outfits_batch(
+            wardrobe,
+            [[item.get('id') for item in items] for items in candidates],
+            occasion,
+            recent_combinations,
+            force_include_item_ids
+        )
+        return sorted(zip(scores.tolist(), candidates), key=lambda entry: entry[0], reverse=True)
+
+    base_tops = pool('base_top', CORE_POOL_SIZE)
+    layers = pool('layer', OPTIONAL_POOL_SIZE)
+    bottoms = pool('bottom', CORE_POOL_SIZE)
+    shoes = pool('shoes', CORE_POOL_SIZE)
+    accessories = pool('accessory', OPTIONAL_POOL_SIZE)
+
+    # Every pair compatibility check below is a bitwise AND on the wardrobe's matrix
+    compatibility = compatibility_for(base_tops + layers + bottoms + shoes + accessories)
+
+    # A layer can stand in as the top when there are no base tops
+    tops = base_tops or layers
+    layer_required = 'layer' in forced_by_slot and bool(base_tops)
+    if not (tops and bottoms and shoes):
+        return []
+
+    beam_width = max(BEAM_WIDTH, limit * 2)
+
+    # Stage 1: enumerate compatible core combinations
+    beam = score_all([
+        list(combo) for combo in product(tops, bottoms, shoes) if _is_compatible(compatibility, list(combo))
+    ])[:beam_width]
+
+    # Stages 2-3: extend with an optional layer, then an optional accessory
+    for options, required in ((layers if base_tops else [], layer_required),
+                              (accessories, 'accessory' in forced_by_slot)):
+        if not options:
+            continue
+        extended = [
+            items + [option]
+            for _, items in beam
+            for option in options
+            if option not in items and _is_compatible(compatibility, items + [option])
+        ]
+        if not required:
+            extended += [items for _, items in beam]
+        beam = score_all(extended)[:beam_width]
+
+    # Pick the best distinct outfits
+    selected: List[List[Dict]] = []
+    for _, items in beam:
+        is_valid, _ = validate_outfit_combination(items)
+        if not is_valid:
+            continue
+        # Skip near-duplicates, e.g. the same core outfit with an extra layer
+        ids = {item.get('id') for item in items}
+        if any(
+            len(ids & chosen_ids) / min(len(ids), len(chosen_ids)) >= MAX_SHARED_ITEM_RATIO
+            for chosen_ids in ({item.get('id') for item in chosen} for chosen in selected)
+        ):
+            continue
+        selected.append(items)
+        if len(selected) >= limit:
+            break
+
+    return selected
+
+
+def generate_local_outfits(
+    clothing_list: list,
+    occasion: str = "casual",
+    style_dna: dict = None,
+    underused_items: list = None,
+    recent_combinations: list = None,
+    force_include_item_ids: list = None,
+    top_k: int = MAX_OUTFIT_SUGGESTIONS,
+    season: str = None
+) -> list:
+    """
+    Generate up to top_k outfits locally, in the same format as generate_outfit_suggestions.
+
+    Args mirror generate_outfit_suggestions so the two are interchangeable.
+
+    Returns:
+        List of outfit dicts (outfit_name, description, item_ids, styling_tips),
+        best first. Empty if the wardrobe cannot form a complete outfit.
+    """
+    outfits = rank_local_outfits(
+        clothing_list, occasion, style_dna, underused_items, recent_combinations, force_include_item_ids, top_k, season
+    )
+    return [describe_local_outfit(items, occasion) for items in outfits]
+
+
+def repair_outfit(
+    outfit_items: List[Dict],
+    clothing_list: list,
+    occasion: str = "casual",
+    style_dna: dict = None,
+    underused_items: list = None,
+    recent_combinations: list = None,
+    force_include_item_ids: list = None,
+    wardrobe: Optional[EncodedWardrobe] = None,
+    season: str = None
+) -> Optional[List[Dict]]:
+    """
+    Turn an outfit rejected by validate_outfit_combination into a valid one.
+
+    Duplicate bottoms or shoes are narrowed down to one (surplus base tops to
+    two), and a missing top, bottom or shoes slot is filled from the
+    occasion/Style DNA filtered slot pools. Every resulting variant is
+    revalidated and the best-scoring compatible one wins.
+
+    Args mirror generate_local_outfits; pass an already built wardrobe to
+    avoid re-encoding it for every repaired outfit.
+
+    Returns:
+        The repaired items, or None when the wardrobe cannot fill a gap
+    """
+    if not outfit_items:
+        return None
+
+    underused_ids = {item.get('id') for item in underused_items} if underused_items else set()
+    forced_ids = set(force_include_item_ids or [])
+    present = organize_by_slots(outfit_items)
+    pools = build_outfit_candidates(clothing_list, occasion, style_dna, season)
+    wardrobe_slots = organize_by_slots(clothing_list)
+
+    def fill_options(slot: str) -> List[Dict]:
+        # Unfiltered items are a last resort when occasion/Style DNA filtering empties the pool
+        candidates = pools.get(slot) or wardrobe_slots.get(slot, [])
+        return sorted(
+            candidates,
+            key=lambda item: _item_prior(item, occasion, underused_ids),
+            reverse=True
+        )[:CORE_POOL_SIZE]
+
+    def forced_first(items: List[Dict]) -> List[Dict]:
+        return sorted(items, key=lambda item: item.get('id') not in forced_ids)
+
+    fixed = present['layer'] + present['accessory'] + forced_first(present['base_top'])[:2]
+    choices: List[List[Dict]] = []
+    if not present['base_top'] and not present['layer']:
+        choices.append(fill_options('base_top') or fill_options('layer'))
+    for slot in ('bottom', 'shoes'):
+        items = present[slot]
+        if len(items) == 1:
+            fixed.append(items[0])
+        else:
+            forced = [item for item in items if item.get('id') in forced_ids]
+            choices.append(forced[:1] or items or fill_options(slot))
+
+    if any(not options for options in choices):
+        return None
+
+    variants = [
+        fixed + list(combo) for combo in product(*choices)
+        if validate_outfit_combination(fixed + list(combo))[0]
+    ]
+    variant_items = {item.get('id'): item for items in variants for item in items}
+    compatibility = compatibility_for(list(variant_items.values()))
+    variants = [items for items in variants if _is_compatible(compatibility, items)] or variants
+    if not variants:
+        return None
+
+    wardrobe = wardrobe or EncodedWardrobe(clothing_list, underused_ids)
+    scores = score_outfits_batch(
+        wardrobe,
+        [[item.get('id') for item in items] for items in variants],
+        occasion,
+        recent_combinations,
+        force_include_item_ids
+    )
+    return variants[int(scores.argmax())]
@@ -1,7 +1,11 @@
 """
 Outfit Builder Service - Slot-based outfit construction with conflict detection
 """
+import re
+from functools import lru_cache
 from typing import List, Dict, Optional, Set
+from app.core.constants import SLOT_CACHE_MAX_ENTRIES
+from app.services.tag_index import tag_index_for
 
 
 # Category mappings
@@ -69,51 +73,68 @@ PATTERN_INTENSITY = {
     'paisley': 8
 }
 
+# Color families, in match priority order (navy before blue, off-white before white...)
+COLOR_FAMILIES = [
+    ('multicolor', ['multicolor', 'multi-color', 'multi', 'rainbow']),
+    ('navy', ['navy', 'indigo', 'midnight']),
+    ('white', ['off-white', 'white', 'ivory']),
+    ('black', ['black', 'jet', 'onyx']),
+    ('gray', ['gray', 'grey', 'charcoal', 'silver', 'heather', 'slate']),
+    ('beige', ['beige', 'cream', 'khaki', 'sand', 'taupe', 'stone', 'ecru', 'oatmeal']),
+    ('brown', ['brown', 'tan', 'camel', 'chocolate', 'cognac', 'coffee', 'mocha']),
+    ('red', ['red', 'burgundy', 'maroon', 'wine', 'crimson', 'oxblood']),
+    ('pink', ['pink', 'coral', 'blush', 'rose', 'magenta', 'fuchsia', 'salmon']),
+    ('orange', ['orange', 'rust', 'peach', 'terracotta']),
+    ('yellow', ['yellow', 'mustard', 'gold', 'lemon']),
+    ('green', ['green', 'olive', 'sage', 'mint', 'emerald', 'forest']),
+    ('blue', ['blue', 'teal', 'denim', 'cobalt', 'sky', 'turquoise', 'aqua']),
+    ('purple', ['purple', 'lavender', 'lilac', 'violet', 'plum', 'mauve'])
+]
+
+
+def _compile_keywords(keywords) -> "re.Pattern":
+    """One alternation regex matching any keyword as a substring"""
+    # Longest first so the regex never stops at a keyword's prefix
+    return re.compile("|".join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True)))
+
+
+# Slot keyword matchers, in priority order: the first slot with any match wins
+_SLOT_MATCHERS = [
+    ('shoes', _compile_keywords(SHOE_CATEGORIES)),        # most specific
+    ('layer', _compile_keywords(LAYER_CATEGORIES)),       # before base tops to catch jackets
+    ('base_top', _compile_keywords(BASE_TOP_CATEGORIES)),
+    ('bottom', _compile_keywords(BOTTOM_CATEGORIES)),
+    ('accessory', _compile_keywords(ACCESSORY_CATEGORIES))
+]
+
+# Fallback on the primary category alone when no keyword matched
+_CATEGORY_FALLBACK_MATCHERS = [
+    ('shoes', _compile_keywords(['shoe', 'boot', 'sneaker'])),
+    ('layer', _compile_keywords(['jacket', 'coat', 'blazer'])),
+    ('bottom', _compile_keywords(['pant', 'jean', 'short', 'skirt'])),
+    ('base_top', _compile_keywords(['shirt', 'tee', 'top']))
+]
+
+
+_COLOR_FAMILY_MATCHERS = [(family, _compile_keywords(keywords)) for family, keywords in COLOR_FAMILIES]
+
+
+@lru_cache(maxsize=SLOT_CACHE_MAX_ENTRIES)
+def _slot_for(category: str, subcategory: str) -> str:
+    category = category.lower()
+    full_text = f"{category} {subcategory.lower()}"
+    for slot, matcher in _SLOT_MATCHERS:
+        if matcher.search(full_text):
+            return slot
+    for slot, matcher in _CATEGORY_FALLBACK_MATCHERS:
+        if matcher.search(category):
+            return slot
+    return 'accessory'
+
 
 def categorize_item(item: Dict) -> str:
-    """Determine which slot an item belongs to"""
-    category = (item.get('category') or '').lower()
-    subcategory = (item.get('subcategory') or '').lower()
-    
-    # Check all fields for matching
-    full_text = f"{category} {subcategory}".lower()
-    
-    # Check shoes first (most specific)
-    for shoe_cat in SHOE_CATEGORIES:
-        if shoe_cat in full_text:
-            return 'shoes'
-    
-    # Check layers (before base tops to catch jackets)
-    for layer_cat in LAYER_CATEGORIES:
-        if layer_cat in full_text:
-            return 'layer'
-    
-    # Check base tops
-    for top_cat in BASE_TOP_CATEGORIES:
-        if top_cat in full_text:
-            return 'base_top'
-    
-    # Check bottoms
-    for bottom_cat in BOTTOM_CATEGORIES:
-        if bottom_cat in full_text:
-            return 'bottom'
-    
-    # Check accessories
-    for acc_cat in ACCESSORY_CATEGORIES:
-        if acc_cat in full_text:
-            return 'accessory'
-    
-    # Default fallback based on primary category
-    if 'shoe' in category or 'boot' in category or 'sneaker' in category:
-        return 'shoes'
-    elif 'jacket' in category or 'coat' in category or 'blazer' in category:
-        return 'layer'
-    elif 'pant' in category or 'jean' in category or 'short' in category or 'skirt' in category:
-        return 'bottom'
-    elif 'shirt' in category or 'tee' in category or 'top' in category:
-        return 'base_top'
-    else:
-        return 'accessory'
+    """Determine which slot an item belongs to (stored slot, else memoized per category/subcategory)"""
+    return item.get('slot') or _slot_for(item.get('category') or '', item.get('subcategory') or '')
 
 
 def organize_by_slots(items: List[Dict]) -> Dict[str, List[Dict]]:
@@ -135,6 +156,8 @@ def organize_by_slots(items: List[Dict]) -> Dict[str, List[Dict]]:
 
 def get_formality_score(item: Dict) -> int:
     """Get formality score for an item (0-10)"""
+    if item.get('formality_score') is not None:
+        return item['formality_score']
     category = (item.get('category') or '').lower()
     subcategory = (item.get('subcategory') or '').lower()
     
@@ -149,6 +172,8 @@ def get_formality_score(item: Dict) -> int:
 
 def get_pattern_intensity(item: Dict) -> int:
     """Get pattern intensity for an item (0-10)"""
+    if item.get('pattern_intensity') is not None:
+        return item['pattern_intensity']
     pattern = (item.get('pattern') or 'solid').lower()
     
     for key, value in PATTERN_INTENSITY.items():
@@ -158,6 +183,19 @@ def get_pattern_intensity(item: Dict) -> int:
     return 0
 
 
+def get_color_family(item: Dict) -> Optional[str]:
+    """Normalized family of an item's primary color ("other" if unrecognized, None without a color)"""
+    if item.get('color_family'):
+        return item['color_family']
+    color = (item.get('color') or '').lower().strip()
+    if not color:
+        return None
+    for family, matcher in _COLOR_FAMILY_MATCHERS:
+        if matcher.search(color):
+            return family
+    return 'other'
+
+
 def check_formality_compatibility(items: List[Dict]) -> bool:
     """Check if items have compatible formality levels"""
     if not items:
@@ -192,7 +230,7 @@ def check_color_compatibility(items: List[Dict]) -> bool:
     """Basic color clash detection"""
     colors = []
     for item in items:
-        color = (item.get('color') or '').lower()
+        color = get_color_family(item)
         if color:
             colors.append(color)
     
@@ -212,43 +250,49 @@ def check_color_compatibility(items: List[Dict]) -> bool:
     return True
 
 
-def filter_by_occasion(items: List[Dict], occasion: str) -> List[Dict]:
-    """Filter items suitable for the occasion"""
-    occasion_lower = occasion.lower()
-    
-    filtered = []
-    for item in items:
-        occasion_tags = (item.get('occasion_tags') or '').lower()
-        
-        # If item has no tags, include it (neutral)
-        if not occasion_tags:
-            filtered.append(item)
-            continue
-        
-        # Check if occasion matches tags
-        if occasion_lower in occasion_tags or 'all' in occasion_tags or 'casual' in occasion_tags:
-            filtered.append(item)
-        # Special cases
-        elif occasion_lower in ['work', 'business'] and any(tag in occasion_tags for tag in ['formal', 'business', 'work']):
-            filtered.append(item)
-        elif occasion_lower in ['party', 'date', 'night'] and any(tag in occasion_tags for tag in ['party', 'date', 'evening']):
-            filtered.append(item)
-    
-    return filtered if filtered else items  # Fallback to all items if nothing matches
+# Slots every outfit needs - a filter must never leave one of these empty
+CORE_SLOTS = ('base_top', 'bottom', 'shoes')
+
+
+def filter_by_occasion(items: List[Dict], occasion: str, season: Optional[str] = None) -> List[Dict]:
+    """
+    Filter items suitable for the occasion (and season, when given)
+
+    Selection is a set intersection over the wardrobe's tag index. The season
+    narrows each slot separately: a core slot with no item for the season keeps
+    its occasion-suitable items. When nothing fits the occasion, every item is
+    kept.
+    """
+    index = tag_index_for(items)
+    occasion_ids = index.occasion_ids(occasion)
+    filtered = [item for item in items if item.get('id') in occasion_ids]
+    if not filtered:
+        filtered = items  # Fallback to all items if nothing matches
+
+    if season:
+        seasonal_ids = index.season_ids(season)
+        seasonal_slots = {categorize_item(item) for item in filtered if item.get('id') in seasonal_ids}
+        filtered = [
+            item for item in filtered
+            if item.get('id') in seasonal_ids
+            or (categorize_item(item) in CORE_SLOTS and categorize_item(item) not in seasonal_slots)
+        ]
+    return filtered
 
 
 def build_outfit_candidates(
     clothing_list: List[Dict],
     occasion: str,
-    style_dna: Optional[Dict] = None
+    style_dna: Optional[Dict] = None,
+    season: Optional[str] = None
 ) -> Dict[str, List[Dict]]:
     """
     Build candidate pools for each slot with filtering and validation
     
     Returns organized slots with filtered, compatible items
     """
-    # Filter by occasion first
-    suitable_items = filter_by_occasion(clothing_list, occasion)
+    # Filter by occasion (and season) first
+    suitable_items = filter_by_occasion(clothing_list, occasion, season)
     
     # Organize into slots
     slots = organize_by_slots(suitable_items)
@@ -0,0 +1,157 @@
+"""
+Outfit Cache Service - Reuse generated outfit suggestions while inputs are unchanged
+
+A suggestion set depends on the user's items, the occasion, season/weather,
+Style DNA, forced items and the generation engine. The cache key hashes all of these (including each
+item's and the Style DNA's updated_at), so any edit naturally produces a new key;
+writes additionally drop the user's entries so stale results do not linger.
+
+Entries live in each worker's memory. Shared entries (pre-generated sets) are
+also written to the pregenerated_outfits table, so a set generated by one
+worker process is a cache hit on every other; a worker that misses in memory
+looks there and keeps what it finds.
+"""
+import copy
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from app.database import SessionLocal
+from app.models.clothing import PregeneratedOutfits
+from app.core.constants import OUTFIT_CACHE_TTL, OUTFIT_CACHE_MAX_ENTRIES
+
+# key -> (expires_at, user_id, suggestions)
+_cache: Dict[str, Tuple[float, int, List[Dict]]] = {}
+_lock = threading.Lock()
+
+
+def build_outfit_cache_key(
+    user_id: int,
+    clothing_items: list,
+    occasion: str,
+    season: Optional[str] = None,
+    weather: Optional[str] = None,
+    style_dna=None,
+    force_include_item_ids: Optional[List[int]] = None,
+    engine: str = "ai"
+) -> str:
+    """Hash every input that influences a generated suggestion set"""
+    key_data = {
+        "user_id": user_id,
+        "items": sorted(
+            (item.id, item.updated_at.isoformat() if item.updated_at else None)
+            for item in clothing_items
+        ),
+        "occasion": (occasion or "").lower(),
+        "season": (season or "").lower(),
+        "weather": (weather or "").lower(),
+        "style_dna": style_dna.updated_at.isoformat() if style_dna and style_dna.updated_at else None,
+        "forced": sorted(force_include_item_ids or []),
+        "engine": engine,
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_cached_outfits(cache_key: str) -> Optional[List[Dict]]:
+    """Return cached suggestions for the key, or None if missing or expired"""
+    with _lock:
+        entry = _cache.get(cache_key)
+        if entry is not None:
+            expires_at, _, suggestions = entry
+            if expires_at >= time.time():
+                return copy.deepcopy(suggestions)
+            del _cache[cache_key]
+    return _get_shared_outfits(cache_key)
+
+
+def _get_shared_outfits(cache_key: str) -> Optional[List[Dict]]:
+    """Look a key up in the shared table, keeping a hit in this worker's memory"""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        entry = db.query(PregeneratedOutfits).filter(
+            PregeneratedOutfits.cache_key == cache_key,
+            PregeneratedOutfits.expires_at > now
+        ).first()
+        if entry is None:
+            return None
+        user_id, suggestions = entry.user_id, json.loads(entry.suggestions_json)
+        expires_at = time.time() + (entry.expires_at - now).total_seconds()
+    finally:
+        db.close()
+
+    with _lock:
+        _cache[cache_key] = (expires_at, user_id, copy.deepcopy(suggestions))
+    return suggestions
+
+
+def is_cacheable(suggestions: List[Dict]) -> bool:
+    """Only real suggestions are cached - never error or "Unable to generate" placeholders"""
+    return bool(suggestions) and all(suggestion.get("item_ids") for suggestion in suggestions)
+
+
+def store_outfits(
+    cache_key: str,
+    user_id: int,
+    suggestions: List[Dict],
+    ttl: int = OUTFIT_CACHE_TTL,
+    shared: bool = False
+) -> None:
+    """Cache a suggestion set for ttl seconds, in the shared table too when shared"""
+    if not is_cacheable(suggestions):
+        return
+    if shared:
+        _store_shared_outfits(cache_key, user_id, suggestions, ttl)
+
+    now = time.time()
+    with _lock:
+        # Drop expired entries, then the oldest ones if still over the bound
+        for key in [key for key, entry in _cache.items() if entry[0] < now]:
+            del _cache[key]
+        while len(_cache) >= OUTFIT_CACHE_MAX_ENTRIES:
+            oldest_key = min(_cache, key=lambda key: _cache[key][0])
+            del _cache[oldest_key]
+
+        _cache[cache_key] = (now + ttl, user_id, copy.deepcopy(suggestions))
+
+
+def _store_shared_outfits(cache_key: str, user_id: int, suggestions: List[Dict], ttl: int) -> None:
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        db.query(PregeneratedOutfits).filter(PregeneratedOutfits.expires_at <= now).delete(synchronize_session=False)
+        entry = db.query(PregeneratedOutfits).filter(PregeneratedOutfits.cache_key == cache_key).first()
+        if entry is None:
+            entry = PregeneratedOutfits(cache_key=cache_key, user_id=user_id)
+            db.add(entry)
+        entry.suggestions_json = json.dumps(suggestions)
+        entry.created_at = now
+        entry.expires_at = now + timedelta(seconds=ttl)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker stored the same set concurrently
+            db.rollback()
+    finally:
+        db.close()
+
+
+def invalidate_user_outfits(user_id: int) -> int:
+    """Drop all cached suggestion sets for a user, shared ones included. Returns number removed."""
+    with _lock:
+        keys = [key for key, entry in _cache.items() if entry[1] == user_id]
+        for key in keys:
+            del _cache[key]
+
+    db = SessionLocal()
+    try:
+        shared = db.query(PregeneratedOutfits).filter(
+            PregeneratedOutfits.user_id == user_id
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    return len(keys) + shared
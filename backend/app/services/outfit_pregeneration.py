@@ -0,0 +1,286 @@
+"""
+Outfit Pre-generation - Speculatively fill the outfit cache before users ask
+
+A background scheduler generates suggestions for each active user's most-used
+occasions (summed from ItemUsageStats.occasion_counts) and stores them under
+the exact cache key an interactive /generate request for the full wardrobe
+would use, so the first tap on "casual" or "work" is usually a cache hit.
+
+It sweeps all active users once a day during the off-peak hours and re-runs
+for a user shortly after their wardrobe or Style DNA changes (debounced, so a
+bulk upload or analysis job triggers one run). Every generation counts against
+a per-user daily budget, and nothing is generated while the AI circuit is open.
+Only real AI results are cached; a local fallback for a failed call is dropped
+and its budget returned.
+
+Every worker process runs the scheduler, so the state they must agree on lives
+in the database: generated sets are stored as shared outfit cache entries, the
+daily budget is a row per user in pregeneration_budget that workers draw from
+with conditional updates, and each user's off-peak sweep is claimed the same
+way so only one worker runs it. The dirty-user queue stays per process - a
+wardrobe change is only queued by the worker that handled it.
+"""
+import asyncio
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from app.config import settings
+from app.database import SessionLocal
+from app.models.clothing import ClothingItem, ItemUsageStats, OutfitHistory, PregenerationBudget
+from app.models.style_dna import StyleDNA
+from app.services.ai_client import circuit_breaker, run_ai_call
+from app.services.ai_service import generate_outfit_suggestions, is_degraded, items_for_ai, style_dna_for_ai
+from app.services.compatibility_matrix import load_compatibility_matrix
+from app.services.tag_index import load_tag_index
+from app.services.outfit_cache import build_outfit_cache_key, get_cached_outfits, store_outfits
+from app.services.usage_stats_service import get_underused_items_details, get_recent_outfit_combinations
+from app.core.constants import (
+    PREGEN_TICK_SECONDS,
+    PREGEN_DEBOUNCE_SECONDS,
+    PREGEN_OCCASIONS_PER_USER,
+    PREGEN_ACTIVE_USER_DAYS,
+    PREGEN_CACHE_TTL
+)
+
+# user_id -> monotonic time of the latest wardrobe change not yet pre-generated for
+_dirty_users: Dict[int, float] = {}
+_lock = threading.Lock()
+
+_last_sweep: Optional[date] = None
+_scheduler_task: Optional[asyncio.Task] = None
+
+
+def mark_wardrobe_changed(user_id: int) -> None:
+    """Queue a user for pre-generation once their wardrobe has been quiet for a while"""
+    if settings.AI_PREGENERATION:
+        with _lock:
+            _dirty_users[user_id] = time.monotonic()
+
+
+def _budget_row(db, user_id: int, today: date) -> None:
+    """Make sure the user has a budget row; another worker may be creating it too"""
+    if db.query(PregenerationBudget.id).filter(PregenerationBudget.user_id == user_id).first():
+        return
+    db.add(PregenerationBudget(user_id=user_id, day=today, used=0))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+
+
+def _consume_budget(user_id: int) -> bool:
+    """Take one generation from the user's daily budget; False once it is spent"""
+    today = date.today()
+    db = SessionLocal()
+    try:
+        _budget_row(db, user_id, today)
+        # A new day resets the count - the first worker to see it takes the first slot
+        taken = db.query(PregenerationBudget).filter(
+            PregenerationBudget.user_id == user_id,
+            PregenerationBudget.day != today
+        ).update({"day": today, "used": 1}, synchronize_session=False)
+        if not taken:
+            taken = db.query(PregenerationBudget).filter(
+                PregenerationBudget.user_id == user_id,
+                PregenerationBudget.day == today,
+                PregenerationBudget.used < settings.AI_PREGEN_DAILY_BUDGET
+            ).update({"used": PregenerationBudget.used + 1}, synchronize_session=False)
+        db.commit()
+        return taken == 1
+    finally:
+        db.close()
+
+
+def _refund_budget(user_id: int) -> None:
+    """Give back a generation whose result was not cached"""
+    db = SessionLocal()
+    try:
+        db.query(PregenerationBudget).filter(
+            PregenerationBudget.user_id == user_id,
+            PregenerationBudget.day == date.today(),
+            PregenerationBudget.used > 0
+        ).update({"used": PregenerationBudget.used - 1}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _claim_sweep(db, user_id: int, today: date) -> bool:
+    """Claim today's off-peak sweep of a user, so only one worker runs it"""
+    _budget_row(db, user_id, today)
+    claimed = db.query(PregenerationBudget).filter(
+        PregenerationBudget.user_id == user_id,
+        (PregenerationBudget.swept_on.is_(None)) | (PregenerationBudget.swept_on != today)
+    ).update({"swept_on": today}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+
+def _is_off_peak(now: datetime) -> bool:
+    """Whether the local hour is inside AI_PREGEN_OFF_PEAK_HOURS ("START-END", may wrap midnight)"""
+    start, _, end = settings.AI_PREGEN_OFF_PEAK_HOURS.partition("-")
+    start, end = int(start), int(end)
+    if start <= end:
+        return start <= now.hour < end
+    return now.hour >= start or now.hour < end
+
+
+def top_occasions(db, user_id: int, limit: int = PREGEN_OCCASIONS_PER_USER) -> List[str]:
+    """The user's most-used occasions, summed over every item's occasion counts"""
+    totals: Dict[str, int] = {}
+    for (occasion_counts,) in db.query(ItemUsageStats.occasion_counts).filter(
+        ItemUsageStats.user_id == user_id
+    ).all():
+        for occasion, count in json.loads(occasion_counts or '{}').items():
+            # Cache keys are case-insensitive on the occasion
+            key = occasion.strip().lower()
+            if key:
+                totals[key] = totals.get(key, 0) + count
+    return sorted(totals, key=totals.get, reverse=True)[:limit]
+
+
+def _active_user_ids(db) -> List[int]:
+    """Users who were shown outfits recently"""
+    since = datetime.utcnow() - timedelta(days=PREGEN_ACTIVE_USER_DAYS)
+    return [
+        row.user_id for row in db.query(OutfitHistory.user_id)
+        .filter(OutfitHistory.shown_at >= since)
+        .distinct()
+        .all()
+    ]
+
+
+def _sweep_user_ids() -> List[int]:
+    """Active users whose sweep this worker claimed for today"""
+    today = date.today()
+    db = SessionLocal()
+    try:
+        return [user_id for user_id in _active_user_ids(db) if _claim_sweep(db, user_id, today)]
+    finally:
+        db.close()
+
+
+def _pregeneration_context(user_id: int) -> Optional[Dict]:
+    """
+    Load what a pre-generation run needs for the user's uncached top occasions.
+
+    Blocking database work (including building the compatibility matrix and
+    tag index on first use), so it runs on a worker thread. Returns None when
+    there is nothing to generate.
+    """
+    db = SessionLocal()
+    try:
+        occasions = top_occasions(db, user_id)
+        if not occasions:
+            return None
+
+        clothing_items = db.query(ClothingItem).filter(ClothingItem.user_id == user_id).all()
+        if not clothing_items:
+            return None
+        style_dna = db.query(StyleDNA).filter(StyleDNA.user_id == user_id).first()
+
+        cache_keys = {}
+        for occasion in occasions:
+            cache_key = build_outfit_cache_key(user_id, clothing_items, occasion, style_dna=style_dna)
+            if get_cached_outfits(cache_key) is None:
+                cache_keys[occasion] = cache_key
+        if not cache_keys:
+            return None
+
+        load_compatibility_matrix(db, user_id)
+        load_tag_index(db, user_id)
+        return {
+            "occasions": occasions,
+            "cache_keys": cache_keys,
+            "items_data": items_for_ai(clothing_items),
+            "style_dna_dict": style_dna_for_ai(style_dna),
+            "underused_items": get_underused_items_details(db, user_id, limit=10),
+            "recent_combinations": get_recent_outfit_combinations(db, user_id, days=14)
+        }
+    finally:
+        db.close()
+
+
+async def pregenerate_for_user(user_id: int) -> int:
+    """
+    Generate and cache suggestions for the user's top occasions.
+
+    Mirrors an interactive /generate request for the whole wardrobe (no season,
+    weather or forced items, AI engine). Occasions already cached are skipped
+    without using budget. Returns the number of suggestion sets generated.
+    """
+    if circuit_breaker.is_open:
+        return 0
+    context = await run_in_threadpool(_pregeneration_context, user_id)
+    if context is None:
+        return 0
+
+    generated = 0
+    for occasion, cache_key in context["cache_keys"].items():
+        if circuit_breaker.is_open or not await run_in_threadpool(_consume_budget, user_id):
+            break
+
+        suggestions = await run_ai_call(
+            generate_outfit_suggestions,
+            context["items_data"],
+            occasion,
+            context["style_dna_dict"],
+            None,
+            context["underused_items"],
+            context["recent_combinations"],
+            None
+        )
+        if is_degraded(suggestions):
+            # The AI failed - a local fallback is no substitute for the AI result /generate expects
+            await run_in_threadpool(_refund_budget, user_id)
+            break
+        await run_in_threadpool(store_outfits, cache_key, user_id, suggestions, ttl=PREGEN_CACHE_TTL, shared=True)
+        generated += 1
+
+    if generated:
+        print(f"[Pre-generation] User {user_id}: cached {generated} suggestion set(s) for {context['occasions']}")
+    return generated
+
+
+def _take_settled_users() -> Set[int]:
+    """Users whose last wardrobe change is older than the debounce window"""
+    cutoff = time.monotonic() - PREGEN_DEBOUNCE_SECONDS
+    with _lock:
+        settled = {user_id for user_id, changed_at in _dirty_users.items() if changed_at <= cutoff}
+        for user_id in settled:
+            del _dirty_users[user_id]
+    return settled
+
+
+async def _run_scheduler() -> None:
+    """Pre-generate for changed users every tick, and for all active users once per off-peak window"""
+    global _last_sweep
+    while True:
+        await asyncio.sleep(PREGEN_TICK_SECONDS)
+        try:
+            user_ids = _take_settled_users()
+
+            now = datetime.now()
+            if _is_off_peak(now) and _last_sweep != now.date():
+                _last_sweep = now.date()
+                user_ids.update(await run_in_threadpool(_sweep_user_ids))
+
+            # One user at a time so interactive requests keep most of the AI capacity
+            for user_id in user_ids:
+                await pregenerate_for_user(user_id)
+        except Exception as e:
+            print(f"[Pre-generation] Scheduler tick failed: {str(e)}")
+
+
+def start_pregeneration_scheduler() -> bool:
+    """Start the scheduler on the running event loop. Returns False when disabled."""
+    global _scheduler_task
+    if not settings.AI_PREGENERATION:
+        return False
+    if _scheduler_task is None or _scheduler_task.done():
+        _scheduler_task = asyncio.create_task(_run_scheduler())
+    return True
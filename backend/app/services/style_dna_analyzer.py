@@ -1,15 +1,92 @@
-import google.generativeai as genai
-import json
-import base64
 import os
 from pathlib import Path
+from app.services.image_pipeline import load_image_for_ai
+from app.services.ai_client import call_model
+from app.services.llm_json import parse_json_object, record_parse_outcome
+from app.services.ai_schemas import array_schema, object_schema, string_field
 
-# Configure Gemini API
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY environment variable not set.")
+_STRING_LIST = array_schema(string_field())
+_COLOR_CHOICES = array_schema(object_schema({
+    "name": string_field(),
+    "hex": string_field(),
+    "reason": string_field()
+}))
 
-genai.configure(api_key=GEMINI_API_KEY)
+FACE_ANALYSIS_RESPONSE_SCHEMA = object_schema({
+    "skin_tone": string_field(),
+    "undertone": string_field(),
+    "undertone_confidence": {"type": "number"},
+    "best_colors": _COLOR_CHOICES,
+    "avoid_colors": _COLOR_CHOICES,
+    "complementary_palette": object_schema({
+        "neutrals": _STRING_LIST,
+        "accent_colors": _STRING_LIST,
+        "metallics": string_field()
+    }),
+    "seasonal_palette": string_field(),
+    "analysis_notes": string_field(),
+    "lighting_quality": string_field(),
+    "confidence_score": {"type": "number"}
+})
+
+BODY_ANALYSIS_RESPONSE_SCHEMA = object_schema({
+    "body_shape": string_field(),
+    "body_shape_confidence": {"type": "number"},
+    "proportions": object_schema({
+        "shoulders": string_field(),
+        "waist": string_field(),
+        "hips": string_field(),
+        "torso_length": string_field(),
+        "leg_length": string_field()
+    }),
+    "height_estimate": {"type": "number", "nullable": True},
+    "recommended_fits": object_schema({
+        "tops": object_schema({
+            "fit": string_field(),
+            "reason": string_field(),
+            "necklines": _STRING_LIST,
+            "sleeve_lengths": _STRING_LIST,
+            "specific_tips": _STRING_LIST
+        }),
+        "bottoms": object_schema({
+            "fit": string_field(),
+            "reason": string_field(),
+            "rise": string_field(),
+            "styles": _STRING_LIST,
+            "specific_tips": _STRING_LIST
+        })
+    }),
+    "balance_tips": _STRING_LIST,
+    "flattering_details": _STRING_LIST,
+    "photo_quality": string_field(),
+    "visibility_issues": string_field(),
+    "confidence_score": {"type": "number"}
+})
+
+STYLE_INSPIRATION_RESPONSE_SCHEMA = object_schema({
+    "dominant_styles": _STRING_LIST,
+    "color_patterns": object_schema({
+        "most_worn_colors": _STRING_LIST,
+        "color_combinations": _STRING_LIST,
+        "color_preference": string_field()
+    }),
+    "pattern_preferences": object_schema({
+        "patterns_used": _STRING_LIST,
+        "pattern_frequency": string_field()
+    }),
+    "fit_preferences": object_schema({
+        "general_fit": string_field(),
+        "consistency": string_field()
+    }),
+    "formality_level": object_schema({
+        "primary": string_field(),
+        "range": string_field()
+    }),
+    "signature_elements": _STRING_LIST,
+    "style_evolution": string_field(),
+    "style_personality": string_field(),
+    "confidence_score": {"type": "number"}
+})
 
 
 def analyze_face_photo(image_path: str) -> dict:
@@ -25,23 +102,8 @@ def analyze_face_photo(image_path: str) -> dict:
                 "error": f"Image file not found: {image_path}"
             }
         
-        # Determine MIME type from file extension
-        mime_type = "image/jpeg"
-        if image_path.lower().endswith((".png", ".PNG")):
-            mime_type = "image/png"
-        elif image_path.lower().endswith((".gif", ".GIF")):
-            mime_type = "image/gif"
-        elif image_path.lower().endswith((".webp", ".WEBP")):
-            mime_type = "image/webp"
-        
-        # Read image as bytes
-        with open(image_path, "rb") as img_file:
-            image_bytes = img_file.read()
-        
-        # Encode to base64
-        image_data = base64.standard_b64encode(image_bytes).decode("utf-8")
-        
-        model = genai.GenerativeModel("gemini-3.1-flash-lite-preview")
+        # Load image (auto-oriented, metadata stripped, downscaled)
+        image_part = load_image_for_ai(image_path)
         
         analysis_prompt = """Analyze this face photo and provide a comprehensive skin tone and color analysis for fashion recommendations.
 
@@ -86,48 +148,38 @@ Analysis Guidelines:
 Return ONLY the JSON object, starting with { and ending with }."""
         
         # Call Gemini with image
-        response = model.generate_content([
-            {
-                "mime_type": mime_type,
-                "data": image_data,
-            },
+        response = call_model([
+            image_part,
             analysis_prompt
-        ])
+        ], call_name="face_analysis", response_schema=FACE_ANALYSIS_RESPONSE_SCHEMA)
         
         # Get response text
         response_text = response.text.strip()
         
-        # Clean markdown if present
-        if response_text.startswith("```json"):
-            response_text = response_text.replace("```json", "").replace("```", "").strip()
-        elif response_text.startswith("```"):
-            response_text = response_text.replace("```", "").strip()
-        
-        # Try to parse as JSON
-        try:
-            analysis_data = json.loads(response_text)
-            
-            # Validate required fields
-            required_fields = ["skin_tone", "undertone", "best_colors", "avoid_colors"]
-            if all(field in analysis_data for field in required_fields):
-                return {
-                    "analysis_successful": True,
-                    "data": analysis_data
-                }
-            else:
-                return {
-                    "analysis_successful": False,
-                    "error": "Missing required fields in AI response",
-                    "raw_response": response_text[:500]
-                }
-                
-        except json.JSONDecodeError as e:
-            print(f"JSON Parse Error: {str(e)}")
+        # Parse JSON (tolerates markdown fences and surrounding prose)
+        analysis_data = parse_json_object(response_text)
+        record_parse_outcome("face_analysis", analysis_data is not None)
+        if analysis_data is None:
+            print("JSON Parse Error: no JSON object in response")
             return {
                 "analysis_successful": False,
                 "error": "Failed to parse AI response as JSON",
                 "raw_response": response_text[:500]
             }
+        
+        # Validate required fields
+        required_fields = ["skin_tone", "undertone", "best_colors", "avoid_colors"]
+        if all(field in analysis_data for field in required_fields):
+            return {
+                "analysis_successful": True,
+                "data": analysis_data
+            }
+        else:
+            return {
+                "analysis_successful": False,
+                "error": "Missing required fields in AI response",
+                "raw_response": response_text[:500]
+            }
     
     except Exception as e:
         print(f"Face Analysis Error: {str(e)}")
@@ -150,22 +202,8 @@ def analyze_body_photo(image_path: str) -> dict:
                 "error": f"Image file not found: {image_path}"
             }
         
-        # Determine MIME type
-        mime_type = "image/jpeg"
-        if image_path.lower().endswith((".png", ".PNG")):
-            mime_type = "image/png"
-        elif image_path.lower().endswith((".gif", ".GIF")):
-            mime_type = "image/gif"
-        elif image_path.lower().endswith((".webp", ".WEBP")):
-            mime_type = "image/webp"
-        
-        # Read image
-        with open(image_path, "rb") as img_file:
-            image_bytes = img_file.read()
-        
-        image_data = base64.standard_b64encode(image_bytes).decode("utf-8")
-        
-        model = genai.GenerativeModel("gemini-3.1-flash-lite-preview")
+        # Load image (auto-oriented, metadata stripped, downscaled)
+        image_part = load_image_for_ai(image_path)
         
         analysis_prompt = """Analyze this full-body photo to determine body shape and provide personalized fit recommendations.
 
@@ -225,46 +263,36 @@ Analysis Guidelines:
 Return ONLY the JSON object."""
         
         # Call Gemini
-        response = model.generate_content([
-            {
-                "mime_type": mime_type,
-                "data": image_data,
-            },
+        response = call_model([
+            image_part,
             analysis_prompt
-        ])
+        ], call_name="body_analysis", response_schema=BODY_ANALYSIS_RESPONSE_SCHEMA)
         
         response_text = response.text.strip()
         
-        # Clean markdown
-        if response_text.startswith("```json"):
-            response_text = response_text.replace("```json", "").replace("```", "").strip()
-        elif response_text.startswith("```"):
-            response_text = response_text.replace("```", "").strip()
-        
-        # Parse JSON
-        try:
-            analysis_data = json.loads(response_text)
-            
-            required_fields = ["body_shape", "proportions", "recommended_fits"]
-            if all(field in analysis_data for field in required_fields):
-                return {
-                    "analysis_successful": True,
-                    "data": analysis_data
-                }
-            else:
-                return {
-                    "analysis_successful": False,
-                    "error": "Missing required fields in AI response",
-                    "raw_response": response_text[:500]
-                }
-                
-        except json.JSONDecodeError as e:
-            print(f"JSON Parse Error: {str(e)}")
+        # Parse JSON (tolerates markdown fences and surrounding prose)
+        analysis_data = parse_json_object(response_text)
+        record_parse_outcome("body_analysis", analysis_data is not None)
+        if analysis_data is None:
+            print("JSON Parse Error: no JSON object in response")
             return {
                 "analysis_successful": False,
                 "error": "Failed to parse AI response",
                 "raw_response": response_text[:500]
             }
+        
+        required_fields = ["body_shape", "proportions", "recommended_fits"]
+        if all(field in analysis_data for field in required_fields):
+            return {
+                "analysis_successful": True,
+                "data": analysis_data
+            }
+        else:
+            return {
+                "analysis_successful": False,
+                "error": "Missing required fields in AI response",
+                "raw_response": response_text[:500]
+            }
     
     except Exception as e:
         print(f"Body Analysis Error: {str(e)}")
@@ -292,18 +320,7 @@ def analyze_style_inspiration(image_paths: list) -> dict:
             if not os.path.exists(image_path):
                 continue
                 
-            mime_type = "image/jpeg"
-            if image_path.lower().endswith((".png", ".PNG")):
-                mime_type = "image/png"
-            
-            with open(image_path, "rb") as img_file:
-                image_bytes = img_file.read()
-            
-            image_data = base64.standard_b64encode(image_bytes).decode("utf-8")
-            images_data.append({
-                "mime_type": mime_type,
-                "data": image_data
-            })
+            images_data.append(load_image_for_ai(image_path))
         
         if len(images_data) == 0:
             return {
@@ -311,8 +328,6 @@ def analyze_style_inspiration(image_paths: list) -> dict:
                 "error": "No valid images found"
             }
         
-        model = genai.GenerativeModel("gemini-3.1-flash-lite-preview")
-        
         analysis_prompt = f"""Analyze these {len(images_data)} outfit photos to extract the user's style preferences and patterns.
 
 Return ONLY valid JSON (no markdown):
@@ -367,32 +382,25 @@ Return ONLY the JSON object."""
         content.append(analysis_prompt)
         
         # Call Gemini
-        response = model.generate_content(content)
+        response = call_model(content, call_name="style_inspiration", response_schema=STYLE_INSPIRATION_RESPONSE_SCHEMA)
         response_text = response.text.strip()
         
-        # Clean markdown
-        if response_text.startswith("```json"):
-            response_text = response_text.replace("```json", "").replace("```", "").strip()
-        elif response_text.startswith("```"):
-            response_text = response_text.replace("```", "").strip()
-        
-        # Parse JSON
-        try:
-            analysis_data = json.loads(response_text)
-            
-            return {
-                "analysis_successful": True,
-                "data": analysis_data,
-                "photos_analyzed": len(images_data)
-            }
-                
-        except json.JSONDecodeError as e:
-            print(f"JSON Parse Error: {str(e)}")
+        # Parse JSON (tolerates markdown fences and surrounding prose)
+        analysis_data = parse_json_object(response_text)
+        record_parse_outcome("style_inspiration", analysis_data is not None)
+        if analysis_data is None:
+            print("JSON Parse Error: no JSON object in response")
             return {
                 "analysis_successful": False,
                 "error": "Failed to parse AI response",
                 "raw_response": response_text[:500]
             }
+        
+        return {
+            "analysis_successful": True,
+            "data": analysis_data,
+            "photos_analyzed": len(images_data)
+        }
     
     except Exception as e:
         print(f"Style Inspiration Analysis Error: {str(e)}")
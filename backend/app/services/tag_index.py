@@ -0,0 +1,241 @@
+"""
+Tag Index - Occasion and season inverted index over wardrobe tags
+
+Instead of substring-scanning every item's comma-separated occasion_tags on
+each request, tags are normalized once into an inverted index per wardrobe:
+occasion -> item IDs and season -> item IDs. Synonyms are expanded at index
+time (an item tagged "formal" also serves "work" and "business", one tagged
+"evening" serves "party", "date" and "night"), and untagged or catch-all items
+land in a wildcard set. Selecting the items for a request is then a couple of
+set unions and one intersection.
+
+Indexes are built from the database on first use, kept in a bounded
+in-process cache and updated item by item through wardrobe_events.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.clothing import ClothingItem
+from app.core.constants import TAG_INDEX_CACHE_USERS
+
+# Tag -> occasions it also serves. Compound tags ("date-night", "business casual")
+# are also indexed under each of their parts, so "date-night" serves "date" and "night".
+OCCASION_SYNONYMS = {
+    'formal': {'work', 'business'},
+    'business': {'work'},
+    'work': {'business'},
+    'party': {'date', 'night', 'date-night'},
+    'date': {'party', 'night', 'date-night'},
+    'evening': {'party', 'date', 'night', 'date-night'},
+    'date-night': {'party', 'date', 'night'},
+    'athletic': {'active', 'sport'},
+    'sport': {'active', 'athletic'},
+    'sports': {'active', 'sport', 'athletic'},
+    'gym': {'active'}
+}
+
+# Tags that make an item suitable for any occasion / any season
+WILDCARD_OCCASION_TAGS = {'all', 'casual'}
+WILDCARD_SEASON_TAGS = {'all', 'all-season', 'year-round'}
+
+# Season aliases, normalized to the four season_tags values
+SEASON_ALIASES = {'autumn': 'fall'}
+
+# Weather words -> the season whose items suit it, when a request gives weather but no season
+WEATHER_SEASONS = {
+    'hot': 'summer', 'warm': 'summer', 'sunny': 'summer', 'humid': 'summer',
+    'cold': 'winter', 'freezing': 'winter', 'snow': 'winter', 'snowy': 'winter',
+    'cool': 'fall', 'chilly': 'fall', 'windy': 'fall',
+    'mild': 'spring'
+}
+
+
+def normalize_tag(tag: str) -> str:
+    """Lower-case a tag and hyphenate compounds ("Date Night", "date_night" -> "date-night")"""
+    return re.sub(r'[\s_]+', '-', tag.strip().lower())
+
+
+def normalize_tags(tags: Optional[str]) -> Set[str]:
+    """Split a comma-separated tag string into normalized tags"""
+    return {normalize_tag(tag) for tag in (tags or '').split(',') if tag.strip()}
+
+
+def _tag_tokens(tags: Set[str]) -> Set[str]:
+    """The tags plus the parts of compound ones ("date-night" -> date-night, date, night)"""
+    tokens = set(tags)
+    for tag in tags:
+        tokens.update(part for part in re.split(r'[-\s/&+]+', tag) if part)
+    return tokens
+
+
+def normalize_season(season: Optional[str]) -> Optional[str]:
+    season = (season or '').strip().lower()
+    return SEASON_ALIASES.get(season, season) or None
+
+
+def request_season(season: Optional[str], weather: Optional[str]) -> Optional[str]:
+    """The season to filter on: the requested one, else one inferred from the weather"""
+    if season:
+        return normalize_season(season)
+    for word in (weather or '').lower().replace(',', ' ').split():
+        if word in WEATHER_SEASONS:
+            return WEATHER_SEASONS[word]
+    return None
+
+
+def _occasion_keys(tags: Set[str]) -> Set[str]:
+    keys = set(tags)
+    for tag in tags:
+        keys |= OCCASION_SYNONYMS.get(tag, set())
+    return keys
+
+
+class WardrobeTagIndex:
+    """Inverted occasion and season index of one wardrobe"""
+
+    def __init__(self):
+        self.by_occasion: Dict[str, Set[int]] = {}
+        self.by_season: Dict[str, Set[int]] = {}
+        self.any_occasion: Set[int] = set()
+        self.any_season: Set[int] = set()
+        # item_id -> raw (occasion_tags, season_tags), to detect changes and remove cleanly
+        self._raw: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, items: Iterable[Dict]) -> "WardrobeTagIndex":
+        index = cls()
+        index.sync(items)
+        return index
+
+    def _unindex(self, item_id: int) -> None:
+        for postings in (*self.by_occasion.values(), *self.by_season.values(), self.any_occasion, self.any_season):
+            postings.discard(item_id)
+
+    def upsert(self, item_id: int, occasion_tags: Optional[str], season_tags: Optional[str]) -> bool:
+        """Index an item's tags, replacing its previous entry. Returns False when unchanged."""
+        with self._lock:
+            if self._raw.get(item_id) == (occasion_tags, season_tags):
+                return False
+            if item_id in self._raw:
+                self._unindex(item_id)
+            self._raw[item_id] = (occasion_tags, season_tags)
+
+            occasions = _tag_tokens(normalize_tags(occasion_tags))
+            if not occasions or occasions & WILDCARD_OCCASION_TAGS:
+                self.any_occasion.add(item_id)
+            for key in _occasion_keys(occasions):
+                self.by_occasion.setdefault(key, set()).add(item_id)
+
+            seasons = {normalize_season(season) for season in _tag_tokens(normalize_tags(season_tags))}
+            if not seasons or seasons & WILDCARD_SEASON_TAGS:
+                self.any_season.add(item_id)
+            for season in seasons:
+                self.by_season.setdefault(season, set()).add(item_id)
+            return True
+
+    def remove(self, item_id: int) -> bool:
+        with self._lock:
+            if self._raw.pop(item_id, None) is None:
+                return False
+            self._unindex(item_id)
+            return True
+
+    def sync(self, items: Iterable[Dict]) -> None:
+        """Upsert any of the given items whose tags are new or changed"""
+        for item in items:
+            self.upsert(item.get('id'), item.get('occasion_tags'), item.get('season_tags'))
+
+    def occasion_ids(self, occasion: str) -> Set[int]:
+        """Items suitable for the occasion (tagged for it, a synonym, or any occasion)"""
+        with self._lock:
+            return self.by_occasion.get(normalize_tag(occasion), set()) | self.any_occasion
+
+    def season_ids(self, season: str) -> Set[int]:
+        """Items suitable for the season (tagged for it or all-season/untagged)"""
+        with self._lock:
+            return self.by_season.get(normalize_season(season), set()) | self.any_season
+
+
+# user_id -> index, least recently used first
+_indexes: "OrderedDict[int, WardrobeTagIndex]" = OrderedDict()
+# item_id -> user_id of the cached index holding it
+_owner_by_item: Dict[int, int] = {}
+_cache_lock = threading.Lock()
+
+
+def _cache(user_id: int, index: WardrobeTagIndex) -> None:
+    with _cache_lock:
+        _indexes[user_id] = index
+        _indexes.move_to_end(user_id)
+        _owner_by_item.update({item_id: user_id for item_id in index._raw})
+        while len(_indexes) > TAG_INDEX_CACHE_USERS:
+            evicted_user, evicted = _indexes.popitem(last=False)
+            for item_id in evicted._raw:
+                if _owner_by_item.get(item_id) == evicted_user:
+                    del _owner_by_item[item_id]
+
+
+def load_tag_index(db: Session, user_id: int) -> WardrobeTagIndex:
+    """The user's index from memory, built from their items' tag columns on first use"""
+    with _cache_lock:
+        index = _indexes.get(user_id)
+        if index is not None:
+            _indexes.move_to_end(user_id)
+            return index
+    rows = db.query(ClothingItem.id, ClothingItem.occasion_tags, ClothingItem.season_tags).filter(
+        ClothingItem.user_id == user_id
+    ).all()
+    index = WardrobeTagIndex.build(
+        {'id': item_id, 'occasion_tags': occasion_tags, 'season_tags': season_tags}
+        for item_id, occasion_tags, season_tags in rows
+    )
+    _cache(user_id, index)
+    return index
+
+
+def tag_index_for(items: List[Dict]) -> WardrobeTagIndex:
+    """
+    An index covering the given item dicts.
+
+    Uses the owner's loaded index when there is one (re-indexing any item whose
+    tags changed since), otherwise builds a throwaway index over these items.
+    """
+    with _cache_lock:
+        owners = {_owner_by_item.get(item.get('id')) for item in items} - {None}
+        index = _indexes.get(owners.pop()) if len(owners) == 1 else None
+    if index is None:
+        return WardrobeTagIndex.build(items)
+    index.sync(items)
+    return index
+
+
+def update_item(user_id: int, item_id: int) -> None:
+    """Re-index one item's tags in the user's loaded index"""
+    with _cache_lock:
+        index = _indexes.get(user_id)
+    if index is None:
+        return
+    db = SessionLocal()
+    try:
+        row = db.query(ClothingItem.occasion_tags, ClothingItem.season_tags).filter(
+            ClothingItem.id == item_id
+        ).first()
+    finally:
+        db.close()
+    if row is not None:
+        index.upsert(item_id, row.occasion_tags, row.season_tags)
+        with _cache_lock:
+            _owner_by_item[item_id] = user_id
+
+
+def remove_item(user_id: int, item_id: int) -> None:
+    """Drop a deleted item from the user's loaded index"""
+    with _cache_lock:
+        index = _indexes.get(user_id)
+        _owner_by_item.pop(item_id, None)
+    if index is not None:
+        index.remove(item_id)
@@ -0,0 +1,167 @@
+"""
+Wardrobe Encoding - Compact, token-budgeted wardrobe listings for prompts
+
+Instead of one free-text line per item, the wardrobe is written as a legend of
+short codes (slot, category, color, pattern) followed by one fixed-width line
+per item with its formality score. When the listing would exceed the token
+budget, the least relevant items for the occasion and season are dropped,
+taking items from every slot in turn so each slot stays represented.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+from app.services.outfit_builder import categorize_item, get_formality_score
+from app.core.constants import PROMPT_CHARS_PER_TOKEN
+
+SLOT_CODES = {
+    'base_top': 'T',
+    'layer': 'L',
+    'bottom': 'B',
+    'shoes': 'S',
+    'accessory': 'A'
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (no tokenizer round-trip)"""
+    return len(text) // PROMPT_CHARS_PER_TOKEN + 1
+
+
+# Column layout of one encoded item line: ID, slot, category, color, pattern, formality
+_ITEM_LINE_TEMPLATE = "{id:>6} {slot} {category:<3} {color:<3} {pattern:<3} {formality:>2}"
+
+# Fixed legend lines and table header, before any per-value legend entries
+_LEGEND_BASE_TOKENS = 60
+
+
+def _category_of(item: Dict) -> str:
+    # The subcategory is more specific when there is one
+    return (item.get('subcategory') or item.get('category') or 'item').lower()
+
+
+def _color_of(item: Dict) -> str:
+    return (item.get('color') or 'unknown').lower()
+
+
+def _pattern_of(item: Dict) -> str:
+    return (item.get('pattern') or 'solid').lower()
+
+
+def _item_relevance(item: Dict, occasion: str, season: Optional[str], underused_ids: Set[int]) -> float:
+    """How useful an item is likely to be for this request"""
+    relevance = 0.0
+    occasion_tags = (item.get('occasion_tags') or '').lower()
+    if not occasion_tags or occasion.lower() in occasion_tags:
+        relevance += 3.0
+    if season:
+        season_tags = (item.get('season_tags') or '').lower()
+        if not season_tags or season.lower() in season_tags or 'all-season' in season_tags:
+            relevance += 2.0
+    if item.get('id') in underused_ids:
+        relevance += 1.5
+    relevance += (item.get('quality_score') or 7.0) / 10.0
+    return relevance
+
+
+def select_items_for_budget(
+    clothing_list: List[Dict],
+    token_budget: int,
+    occasion: str,
+    season: Optional[str] = None,
+    underused_ids: Optional[Set[int]] = None,
+    force_include_item_ids: Optional[List[int]] = None
+) -> List[Dict]:
+    """
+    Keep the most relevant items whose encoding fits in token_budget.
+
+    An item costs its line plus any legend entries it introduces. Forced items
+    are always kept. The rest are taken round-robin across slots, most
+    relevant first, so a tight budget trims every slot instead of emptying
+    one. Returns the kept items in their original order.
+    """
+    forced_ids = set(force_include_item_ids or [])
+    underused_ids = underused_ids or set()
+    line_tokens = estimate_tokens(_ITEM_LINE_TEMPLATE.format(
+        id=0, slot='T', category='c00', color='k00', pattern='p00', formality=10
+    ))
+    legend_values: Set[Tuple[str, str]] = set()
+
+    def cost(item: Dict) -> int:
+        new_values = {('c', _category_of(item)), ('k', _color_of(item)), ('p', _pattern_of(item))} - legend_values
+        return line_tokens + sum(estimate_tokens(f"{kind}00={value}, ") for kind, value in new_values)
+
+    def keep(item: Dict) -> None:
+        legend_values.update({('c', _category_of(item)), ('k', _color_of(item)), ('p', _pattern_of(item))})
+        kept_ids.add(item.get('id'))
+
+    kept_ids: Set[int] = set()
+    used = _LEGEND_BASE_TOKENS
+    by_slot: Dict[str, List[Tuple[float, Dict]]] = {}
+    for item in clothing_list:
+        if item.get('id') in forced_ids:
+            used += cost(item)
+            keep(item)
+            continue
+        by_slot.setdefault(categorize_item(item), []).append(
+            (_item_relevance(item, occasion, season, underused_ids), item)
+        )
+    queues = [
+        [item for _, item in sorted(entries, key=lambda entry: entry[0], reverse=True)]
+        for entries in by_slot.values()
+    ]
+
+    rank = 0
+    exhausted = False
+    while not exhausted and any(rank < len(queue) for queue in queues):
+        for queue in queues:
+            if rank >= len(queue):
+                continue
+            item_cost = cost(queue[rank])
+            if used + item_cost > token_budget:
+                exhausted = True
+                break
+            keep(queue[rank])
+            used += item_cost
+        rank += 1
+
+    return [item for item in clothing_list if item.get('id') in kept_ids]
+
+
+def _build_codes(values: List[str], prefix: str) -> Dict[str, str]:
+    """Short code per distinct value: prefix plus a two-digit base-36 index"""
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    return {
+        value: f"{prefix}{digits[index // 36 % 36]}{digits[index % 36]}"
+        for index, value in enumerate(sorted(set(values)))
+    }
+
+
+def encode_wardrobe(clothing_list: List[Dict]) -> str:
+    """
+    Encode items as a legend plus one fixed-width line per item.
+
+    Formality is the 0-10 score used by the outfit builder.
+    """
+    category_codes = _build_codes([_category_of(item) for item in clothing_list], "c")
+    color_codes = _build_codes([_color_of(item) for item in clothing_list], "k")
+    pattern_codes = _build_codes([_pattern_of(item) for item in clothing_list], "p")
+
+    legend = [
+        "Slots: " + ", ".join(f"{code}={slot}" for slot, code in SLOT_CODES.items()),
+        "Categories: " + ", ".join(f"{code}={value}" for value, code in category_codes.items()),
+        "Colors: " + ", ".join(f"{code}={value}" for value, code in color_codes.items()),
+        "Patterns: " + ", ".join(f"{code}={value}" for value, code in pattern_codes.items()),
+        "Formality: 0 (casual) to 10 (formal)"
+    ]
+
+    header = _ITEM_LINE_TEMPLATE.format(id="ID", slot="S", category="CAT", color="COL", pattern="PAT", formality="F")
+    lines = [
+        _ITEM_LINE_TEMPLATE.format(
+            id=item.get('id'),
+            slot=SLOT_CODES.get(categorize_item(item), 'A'),
+            category=category_codes[_category_of(item)],
+            color=color_codes[_color_of(item)],
+            pattern=pattern_codes[_pattern_of(item)],
+            formality=get_formality_score(item)
+        )
+        for item in clothing_list
+    ]
+    return "\n".join(legend) + "\n\n" + "\n".join([header] + lines)
@@ -0,0 +1,31 @@
+"""
+Wardrobe Events - Single place to react to wardrobe and Style DNA writes
+
+Routes and background jobs call these after committing a change so that every
+piece of derived state (cached suggestions, indexes, ...) stays in sync.
+"""
+from app.services import compatibility_matrix, tag_index
+from app.services.outfit_cache import invalidate_user_outfits
+from app.services.outfit_pregeneration import mark_wardrobe_changed
+
+
+def item_saved(user_id: int, item_id: int) -> None:
+    """A clothing item was created, analyzed or edited"""
+    compatibility_matrix.update_item(user_id, item_id)
+    tag_index.update_item(user_id, item_id)
+    invalidate_user_outfits(user_id)
+    mark_wardrobe_changed(user_id)
+
+
+def item_deleted(user_id: int, item_id: int) -> None:
+    """A clothing item was deleted"""
+    compatibility_matrix.remove_item(user_id, item_id)
+    tag_index.remove_item(user_id, item_id)
+    invalidate_user_outfits(user_id)
+    mark_wardrobe_changed(user_id)
+
+
+def style_dna_saved(user_id: int) -> None:
+    """The user's Style DNA was created, updated or deleted"""
+    invalidate_user_outfits(user_id)
+    mark_wardrobe_changed(user_id)
@@ -1,12 +1,16 @@
 import os
+import re
 from pathlib import Path
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.database import Base, engine
-from app.routes import auth, clothing, outfit, favorites, style_dna, wardrobe
+from app.routes import admin, auth, clothing, outfit, favorites, style_dna, wardrobe
 from app.config import settings
 from app.core.logging import logger
+from app.services.analysis_jobs import resume_analysis_jobs
+from app.services.outfit_pregeneration import start_pregeneration_scheduler
+from app.services.ai_telemetry import current_route
 
 # Initialize logging
 logger.info("Starting Outfit AI API...")
@@ -36,6 +40,13 @@ app.add_middleware(
 
 logger.info(f"CORS configured for origins: {settings.ALLOWED_ORIGINS}")
 
+@app.middleware("http")
+async def label_ai_telemetry_route(request: Request, call_next):
+    # AI calls made while serving this request are attributed to its route (IDs collapsed)
+    path = re.sub(r"/\d+", "/{id}", request.url.path)
+    current_route.set(f"{request.method} {path}")
+    return await call_next(request)
+
 # Use absolute path for uploads directory
 BACKEND_DIR = Path(__file__).parent
 UPLOADS_DIR = BACKEND_DIR / "uploads"
@@ -51,6 +62,15 @@ app.include_router(outfit.router)
 app.include_router(favorites.router)
 app.include_router(style_dna.router)
 app.include_router(wardrobe.router)
+app.include_router(admin.router)
+
+@app.on_event("startup")
+async def resume_background_jobs():
+    resumed = resume_analysis_jobs()
+    if resumed:
+        logger.info(f"Resumed {resumed} background analysis job(s)")
+    if start_pregeneration_scheduler():
+        logger.info("Outfit pre-generation scheduler started")
 
 @app.get("/")
 def read_root():
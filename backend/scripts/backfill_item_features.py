@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Backfill the derived feature columns (slot, formality, pattern intensity, color family)
+
+Run after the add_item_derived_features migration, or after changing how a
+feature is derived:
+    python scripts/backfill_item_features.py
+    python scripts/backfill_item_features.py --user-id 1
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import SessionLocal
+from app.services.item_features import backfill_item_features
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, help="Only backfill this user's items")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        changed = backfill_item_features(db, user_id=args.user_id, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"✅ Updated derived features on {changed} item(s)")
+
+
+if __name__ == "__main__":
+    main()
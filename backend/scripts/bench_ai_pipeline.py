@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark the analyze/generate pipeline against the configured AI provider
+
+Record fixtures once with network access, then benchmark fully offline:
+    AI_PROVIDER=record python scripts/bench_ai_pipeline.py --user-id 1 --runs 1
+    AI_PROVIDER=replay AI_REPLAY_LATENCY=lognormal:900,0.4 python scripts/bench_ai_pipeline.py --user-id 1 --runs 200
+"""
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import SessionLocal
+from app.models.clothing import ClothingItem
+from app.config import settings
+from app.services.ai_service import analyze_clothing_image, generate_outfit_suggestions
+from app.services.usage_stats_service import get_underused_items_details, get_recent_outfit_combinations
+
+
+def timed(func, *args):
+    """Run func and return (seconds, succeeded)"""
+    started = time.perf_counter()
+    try:
+        result = func(*args)
+        succeeded = not (isinstance(result, dict) and result.get("analysis_successful") is False)
+    except Exception as e:
+        print(f"  call failed: {e}")
+        succeeded = False
+    return time.perf_counter() - started, succeeded
+
+
+def report(label: str, results: list) -> None:
+    latencies = sorted(seconds * 1000 for seconds, _ in results)
+    failures = sum(1 for _, succeeded in results if not succeeded)
+    if not latencies:
+        return
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{label}: {len(latencies)} calls, {failures} failed | "
+        f"p50 {statistics.median(latencies):.0f}ms  p95 {p95:.0f}ms  max {latencies[-1]:.0f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--runs", type=int, default=20, help="Calls per benchmarked stage")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--occasion", default="casual")
+    parser.add_argument("--skip-analysis", action="store_true")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        items = db.query(ClothingItem).filter(ClothingItem.user_id == args.user_id).all()
+        items_data = [
+            {
+                "id": item.id,
+                "category": item.category,
+                "subcategory": item.subcategory,
+                "color": item.color,
+                "style_tags": item.style_tags,
+                "occasion_tags": item.occasion_tags,
+                "fit_type": item.fit_type,
+                "pattern": item.pattern
+            }
+            for item in items
+        ]
+        image_paths = [item.image_path.lstrip("/") for item in items if item.image_path]
+        underused_items = get_underused_items_details(db, args.user_id, limit=10)
+        recent_combinations = get_recent_outfit_combinations(db, args.user_id, days=14)
+    finally:
+        db.close()
+
+    if not items_data:
+        print(f"❌ User {args.user_id} has no clothing items")
+        return
+
+    print(f"Provider: {settings.AI_PROVIDER} | {len(items_data)} items | {args.runs} runs x {args.concurrency} concurrent")
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        if not args.skip_analysis and image_paths:
+            paths = [image_paths[run % len(image_paths)] for run in range(args.runs)]
+            report("analyze_clothing_image", list(pool.map(lambda path: timed(analyze_clothing_image, path), paths)))
+
+        report("generate_outfit_suggestions", list(pool.map(
+            lambda _: timed(
+                generate_outfit_suggestions,
+                items_data, args.occasion, None, None, underused_items, recent_combinations, None
+            ),
+            range(args.runs)
+        )))
+
+
+if __name__ == "__main__":
+    main()
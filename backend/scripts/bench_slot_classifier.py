@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark categorize_item against the previous substring-scanning classifier
+
+Classifies synthetic items with both implementations, checks they agree on
+every item and reports the time per pass:
+    python scripts/bench_slot_classifier.py --items 100000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import outfit_builder
+from app.services.outfit_builder import (
+    BASE_TOP_CATEGORIES,
+    LAYER_CATEGORIES,
+    BOTTOM_CATEGORIES,
+    SHOE_CATEGORIES,
+    ACCESSORY_CATEGORIES,
+    categorize_item
+)
+
+
+def legacy_categorize_item(item):
+    """The classifier categorize_item replaced, kept as the reference"""
+    category = (item.get('category') or '').lower()
+    subcategory = (item.get('subcategory') or '').lower()
+    full_text = f"{category} {subcategory}".lower()
+    for keywords, slot in (
+        (SHOE_CATEGORIES, 'shoes'),
+        (LAYER_CATEGORIES, 'layer'),
+        (BASE_TOP_CATEGORIES, 'base_top'),
+        (BOTTOM_CATEGORIES, 'bottom'),
+        (ACCESSORY_CATEGORIES, 'accessory')
+    ):
+        for keyword in keywords:
+            if keyword in full_text:
+                return slot
+    if 'shoe' in category or 'boot' in category or 'sneaker' in category:
+        return 'shoes'
+    elif 'jacket' in category or 'coat' in category or 'blazer' in category:
+        return 'layer'
+    elif 'pant' in category or 'jean' in category or 'short' in category or 'skirt' in category:
+        return 'bottom'
+    elif 'shirt' in category or 'tee' in category or 'top' in category:
+        return 'base_top'
+    else:
+        return 'accessory'
+
+
+def synthetic_items(count: int, seed: int):
+    """Items mixing known keywords, casing, modifiers and unknown words, like real analyses"""
+    rng = random.Random(seed)
+    keywords = sorted(
+        BASE_TOP_CATEGORIES | LAYER_CATEGORIES | BOTTOM_CATEGORIES | SHOE_CATEGORIES | ACCESSORY_CATEGORIES
+    )
+    primaries = ['Tops', 'Bottoms', 'Shoes', 'Outerwear', 'Accessories', 'Dresses', 'Footwear', 'Other', '']
+    modifiers = ['', 'slim ', 'oversized ', 'Vintage ', 'cropped ', 'wool ', 'denim ', 'leather ']
+    unknown = ['kimono', 'romper', 'tunic', 'clogs', 'brooch', 'overalls', 'gilet', 'Pants', 'Boot']
+    items = []
+    for index in range(count):
+        word = rng.choice(keywords) if rng.random() < 0.85 else rng.choice(unknown)
+        subcategory = rng.choice(modifiers) + (word.title() if rng.random() < 0.3 else word)
+        items.append({
+            'id': index,
+            'category': rng.choice(primaries),
+            'subcategory': subcategory if rng.random() < 0.95 else None
+        })
+    return items
+
+
+def timed_pass(classify, items):
+    started = time.perf_counter()
+    slots = [classify(item) for item in items]
+    return time.perf_counter() - started, slots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    items = synthetic_items(args.items, args.seed)
+    distinct = len({(item['category'], item['subcategory']) for item in items})
+    print(f"{len(items)} synthetic items, {distinct} distinct (category, subcategory) pairs")
+
+    legacy_seconds, legacy_slots = timed_pass(legacy_categorize_item, items)
+    outfit_builder._slot_for.cache_clear()
+    cold_seconds, slots = timed_pass(categorize_item, items)
+    warm_seconds, _ = timed_pass(categorize_item, items)
+
+    mismatches = sum(1 for expected, actual in zip(legacy_slots, slots) if expected != actual)
+    print(f"legacy substring scan: {legacy_seconds * 1000:8.1f}ms")
+    print(f"compiled, cold cache:  {cold_seconds * 1000:8.1f}ms  ({legacy_seconds / cold_seconds:.1f}x)")
+    print(f"compiled, warm cache:  {warm_seconds * 1000:8.1f}ms  ({legacy_seconds / warm_seconds:.1f}x)")
+    print(f"cache: {outfit_builder._slot_for.cache_info()}")
+    if mismatches:
+        print(f"MISMATCH: {mismatches} items classified differently")
+        sys.exit(1)
+    print("All items classified identically")
+
+
+if __name__ == "__main__":
+    main()
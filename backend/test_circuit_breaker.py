@@ -0,0 +1,101 @@
+"""
+Circuit breaker state machine tests
+
+Run with: python -m pytest test_circuit_breaker.py  (or python test_circuit_breaker.py)
+"""
+import os
+from unittest import mock
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from google.api_core import exceptions as google_exceptions
+
+from app.services import ai_client
+from app.services.ai_client import AIUnavailableError, CircuitBreaker, call_model
+
+
+class FakeProvider:
+    """Provider that raises or returns the queued outcomes in order"""
+
+    name = "fake"
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def generate_content(self, contents, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def _call(breaker, provider, **kwargs):
+    with mock.patch.object(ai_client, "circuit_breaker", breaker), \
+            mock.patch.object(ai_client, "get_ai_provider", return_value=provider), \
+            mock.patch.object(ai_client, "AI_MAX_RETRIES", 1), \
+            mock.patch.object(ai_client, "record_ai_call"):
+        return call_model("prompt", call_name="test", **kwargs)
+
+
+def test_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    provider = FakeProvider([google_exceptions.ServiceUnavailable("down")] * 2)
+    for _ in range(2):
+        try:
+            _call(breaker, provider)
+        except AIUnavailableError:
+            pass
+    assert breaker.is_open
+    assert not breaker.allow_request()
+
+
+def test_half_open_trial_success_closes():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert _call(breaker, FakeProvider(["ok"])) == "ok"
+    assert not breaker.is_open
+    assert breaker.allow_request()
+
+
+def test_half_open_trial_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    try:
+        _call(breaker, FakeProvider([google_exceptions.ServiceUnavailable("down")]))
+    except AIUnavailableError:
+        pass
+    assert breaker.is_open
+    # The trial was released, so another one is allowed once the reset time passed
+    assert breaker.allow_request()
+
+
+def test_non_retryable_stream_trial_releases_circuit():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0)
+    breaker.record_failure()
+    breaker.record_failure()
+    provider = FakeProvider([google_exceptions.InvalidArgument("bad request"), "ok"])
+    try:
+        _call(breaker, provider, stream=True)
+    except google_exceptions.InvalidArgument:
+        pass
+    assert not breaker.is_open
+    assert _call(breaker, provider, stream=True) == "ok"
+
+
+def test_non_retryable_error_closes_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    try:
+        _call(breaker, FakeProvider([google_exceptions.InvalidArgument("bad request")]))
+    except google_exceptions.InvalidArgument:
+        pass
+    assert not breaker.is_open
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,86 @@
+"""
+LLM JSON tests - the streaming scanner must recover the same values however the text arrives
+
+Run with: python -m pytest test_llm_json.py  (or python test_llm_json.py)
+"""
+import json
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from app.services.llm_json import JsonValueStream, parse_json_object, parse_json_objects
+
+OUTFITS = [
+    {"outfit_name": "Weekend {brunch}", "item_ids": [1, 2, 3], "reasoning": "a \"quoted\" [note]"},
+    {"outfit_name": "Office", "item_ids": [4, 5]}
+]
+
+RESPONSES = [
+    json.dumps(OUTFITS),
+    "```json\n" + json.dumps(OUTFITS, indent=2) + "\n```",
+    "Here are your outfits:\n" + json.dumps(OUTFITS) + "\nEnjoy!",
+    "prose with { brace then " + json.dumps(OUTFITS),
+    "Pick one [or both: " + json.dumps(OUTFITS),
+    "{ first } then {{ " + json.dumps(OUTFITS[0]) + " and " + json.dumps(OUTFITS[1])
+]
+
+
+def _values(text, chunk_size=None, unwrap_arrays=True):
+    if chunk_size is None:
+        chunks = [text]
+    else:
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    return list(JsonValueStream(unwrap_arrays=unwrap_arrays).iter_values(chunks))
+
+
+def test_stray_bracket_before_payload():
+    assert _values('prose with { brace then [{"a":1}]') == [{"a": 1}]
+    assert _values('x { y {"a":1} z', unwrap_arrays=False) == [{"a": 1}]
+    assert parse_json_objects("prose with { brace then " + json.dumps(OUTFITS)) == OUTFITS
+
+
+def test_stray_bracket_after_payload():
+    assert _values(json.dumps(OUTFITS) + " hope that helps {") == OUTFITS
+
+
+def test_fenced_and_prose_wrapped():
+    for text in RESPONSES:
+        assert parse_json_objects(text) == OUTFITS, text
+        assert parse_json_object(text) == OUTFITS[0], text
+
+
+def test_chunk_invariance():
+    for text in RESPONSES:
+        for chunk_size in (1, 2, 3, 7, 16, 64):
+            assert _values(text, chunk_size) == OUTFITS, (text, chunk_size)
+
+
+def test_stream_yields_elements_as_they_complete():
+    text = json.dumps(OUTFITS)
+    cut = text.index("},") + 1
+    parser = JsonValueStream(unwrap_arrays=True)
+    assert parser.feed(text[:cut]) == [OUTFITS[0]]
+    assert parser.feed(text[cut:]) == [OUTFITS[1]]
+    assert parser.finish() == []
+
+
+def test_truncated_array_keeps_finished_elements():
+    text = json.dumps(OUTFITS)
+    truncated = text[:text.index('"Office"') + 4]
+    for chunk_size in (None, 1, 5):
+        assert _values(truncated, chunk_size) == [OUTFITS[0]]
+
+
+def test_truncated_object_is_dropped():
+    assert parse_json_object('{"primary_style": "classic", "colors": ["na') is None
+
+
+def test_many_stray_brackets():
+    assert _values("{" * 2000 + json.dumps(OUTFITS)) == OUTFITS
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,99 @@
+"""
+Tag index tests - occasion filtering must keep what the substring filter matched
+
+Run with: python -m pytest test_tag_index.py  (or python test_tag_index.py)
+"""
+import itertools
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from app.services.outfit_builder import filter_by_occasion
+from app.services.tag_index import WardrobeTagIndex
+
+# The analysis prompt's occasion vocabulary plus common free-text compounds
+VOCABULARY = [
+    "casual", "formal", "business", "athletic", "party", "date-night", "weekend", "work",
+    "lounge", "travel", "sport", "smart-casual", "business casual", "semi-formal", "evening"
+]
+# Mobile occasion chips are sent by label
+REQUESTS = ["Work", "Casual", "Date", "Formal", "Party", "Business", "Night", "Weekend", "Travel"]
+
+
+def legacy_filter_by_occasion(items, occasion):
+    """The substring filter the tag index replaced"""
+    occasion_lower = occasion.lower()
+    filtered = []
+    for item in items:
+        occasion_tags = (item.get('occasion_tags') or '').lower()
+        if not occasion_tags:
+            filtered.append(item)
+            continue
+        if occasion_lower in occasion_tags or 'all' in occasion_tags or 'casual' in occasion_tags:
+            filtered.append(item)
+        elif occasion_lower in ['work', 'business'] and any(tag in occasion_tags for tag in ['formal', 'business', 'work']):
+            filtered.append(item)
+        elif occasion_lower in ['party', 'date', 'night'] and any(tag in occasion_tags for tag in ['party', 'date', 'evening']):
+            filtered.append(item)
+    return filtered if filtered else items
+
+
+def _wardrobe():
+    tag_sets = [None, ""] + list(VOCABULARY) + [", ".join(pair) for pair in itertools.combinations(VOCABULARY, 2)]
+    return [{"id": index, "occasion_tags": tags} for index, tags in enumerate(tag_sets)]
+
+
+def _ids(items):
+    return {item["id"] for item in items}
+
+
+def test_matches_legacy_filter():
+    items = _wardrobe()
+    for occasion in REQUESTS:
+        assert _ids(filter_by_occasion(items, occasion)) == _ids(legacy_filter_by_occasion(items, occasion)), occasion
+
+
+def test_date_request_keeps_date_night_items():
+    items = [
+        {"id": 1, "occasion_tags": "date-night, formal"},
+        {"id": 2, "occasion_tags": "date-night"},
+        {"id": 3, "occasion_tags": "party"},
+        {"id": 4, "occasion_tags": "athletic"}
+    ]
+    assert _ids(filter_by_occasion(items, "Date")) == {1, 2, 3}
+    assert _ids(filter_by_occasion(items, "date night")) == {1, 2, 3}
+
+
+def test_compound_casual_tags_are_wildcards():
+    items = [
+        {"id": 1, "occasion_tags": "smart-casual"},
+        {"id": 2, "occasion_tags": "business casual"},
+        {"id": 3, "occasion_tags": "athletic"}
+    ]
+    assert _ids(filter_by_occasion(items, "Party")) == {1, 2}
+
+
+def test_athletic_and_sport_serve_active():
+    items = [
+        {"id": 1, "occasion_tags": "athletic"},
+        {"id": 2, "occasion_tags": "sport"},
+        {"id": 3, "occasion_tags": "formal"}
+    ]
+    assert _ids(filter_by_occasion(items, "Active")) == {1, 2}
+
+
+def test_compound_season_tags():
+    index = WardrobeTagIndex.build([
+        {"id": 1, "season_tags": "spring/summer"},
+        {"id": 2, "season_tags": "All Season"},
+        {"id": 3, "season_tags": "winter"}
+    ])
+    assert index.season_ids("summer") == {1, 2}
+    assert index.season_ids("winter") == {2, 3}
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")